@@ -0,0 +1,167 @@
+from bisect import bisect_left, insort
+
+from documents import is_processed
+
+IOC_TYPES = ('ips', 'domains', 'emails', 'cve', 'malware', 'hacker')
+SENTIMENT_LABELS = ('positive', 'neutral', 'negative')
+VIZ_TYPES = ('iocs', 'sentiment', 'geolocation', 'timeline')
+
+
+def _contribution(doc):
+    """What one processed document adds to each aggregate"""
+    processed = doc['nlp_processed']
+    iocs = processed.get('iocs', {})
+    ioc_counts = {t: len(iocs.get(t, [])) for t in IOC_TYPES} if isinstance(iocs, dict) else {}
+
+    sentiment = processed.get('sentiment', {})
+    label = sentiment.get('label', 'neutral') if isinstance(sentiment, dict) else None
+
+    points = []
+    geolocation = processed.get('geolocation', [])
+    if isinstance(geolocation, list):
+        for geo in geolocation:
+            if isinstance(geo, dict) and geo.get('latitude') and geo.get('longitude'):
+                points.append({
+                    'lat': geo['latitude'],
+                    'lng': geo['longitude'],
+                    'country': geo.get('country', 'Unknown'),
+                    'city': geo.get('city', 'Unknown'),
+                    'timestamp': doc.get('processed_at', '')
+                })
+
+    date = (doc.get('processed_at', '') or '').split('T')[0]
+    threat = {
+        'url': doc.get('url', ''),
+        'title': doc.get('title', ''),
+        'sentiment': processed.get('sentiment', {}),
+        'topics': processed.get('topics', []),
+        'iocs': processed.get('iocs', {})
+    }
+    return ioc_counts, label, points, date, threat
+
+
+class VisualizationAggregates:
+    """Materialized /visualize aggregates, maintained per document change.
+
+    apply() subtracts the old document's contribution and adds the new
+    one, so a batch of updates costs O(changed documents). Payloads are
+    built at most once per snapshot and then served as is. fork() copies
+    only the small top-level maps; timeline buckets are copied the first
+    time a fork writes to them.
+    """
+
+    def __init__(self):
+        self.processed = 0
+        self.ioc_counts = dict.fromkeys(IOC_TYPES, 0)
+        self.sentiment_counts = dict.fromkeys(SENTIMENT_LABELS, 0)
+        self.points = {}
+        self.dates = []
+        self.timeline = {}
+        self._owned_dates = set()
+        self._payloads = {}
+
+    def rebuild(self, documents_by_id):
+        for doc_id, doc in documents_by_id.items():
+            self.apply(doc_id, None, doc)
+
+    def _bucket(self, date):
+        bucket = self.timeline.get(date)
+        if bucket is None:
+            bucket = self.timeline[date] = {}
+            insort(self.dates, date)
+        elif date not in self._owned_dates:
+            bucket = self.timeline[date] = dict(bucket)
+        self._owned_dates.add(date)
+        return bucket
+
+    def _update(self, doc_id, doc, sign):
+        ioc_counts, label, points, date, threat = _contribution(doc)
+        self.processed += sign
+        for ioc_type, count in ioc_counts.items():
+            self.ioc_counts[ioc_type] += sign * count
+        if label in self.sentiment_counts:
+            self.sentiment_counts[label] += sign
+        if points:
+            if sign > 0:
+                self.points[doc_id] = points
+            else:
+                self.points.pop(doc_id, None)
+        if date:
+            bucket = self._bucket(date)
+            if sign > 0:
+                bucket[doc_id] = threat
+            else:
+                bucket.pop(doc_id, None)
+                if not bucket:
+                    del self.timeline[date]
+                    del self.dates[bisect_left(self.dates, date)]
+
+    def apply(self, doc_id, old_doc, new_doc):
+        if old_doc is not None and is_processed(old_doc):
+            self._update(doc_id, old_doc, -1)
+        if new_doc is not None and is_processed(new_doc):
+            self._update(doc_id, new_doc, 1)
+        self._payloads = {}
+
+    def fork(self):
+        clone = VisualizationAggregates.__new__(VisualizationAggregates)
+        clone.processed = self.processed
+        clone.ioc_counts = dict(self.ioc_counts)
+        clone.sentiment_counts = dict(self.sentiment_counts)
+        clone.points = dict(self.points)
+        clone.dates = list(self.dates)
+        clone.timeline = dict(self.timeline)
+        clone._owned_dates = set()
+        clone._payloads = {}
+        return clone
+
+    def payload(self, viz_type):
+        """The /visualize 'data' object for viz_type, or None if unknown"""
+        if viz_type not in VIZ_TYPES:
+            return None
+        payload = self._payloads.get(viz_type)
+        if payload is None:
+            payload = self._payloads[viz_type] = self._build_payload(viz_type)
+        return payload
+
+    def _build_payload(self, viz_type):
+        if self.processed == 0:
+            return {
+                "type": viz_type,
+                "title": f"No {viz_type} data available",
+                "labels": [],
+                "datasets": [{"data": []}]
+            }
+        if viz_type == "iocs":
+            return {
+                "type": "bar",
+                "title": "IOCs Distribution",
+                "labels": ["IPs", "Domains", "Emails", "CVEs", "Malware", "Hackers"],
+                "datasets": [{
+                    "label": "Count",
+                    "data": [self.ioc_counts[t] for t in IOC_TYPES],
+                    "backgroundColor": ["#3b82f6", "#10b981", "#f59e0b", "#ef4444", "#8b5cf6", "#ec4899"]
+                }]
+            }
+        if viz_type == "sentiment":
+            return {
+                "type": "pie",
+                "title": "Sentiment Distribution",
+                "labels": ["Positive", "Neutral", "Negative"],
+                "datasets": [{
+                    "data": [self.sentiment_counts[label] for label in SENTIMENT_LABELS],
+                    "backgroundColor": ["#10b981", "#f59e0b", "#ef4444"]
+                }]
+            }
+        if viz_type == "geolocation":
+            return {
+                "type": "map",
+                "title": "Geolocation Distribution",
+                "points": [point for points in self.points.values() for point in points]
+            }
+        return {
+            "type": "timeline",
+            "title": "Threat Timeline",
+            "dates": list(self.dates),
+            "threats": {date: list(self.timeline[date].values()) for date in self.dates}
+        }
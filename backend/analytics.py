@@ -0,0 +1,286 @@
+import numpy as np
+
+from documents import is_processed
+from export import IOC_TYPES
+
+SENTIMENT_LABELS = ('positive', 'neutral', 'negative')
+GROUP_KEYS = ('date', 'country', 'sentiment', 'ioc_type')
+METRICS = ('count', 'threat_score', 'polarity')
+UNKNOWN_COUNTRY = 'Unknown'
+
+
+def _float(value):
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _timestamp(value):
+    """processed_at to seconds precision; timezone suffixes and fractions are dropped"""
+    try:
+        return np.datetime64(str(value)[:19], 's')
+    except ValueError:
+        return np.datetime64('NaT', 's')
+
+
+class AnalyticsColumns:
+    """Columnar projection of the processed documents for dashboard aggregates.
+
+    One row per processed document, in NumPy arrays:
+
+    - processed_at (datetime64[s]), sentiment (label code, -1 if none),
+      polarity and threat_score (float, NaN if missing)
+    - country (code into countries; the first geolocated country)
+    - iocs (rows x IOC_TYPES indicator counts) and live (False once the
+      document was removed or unprocessed)
+
+    plus the url of each row. group() answers group-by-date / country /
+    sentiment / IOC type queries with bincount over these arrays instead
+    of loops over document dicts. apply() updates rows in place (arrays
+    grow by doubling); fork() shares the arrays and copies them the first
+    time the fork writes.
+    """
+
+    def __init__(self, capacity=1024):
+        self.columns = self._allocate(capacity)
+        self.urls = []
+        self.countries = [UNKNOWN_COUNTRY]
+        self._country_codes = {UNKNOWN_COUNTRY: 0}
+        self.rows = {}
+        self.size = 0
+        self._owned = True
+
+    @staticmethod
+    def _allocate(capacity):
+        return {
+            'processed_at': np.full(capacity, np.datetime64('NaT', 's')),
+            'sentiment': np.full(capacity, -1, dtype=np.int8),
+            'polarity': np.full(capacity, np.nan),
+            'threat_score': np.full(capacity, np.nan),
+            'country': np.zeros(capacity, dtype=np.int32),
+            'iocs': np.zeros((capacity, len(IOC_TYPES)), dtype=np.int32),
+            'live': np.zeros(capacity, dtype=bool),
+        }
+
+    @classmethod
+    def from_arrays(cls, columns, urls, countries):
+        """Read-only projection over prebuilt columns, e.g. views of a mapped file"""
+        index = cls(capacity=0)
+        index.columns = columns
+        index.urls = urls
+        index.countries = list(countries)
+        index._country_codes = {name: code for code, name in enumerate(index.countries)}
+        index.size = len(columns['live'])
+        index._owned = False
+        return index
+
+    def _own(self, capacity):
+        """Make the arrays private to this index, with room for capacity rows"""
+        current = len(self.columns['live'])
+        if self._owned and capacity <= current:
+            return
+        new_capacity = current if capacity <= current else max(capacity, 2 * current, 1024)
+        columns = self._allocate(new_capacity)
+        for name, array in self.columns.items():
+            columns[name][:self.size] = array[:self.size]
+        self.columns = columns
+        self.urls = list(self.urls)
+        self._owned = True
+
+    def _country(self, doc):
+        for geo in doc['nlp_processed'].get('geolocation', []) or []:
+            if isinstance(geo, dict) and geo.get('country'):
+                name = str(geo['country'])
+                code = self._country_codes.get(name)
+                if code is None:
+                    code = self._country_codes[name] = len(self.countries)
+                    self.countries.append(name)
+                return code
+        return 0
+
+    def _write(self, row, doc):
+        processed = doc['nlp_processed']
+        sentiment = processed.get('sentiment', {})
+        sentiment = sentiment if isinstance(sentiment, dict) else {}
+        iocs = processed.get('iocs', {})
+        iocs = iocs if isinstance(iocs, dict) else {}
+        label = sentiment.get('label')
+        columns = self.columns
+        columns['processed_at'][row] = _timestamp(doc.get('processed_at', ''))
+        columns['sentiment'][row] = SENTIMENT_LABELS.index(label) if label in SENTIMENT_LABELS else -1
+        # The processor stores polarity as sentiment['score']
+        columns['polarity'][row] = _float(sentiment.get('score', sentiment.get('polarity')))
+        columns['threat_score'][row] = _float(sentiment.get('threat_score'))
+        columns['country'][row] = self._country(doc)
+        columns['iocs'][row] = [len(iocs[t]) if isinstance(iocs.get(t), list) else 0 for t in IOC_TYPES]
+        columns['live'][row] = True
+        url = str(doc.get('url', '') or '')
+        if row < len(self.urls):
+            self.urls[row] = url
+        else:
+            self.urls.append(url)
+
+    def rebuild(self, documents_by_id):
+        processed = [(doc_id, doc) for doc_id, doc in documents_by_id.items() if is_processed(doc)]
+        self.columns = self._allocate(max(1024, len(processed)))
+        self.urls = []
+        self.rows = {}
+        self.size = 0
+        self._owned = True
+        for doc_id, doc in processed:
+            self.apply(doc_id, None, doc)
+
+    def apply(self, doc_id, old_doc, new_doc):
+        row = self.rows.get(doc_id)
+        if new_doc is None or not is_processed(new_doc):
+            if row is not None:
+                self._own(self.size)
+                self.columns['live'][row] = False
+                del self.rows[doc_id]
+            return
+        if row is None:
+            self._own(self.size + 1)
+            row = self.rows[doc_id] = self.size
+            self.size += 1
+        else:
+            self._own(self.size)
+        self._write(row, new_doc)
+
+    def fork(self):
+        clone = AnalyticsColumns.__new__(AnalyticsColumns)
+        clone.columns = self.columns
+        clone.urls = self.urls
+        clone.countries = list(self.countries)
+        clone._country_codes = dict(self._country_codes)
+        clone.rows = dict(self.rows)
+        clone.size = self.size
+        clone._owned = False
+        self._owned = False
+        return clone
+
+    def column(self, name):
+        """The first size rows of a column"""
+        return self.columns[name][:self.size]
+
+    def _key_codes(self, key):
+        """(codes, labels) for a group key; code -1 excludes a row"""
+        if key == 'sentiment':
+            return self.column('sentiment').astype(np.int64), list(SENTIMENT_LABELS)
+        if key == 'country':
+            return self.column('country').astype(np.int64), list(self.countries)
+        days = self.column('processed_at').astype('datetime64[D]')
+        valid = ~np.isnat(days)
+        codes = np.full(self.size, -1, dtype=np.int64)
+        if not valid.any():
+            return codes, []
+        numbers = days.view(np.int64)[valid]
+        first = int(numbers.min())
+        span = int(numbers.max()) - first + 1
+        if span <= 4 * len(numbers):
+            # Dense day range: a lookup table instead of sorting
+            present = np.bincount(numbers - first, minlength=span) > 0
+            codes[valid] = (np.cumsum(present) - 1)[numbers - first]
+            labels = np.flatnonzero(present) + first
+        else:
+            labels, codes[valid] = np.unique(numbers, return_inverse=True)
+        return codes, [str(day) for day in labels.astype('datetime64[D]')]
+
+    def group(self, keys, metric='count', top=None):
+        """Rows of {key: label, ..., 'count': n[, metric: mean]} per group
+
+        keys are up to two of GROUP_KEYS. 'ioc_type' groups indicators
+        rather than documents: its count is the number of indicators of
+        that type. metric other than 'count' adds the mean of that column
+        over the group's documents. top keeps the n largest groups.
+        """
+        if not keys or len(keys) > 2 or len(set(keys)) != len(keys) \
+                or any(key not in GROUP_KEYS for key in keys):
+            raise ValueError(f"group by one or two of: {', '.join(GROUP_KEYS)}")
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of: {', '.join(METRICS)}")
+        if 'ioc_type' in keys and metric != 'count':
+            raise ValueError("ioc_type groups only support the count metric")
+
+        mask = self.column('live').copy()
+        document_keys = [key for key in keys if key != 'ioc_type']
+        codes = np.zeros(self.size, dtype=np.int64)
+        labels = []
+        for key in document_keys:
+            key_codes, key_labels = self._key_codes(key)
+            mask &= key_codes >= 0
+            codes = codes * len(key_labels) + np.maximum(key_codes, 0)
+            labels.append(key_labels)
+        groups = int(np.prod([len(key_labels) for key_labels in labels])) if labels else 1
+        codes = codes[mask]
+
+        if 'ioc_type' in keys:
+            iocs = self.column('iocs')[mask]
+            if labels:
+                # One column of per-group sums per IOC type, then (group, type) pairs
+                counts = np.stack([
+                    np.bincount(codes, weights=iocs[:, t], minlength=groups) for t in range(len(IOC_TYPES))
+                ], axis=1).ravel()
+            else:
+                counts = iocs.sum(axis=0)
+            means = None
+            labels.append(list(IOC_TYPES))
+            document_keys.append('ioc_type')
+        else:
+            counts = np.bincount(codes, minlength=groups)
+            means = None
+            if metric != 'count':
+                values = self.column(metric)[mask]
+                finite = ~np.isnan(values)
+                sums = np.bincount(codes[finite], weights=values[finite], minlength=groups)
+                scored = np.bincount(codes[finite], minlength=groups)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    means = sums / scored
+
+        present = np.flatnonzero(counts)
+        if top is not None and top > 0:
+            present = present[np.argsort(-counts[present], kind='stable')[:top]]
+        sizes = [len(key_labels) for key_labels in labels]
+        rows = []
+        for code in present.tolist():
+            row = {}
+            remainder = code
+            for key, key_labels, size in reversed(list(zip(document_keys, labels, sizes))):
+                remainder, index = divmod(remainder, size)
+                row[key] = key_labels[index]
+            row = {key: row[key] for key in keys}
+            row['count'] = int(counts[code])
+            if means is not None:
+                row[metric] = None if np.isnan(means[code]) else round(float(means[code]), 4)
+            rows.append(row)
+        return rows
+
+    def top_threats(self, n=10):
+        """url, processed_at and threat_score of the n highest threat scores"""
+        if n <= 0:
+            return []
+        scores = np.where(self.column('live'), self.column('threat_score'), np.nan)
+        order = np.argsort(-np.nan_to_num(scores, nan=-np.inf), kind='stable')[:n]
+        processed_at = self.column('processed_at')
+        return [
+            {'url': self.urls[row], 'timestamp': str(processed_at[row]), 'threat_score': float(scores[row])}
+            for row in order.tolist() if not np.isnan(scores[row])
+        ]
+
+    def frame(self):
+        """The live rows as a pandas DataFrame, for ad-hoc queries"""
+        import pandas as pd
+
+        live = self.column('live')
+        data = {
+            'url': np.asarray(self.urls[:self.size], dtype=object)[live],
+            'processed_at': self.column('processed_at')[live],
+            'sentiment': pd.Categorical.from_codes(self.column('sentiment')[live], SENTIMENT_LABELS),
+            'polarity': self.column('polarity')[live],
+            'threat_score': self.column('threat_score')[live],
+            'country': pd.Categorical.from_codes(self.column('country')[live], self.countries),
+        }
+        iocs = self.column('iocs')[live]
+        for t, ioc_type in enumerate(IOC_TYPES):
+            data[f'{ioc_type}_count'] = iocs[:, t]
+        return pd.DataFrame(data)
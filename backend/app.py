@@ -1,21 +1,28 @@
-from flask import Flask, request, jsonify, render_template, Response, stream_with_context
+from flask import Flask, request, jsonify, make_response, Response, stream_with_context
 # from helper import generate_plot
 
 from flask_cors import CORS
 from flask_sock import Sock
 import os
-import time
-import pandas as pd
-import plotly.express as px
-import io
-from datetime import datetime
 import base64
 import json
 from dotenv import load_dotenv
 import logging
+from broadcaster import StatusBroadcaster
+from chart_service import DEFAULT_CACHE_DIR as DEFAULT_CHART_CACHE_DIR, ChartService, render_plot
+from collection_store import CollectionStore
+from compression import COMPRESSIBLE_MIMETYPES, MIN_COMPRESS_BYTES, compress, compress_chunks, negotiate_encoding
+from documents import is_processed, load_documents
+from export import FORMATS as EXPORT_FORMATS, IOC_TYPES as EXPORT_IOC_TYPES, arrow_chunks, gzip_chunks, \
+    iter_export_records, json_array_chunks, ndjson_chunks, parse_since
+from ioc_graph import IOCGraph
+from search_index import TrigramIndex, match_document, snippet
+from ioc_index import parse_ioc_query
+from snapshot_file import SHARED_INDEXES, MappedSnapshotStore
 import threading
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import heapq
+from functools import cmp_to_key, wraps
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -52,44 +59,7 @@ logger.info(f"Loading JSON file from: {json_file_path}")
 
 def load_json_data():
     """Load and validate JSON data"""
-    try:
-        if os.path.exists(json_file_path):
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                # If the content is not a valid JSON array, try to fix it
-                if not content.startswith('['):
-                    # Split by newlines and parse each line as a separate JSON object
-                    items = []
-                    for line in content.split('\n'):
-                        line = line.strip()
-                        if line and line.startswith('{') and line.endswith('}'):
-                            try:
-                                items.append(json.loads(line))
-                            except json.JSONDecodeError:
-                                continue
-                    return items
-                return json.loads(content)
-        else:
-            logger.warning("JSON file not found, creating new file")
-            return []
-    except Exception as e:
-        logger.error(f"Error loading JSON file: {str(e)}")
-        # Try to recover by reading line by line
-        try:
-            items = []
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and line.startswith('{') and line.endswith('}'):
-                        try:
-                            items.append(json.loads(line))
-                        except json.JSONDecodeError:
-                            continue
-            logger.info(f"Recovered {len(items)} items from malformed JSON")
-            return items
-        except Exception as e2:
-            logger.error(f"Failed to recover data: {str(e2)}")
-            return []
+    return load_documents(json_file_path)
 
 def save_json_data(data):
     """Save data to JSON file"""
@@ -100,109 +70,229 @@ def save_json_data(data):
     except Exception as e:
         logger.error(f"Error saving JSON file: {str(e)}")
 
-# Load initial data
-collection = load_json_data()
-
-# Cache for storing generated data with TTL
-data_cache = {}
-cache_ttl = 300  # 5 minutes
-last_cache_cleanup = time.time()
-
-# Thread pool for async operations
+# Live view of the export plus the processor's journal. Each request reads
+# store.snapshot once; the refresher swaps in new snapshots copy-on-write.
+# Derived indexes: trigram index for /search, typed IOC indexes for
+# "ip:10.0.0.0/8" style queries, the /visualize aggregates, the recency
+# index behind /monitor and the WebSocket feed, topic posting lists and
+# the columnar projection behind /analytics.
+# With SNAPSHOT_FILE set (production, see gunicorn.conf.py) a separate
+# loader maintains them and every worker maps the same read-only file.
+snapshot_file_path = os.getenv("SNAPSHOT_FILE")
+if snapshot_file_path:
+    store = MappedSnapshotStore(snapshot_file_path)
+else:
+    store = CollectionStore(json_file_path, load_json_data, {'search': TrigramIndex, **SHARED_INDEXES})
+store.start(float(os.getenv("COLLECTION_REFRESH_SECONDS", "5")))
+
+# IOC co-occurrence graph maintained by the processor, reloaded when the file changes
+ioc_graph_path = os.path.join(os.path.dirname(__file__), "data", "ioc_graph.pkl")
+ioc_graph = {'graph': IOCGraph(ioc_graph_path), 'mtime': None}
+ioc_graph_lock = threading.Lock()
+
+def get_ioc_graph():
+    try:
+        mtime = os.path.getmtime(ioc_graph_path)
+    except OSError:
+        return ioc_graph['graph']
+    with ioc_graph_lock:
+        if mtime != ioc_graph['mtime']:
+            logger.info("Loading IOC graph")
+            ioc_graph['graph'] = IOCGraph.load(ioc_graph_path)
+            ioc_graph['mtime'] = mtime
+    return ioc_graph['graph']
+
+# Thread pool for async operations (background chart rendering)
 executor = ThreadPoolExecutor(max_workers=4)
 
-def cleanup_cache():
-    global last_cache_cleanup
-    current_time = time.time()
-    if current_time - last_cache_cleanup > cache_ttl:
-        expired_keys = [k for k, v in data_cache.items() if current_time - v['timestamp'] > cache_ttl]
-        for k in expired_keys:
-            del data_cache[k]
-        last_cache_cleanup = current_time
-
 def generate_plot(data, plot_type="bar", title="Visualization"):
-    if not data:
-        logger.warning("No data provided for plot generation")
+    """Render a chart to a base64 PNG data URI (None on failure)"""
+    png = render_plot(data, plot_type, title)
+    if png is None:
         return None
-        
-    try:
-        df = pd.DataFrame(data)
-        
-        # Further optimize plot generation
-        if len(df) > 100:
-            logger.info(f"Large dataset detected ({len(df)} rows), optimizing plot generation")
-            if plot_type == "bar":
-                df = df.groupby('label')['value'].sum().reset_index()
-            elif plot_type == "map":
-                df = df.sample(min(100, len(df)))
-        
-        # Use simpler plot configurations
-        if plot_type == "bar":
-            fig = px.bar(
-                df, 
-                x='label', 
-                y='value', 
-                title=title,
-                template='plotly_white',
-                width=600,
-                height=400
-            )
-        elif plot_type == "pie":
-            fig = px.pie(
-                df, 
-                names='label', 
-                values='value', 
-                title=title,
-                template='plotly_white',
-                width=600,
-                height=400
-            )
-        elif plot_type == "map":
-            if df.empty:
-                logger.warning("Empty DataFrame for map plot")
-                return None
-            fig = px.scatter_geo(
-                df, 
-                lat='latitude', 
-                lon='longitude', 
-                hover_name='ip', 
-                title=title,
-                template='plotly_white',
-                width=600,
-                height=400
-            )
+    encoded = base64.b64encode(png).decode('utf-8')
+    return f"data:image/png;base64,{encoded}"
+
+# Rendered chart images, keyed by a hash of their data and prerendered on every new snapshot
+chart_service = ChartService(executor, cache_dir=os.getenv("CHART_CACHE_DIR", DEFAULT_CHART_CACHE_DIR))
+CHART_TYPES = {'iocs': 'bar', 'sentiment': 'pie', 'geolocation': 'map', 'timeline': 'bar'}
+# Retry-After for /visualize/chart when a first render outlasts the wait
+CHART_RETRY_SECONDS = int(os.getenv("CHART_RETRY_SECONDS", "5"))
+
+def chart_inputs(snap, viz_type):
+    """generate_plot rows, plot type and title for one /visualize type"""
+    payload = snap.indexes['aggregates'].payload(viz_type)
+    if viz_type in ('iocs', 'sentiment'):
+        rows = [
+            {'label': label, 'value': value}
+            for label, value in zip(payload.get('labels', []), payload['datasets'][0]['data'])
+        ]
+    elif viz_type == 'geolocation':
+        rows = [
+            {'latitude': p['lat'], 'longitude': p['lng'], 'ip': f"{p['city']}, {p['country']}"}
+            for p in payload.get('points', [])
+        ]
+    else:
+        rows = [{'label': date, 'value': len(payload['threats'][date])} for date in payload.get('dates', [])]
+    return rows, CHART_TYPES[viz_type], payload['title']
+
+def prerender_charts(snap):
+    for viz_type in CHART_TYPES:
+        rows, plot_type, title = chart_inputs(snap, viz_type)
+        if rows:
+            chart_service.prerender(viz_type, rows, plot_type, title)
+
+if os.getenv("CHART_PRERENDER", "1") != "0":
+    store.add_listener(prerender_charts)
+    prerender_charts(store.snapshot)
+
+def conditional(view):
+    """ETag the view's response with the collection version and answer a
+    matching If-None-Match with 304, so idle polls transfer no body
+
+    The tag is taken before the view reads the snapshot, so it is never
+    newer than the data in the body.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = store.snapshot.etag
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
         else:
-            fig = px.histogram(
-                df, 
-                x='label', 
-                y='value', 
-                title=title,
-                template='plotly_white',
-                width=600,
-                height=400
-            )
-        
-        # Optimize image generation
-        img = io.BytesIO()
-        fig.write_image(
-            img, 
-            format='png',
-            scale=1,
-            engine='kaleido'
-        )
-        img.seek(0)
-        encoded = base64.b64encode(img.read()).decode('utf-8')
-        return f"data:image/png;base64,{encoded}"
-    except Exception as e:
-        logger.error(f"Error generating plot: {str(e)}")
-        return None
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        # Weak: the gzip, br and identity encodings share the tag
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
+    return wrapper
+
+@app.after_request
+def compress_response(response):
+    """gzip/br-encode buffered text responses per the request's Accept-Encoding"""
+    if response.status_code != 200 or response.direct_passthrough or response.is_streamed \
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.content_length or 0) < MIN_COMPRESS_BYTES:
+        return response
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
 
 @app.route('/')
 def home():
     return "DarkWeb Intelligence API is Running"
 
+# /search returns one page of slim results; full text is fetched from /documents/<doc_id>
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "100"))
+SEARCH_DEFAULT_FIELDS = ('id', 'url', 'title', 'timestamp', 'snippet', 'highlights',
+                         'sentiment', 'topics', 'iocs', 'matches')
+SEARCH_FIELDS = SEARCH_DEFAULT_FIELDS + ('clean_text',)
+
+def encode_cursor(*values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return tuple(values)
+
+def compare_hits(a, b):
+    """Result order: exact URL matches first, then newest first, then by id"""
+    if a[0] != b[0]:
+        return -1 if a[0] < b[0] else 1
+    if a[1] != b[1]:
+        return -1 if a[1] > b[1] else 1
+    if a[2] != b[2]:
+        return -1 if a[2] < b[2] else 1
+    return 0
+
+def search_result(doc_id, doc, matches, query, fields):
+    processed = doc.get('nlp_processed', {})
+    result = {}
+    if 'id' in fields:
+        result['id'] = doc_id
+    for field, value in (
+        ('url', lambda: doc.get('url', '')),
+        ('title', lambda: doc.get('title', '')),
+        ('timestamp', lambda: doc.get('processed_at', '')),
+        ('clean_text', lambda: doc.get('clean_text', '')),
+        ('sentiment', lambda: processed.get('sentiment', {})),
+        ('topics', lambda: processed.get('topics', [])),
+        ('iocs', lambda: processed.get('iocs', {})),
+        ('matches', lambda: matches),
+    ):
+        if field in fields:
+            result[field] = value()
+    if 'snippet' in fields or 'highlights' in fields:
+        text, highlights = snippet(doc.get('clean_text', ''), query if matches.get('content') else '')
+        if 'snippet' in fields:
+            result['snippet'] = text
+        if 'highlights' in fields:
+            result['highlights'] = highlights
+    return result
+
+def text_search(snap, query):
+    """Substring search; returns [(rank, timestamp, doc_id, doc, matches)], rank 0 for exact URL matches"""
+    documents_by_id = snap.documents_by_id
+    # The trigram index narrows the scan to documents containing every
+    # trigram of the query; queries under 3 characters still scan
+    candidate_ids = snap.indexes['search'].candidates(query)
+    if candidate_ids is None:
+        candidates = documents_by_id.items()
+    else:
+        candidates = [(doc_id, documents_by_id[doc_id]) for doc_id in candidate_ids if doc_id in documents_by_id]
+
+    hits = []
+    for doc_id, doc in candidates:
+        # Skip documents without nlp_processed or with boolean nlp_processed
+        if not is_processed(doc):
+            continue
+        matches = match_document(doc, query)
+        if matches is None:
+            continue
+        # Exact URL match should have highest priority
+        rank = 0 if query == str(doc.get('url', '') or '').lower() else 1
+        hits.append((rank, str(doc.get('processed_at', '') or ''), doc_id, doc, matches))
+    return hits
+
+def ioc_search(snap, ioc_type, pattern):
+    """Typed IOC lookup; same hit tuples as text_search"""
+    hits = []
+    for doc_id, values in snap.indexes['iocs'].query(ioc_type, pattern).items():
+        doc = snap.documents_by_id.get(doc_id)
+        if doc is None:
+            continue
+        matches = {
+            'content': False,
+            'title': False,
+            'url': False,
+            'iocs': [f"{ioc_type}: {value}" for value in values],
+            'topics': []
+        }
+        hits.append((1, str(doc.get('processed_at', '') or ''), doc_id, doc, matches))
+    return hits
+
 @app.route('/search', methods=['GET'])
 def search():
+    """Substring or typed IOC search, paginated with ?limit=&cursor=
+
+    Results carry a highlighted snippet instead of the full text; pass
+    ?fields=url,title,clean_text,... to choose the returned fields and
+    use /documents/<id> for the full document.
+    """
     try:
         query = request.args.get('query', '')
         if not query:
@@ -210,88 +300,52 @@ def search():
                 "status": "error",
                 "message": "No search query provided"
             }), 400
-            
+
+        limit = max(1, min(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), SEARCH_MAX_PAGE_SIZE))
+        fields = SEARCH_DEFAULT_FIELDS
+        if request.args.get('fields'):
+            fields = tuple(f for f in request.args['fields'].split(',') if f in SEARCH_FIELDS)
+        try:
+            after = decode_cursor(request.args['cursor'], 3) if request.args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
         print(f"🔍 Processing search query: {query}")
         query = str(query).lower()  # Ensure query is a string
-        results = []
-        
-        for doc in collection:
-            # Skip documents without nlp_processed or with boolean nlp_processed
-            if not doc.get('nlp_processed') or not isinstance(doc.get('nlp_processed'), dict):
-                continue
-
-            # Search in various fields with null checks
-            content = str(doc.get('clean_text', '') or '').lower()
-            title = str(doc.get('title', '') or '').lower()
-            url = str(doc.get('url', '') or '').lower()
-            
-            # Search in IOCs
-            iocs = doc.get('nlp_processed', {}).get('iocs', {})
-            ioc_matches = []
-            for ioc_type, ioc_list in iocs.items():
-                if isinstance(ioc_list, list):
-                    for ioc in ioc_list:
-                        if ioc and query in str(ioc).lower():
-                            ioc_matches.append(f"{ioc_type}: {ioc}")
-
-            # Search in topics
-            topics = doc.get('nlp_processed', {}).get('topics', [])
-            topic_matches = [topic for topic in topics if topic and query in str(topic).lower()]
-
-            # Exact URL match should have highest priority
-            if query == url:
-                print(f"✅ Found exact URL match: {url}")
-                results.insert(0, {
-                    'url': doc.get('url', ''),
-                    'title': doc.get('title', ''),
-                    'timestamp': doc.get('processed_at', ''),
-                    'clean_text': doc.get('clean_text', ''),
-                    'sentiment': doc.get('nlp_processed', {}).get('sentiment', {}),
-                    'topics': doc.get('nlp_processed', {}).get('topics', []),
-                    'iocs': doc.get('nlp_processed', {}).get('iocs', {}),
-                    'matches': {
-                        'content': query in content,
-                        'title': query in title,
-                        'url': True,
-                        'iocs': ioc_matches,
-                        'topics': topic_matches
-                    }
-                })
-                continue
-
-            # If query found in any field
-            if (query in content or query in title or query in url or 
-                ioc_matches or topic_matches):
-                print(f"✅ Found match in document: {url}")
-                results.append({
-                    'url': doc.get('url', ''),
-                    'title': doc.get('title', ''),
-                    'timestamp': doc.get('processed_at', ''),
-                    'clean_text': doc.get('clean_text', ''),
-                    'sentiment': doc.get('nlp_processed', {}).get('sentiment', {}),
-                    'topics': doc.get('nlp_processed', {}).get('topics', []),
-                    'iocs': doc.get('nlp_processed', {}).get('iocs', {}),
-                    'matches': {
-                        'content': query in content,
-                        'title': query in title,
-                        'url': query in url,
-                        'iocs': ioc_matches,
-                        'topics': topic_matches
-                    }
-                })
-
-        print(f"📊 Found {len(results)} results")
-        
-        # Sort results by timestamp (except for exact URL matches which stay at top)
-        if len(results) > 1:
-            results[1:] = sorted(results[1:], key=lambda x: x.get('timestamp', ''), reverse=True)
+
+        snap = store.snapshot
+        typed = parse_ioc_query(query)
+        if typed:
+            try:
+                hits = ioc_search(snap, *typed)
+            except ValueError as e:
+                return jsonify({
+                    "status": "error",
+                    "message": f"Invalid {typed[0]} query: {str(e)}"
+                }), 400
+        else:
+            hits = text_search(snap, query)
+        total = len(hits)
+
+        # Only the requested page is sorted and serialized
+        if after is not None:
+            hits = [hit for hit in hits if compare_hits(hit, after) > 0]
+        page = heapq.nsmallest(limit + 1, hits, key=cmp_to_key(compare_hits))
+        next_cursor = encode_cursor(*page[limit - 1][:3]) if len(page) > limit else None
+        results = [
+            search_result(doc_id, doc, matches, query, fields)
+            for _, _, doc_id, doc, matches in page[:limit]
+        ]
+        print(f"📊 Found {total} results")
 
         return jsonify({
             "status": "success",
             "data": {
                 "query": query,
                 "results": results,
-                "total": len(results)
+                "total": total,
+                "limit": limit,
+                "next_cursor": next_cursor
             }
         })
 
@@ -302,31 +356,57 @@ def search():
             "message": f"Error processing search: {str(e)}"
         }), 500
 
+@app.route('/documents/<doc_id>', methods=['GET'])
+def get_document(doc_id):
+    """Full text and NLP results of one document (raw HTML excluded)"""
+    doc = store.snapshot.documents_by_id.get(doc_id)
+    if doc is None:
+        return jsonify({
+            "status": "error",
+            "message": f"Document not found: {doc_id}"
+        }), 404
+    processed = doc.get('nlp_processed')
+    return jsonify({
+        "status": "success",
+        "data": {
+            'id': doc_id,
+            'url': doc.get('url', ''),
+            'title': doc.get('title', ''),
+            'timestamp': doc.get('processed_at', ''),
+            'clean_text': doc.get('clean_text', ''),
+            'nlp_processed': processed if isinstance(processed, dict) else {}
+        }
+    })
+
 @app.route('/visualize')
+@conditional
 def visualize():
+    """Chart data from the aggregates maintained with each snapshot
+
+    The response carries the snapshot version; clients can pass it back
+    as ?version= and get {"status": "not_modified"} while it is current.
+    """
     try:
         viz_type = request.args.get('type', 'iocs')
         logger.info(f"Processing visualization request for type: {viz_type}")
-        
-        # Check cache first
-        cache_key = f"viz_{viz_type}"
-        if cache_key in data_cache:
-            cache_time = time.time() - data_cache[cache_key]['timestamp']
-            if cache_time < cache_ttl:
-                logger.info(f"Returning cached data for {viz_type}")
-                return jsonify(data_cache[cache_key]['data'])
-        
-        # Process visualization data
-        result = process_visualization_data(viz_type)
-        
-        # Cache the result
-        data_cache[cache_key] = {
-            'data': result,
-            'timestamp': time.time()
-        }
-        
-        return jsonify(result)
-        
+
+        snap = store.snapshot
+        if request.args.get('version', type=int) == snap.version:
+            return jsonify({"status": "not_modified", "version": snap.version})
+
+        data = snap.indexes['aggregates'].payload(viz_type)
+        if data is None:
+            logger.warning(f"Invalid visualization type: {viz_type}")
+            return jsonify({
+                "status": "error",
+                "message": f"Invalid visualization type: {viz_type}"
+            })
+        return jsonify({
+            "status": "success",
+            "version": snap.version,
+            "data": data
+        })
+
     except Exception as e:
         logger.error(f"Error in visualization endpoint: {str(e)}")
         return jsonify({
@@ -334,229 +414,94 @@ def visualize():
             "message": f"Error processing visualization: {str(e)}"
         })
 
-def process_visualization_data(viz_type):
+@app.route('/visualize/chart')
+def visualize_chart():
+    """PNG chart for a /visualize type, served from the render cache with an ETag
+
+    While a chart for new data is rendering the previous image is served
+    with X-Chart-Stale: 1.
+    """
+    viz_type = request.args.get('type', 'iocs')
+    if viz_type not in CHART_TYPES:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid visualization type: {viz_type}"
+        }), 400
+    rows, plot_type, title = chart_inputs(store.snapshot, viz_type)
+    if not rows:
+        return jsonify({
+            "status": "error",
+            "message": f"No {viz_type} data available"
+        }), 404
+
     try:
-        logger.info(f"Processing visualization data for type: {viz_type}")
-        
-        # Get total document count
-        total_docs = len(collection)
-        logger.info(f"Total documents in collection: {total_docs}")
-        
-        # Get count of documents with nlp_processed field
-        processed_docs = len([doc for doc in collection if doc.get('nlp_processed') and isinstance(doc.get('nlp_processed'), dict)])
-        logger.info(f"Documents with nlp_processed field: {processed_docs}")
-        
-        if processed_docs == 0:
-            logger.warning("No processed documents found")
-            return {
-                "status": "success",
-                "data": {
-                    "type": viz_type,
-                    "title": f"No {viz_type} data available",
-                    "labels": [],
-                    "datasets": [{"data": []}]
-                }
-            }
-        
-        if viz_type == "iocs":
-            logger.info("Processing IOCs data")
-            # Get counts of all IOC types
-            ioc_counts = {
-                'ips': 0,
-                'domains': 0,
-                'emails': 0,
-                'cve': 0,
-                'malware': 0,
-                'hacker': 0
-            }
-            
-            # Process in batches to avoid memory issues
-            batch_size = 100
-            for i in range(0, len(collection), batch_size):
-                batch = collection[i:i + batch_size]
-                for doc in batch:
-                    if doc.get('nlp_processed') and isinstance(doc.get('nlp_processed'), dict):
-                        iocs = doc['nlp_processed'].get('iocs', {})
-                        if isinstance(iocs, dict):
-                            ioc_counts['ips'] += len(iocs.get('ips', []))
-                            ioc_counts['domains'] += len(iocs.get('domains', []))
-                            ioc_counts['emails'] += len(iocs.get('emails', []))
-                            ioc_counts['cve'] += len(iocs.get('cve', []))
-                            ioc_counts['malware'] += len(iocs.get('malware', []))
-                            ioc_counts['hacker'] += len(iocs.get('hacker', []))
-            
-            return {
-                "status": "success",
-                "data": {
-                    "type": "bar",
-                    "title": "IOCs Distribution",
-                    "labels": ["IPs", "Domains", "Emails", "CVEs", "Malware", "Hackers"],
-                    "datasets": [{
-                        "label": "Count",
-                        "data": [
-                            ioc_counts['ips'],
-                            ioc_counts['domains'],
-                            ioc_counts['emails'],
-                            ioc_counts['cve'],
-                            ioc_counts['malware'],
-                            ioc_counts['hacker']
-                        ],
-                        "backgroundColor": ["#3b82f6", "#10b981", "#f59e0b", "#ef4444", "#8b5cf6", "#ec4899"]
-                    }]
-                }
-            }
-            
-        elif viz_type == "sentiment":
-            logger.info("Processing sentiment data")
-            # Get sentiment distribution
-            sentiment_counts = {
-                'positive': 0,
-                'neutral': 0,
-                'negative': 0
-            }
-            
-            # Process in batches
-            batch_size = 100
-            for i in range(0, len(collection), batch_size):
-                batch = collection[i:i + batch_size]
-                for doc in batch:
-                    if doc.get('nlp_processed') and isinstance(doc.get('nlp_processed'), dict):
-                        sentiment = doc['nlp_processed'].get('sentiment', {})
-                        if isinstance(sentiment, dict):
-                            label = sentiment.get('label', 'neutral')
-                            sentiment_counts[label] += 1
-            
-            return {
-                "status": "success",
-                "data": {
-                    "type": "pie",
-                    "title": "Sentiment Distribution",
-                    "labels": ["Positive", "Neutral", "Negative"],
-                    "datasets": [{
-                        "data": [
-                            sentiment_counts['positive'],
-                            sentiment_counts['neutral'],
-                            sentiment_counts['negative']
-                        ],
-                        "backgroundColor": ["#10b981", "#f59e0b", "#ef4444"]
-                    }]
-                }
-            }
-            
-        elif viz_type == "geolocation":
-            logger.info("Processing geolocation data")
-            points = []
-            
-            # Process in batches
-            batch_size = 100
-            for i in range(0, len(collection), batch_size):
-                batch = collection[i:i + batch_size]
-                for doc in batch:
-                    if doc.get('nlp_processed') and isinstance(doc.get('nlp_processed'), dict):
-                        geolocation = doc['nlp_processed'].get('geolocation', [])
-                        if isinstance(geolocation, list):
-                            for geo in geolocation:
-                                if isinstance(geo, dict) and geo.get('latitude') and geo.get('longitude'):
-                                    points.append({
-                                        'lat': geo['latitude'],
-                                        'lng': geo['longitude'],
-                                        'country': geo.get('country', 'Unknown'),
-                                        'city': geo.get('city', 'Unknown'),
-                                        'timestamp': doc.get('processed_at', '')
-                                    })
-            
-            return {
-                "status": "success",
-                "data": {
-                    "type": "map",
-                    "title": "Geolocation Distribution",
-                    "points": points
-                }
-            }
-            
-        elif viz_type == "timeline":
-            logger.info("Processing timeline data")
-            # Group threats by date
-            threats_by_date = {}
-            
-            # Process in batches
-            batch_size = 100
-            for i in range(0, len(collection), batch_size):
-                batch = collection[i:i + batch_size]
-                for doc in batch:
-                    if doc.get('nlp_processed') and isinstance(doc.get('nlp_processed'), dict):
-                        date = doc.get('processed_at', '').split('T')[0]
-                        if date:
-                            if date not in threats_by_date:
-                                threats_by_date[date] = []
-                            
-                            threat = {
-                                'url': doc.get('url', ''),
-                                'title': doc.get('title', ''),
-                                'sentiment': doc['nlp_processed'].get('sentiment', {}),
-                                'topics': doc['nlp_processed'].get('topics', []),
-                                'iocs': doc['nlp_processed'].get('iocs', {})
-                            }
-                            threats_by_date[date].append(threat)
-            
-            # Sort dates
-            sorted_dates = sorted(threats_by_date.keys())
-            
-            return {
-                "status": "success",
-                "data": {
-                    "type": "timeline",
-                    "title": "Threat Timeline",
-                    "dates": sorted_dates,
-                    "threats": threats_by_date
-                }
-            }
-            
-        else:
-            logger.warning(f"Invalid visualization type: {viz_type}")
-            return {
-                "status": "error",
-                "message": f"Invalid visualization type: {viz_type}"
-            }
-            
-    except Exception as e:
-        logger.error(f"Error processing visualization data: {str(e)}")
-        return {
+        png, etag, stale = chart_service.request(viz_type, rows, plot_type, title)
+    except FuturesTimeoutError:
+        response = jsonify({
+            "status": "pending",
+            "message": f"The {viz_type} chart is still rendering, retry shortly"
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(CHART_RETRY_SECONDS)
+        return response
+    if png is None:
+        return jsonify({
             "status": "error",
-            "message": f"Error processing visualization data: {str(e)}"
-        }
+            "message": f"Failed to render {viz_type} chart"
+        }), 500
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(png, mimetype='image/png')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    if stale:
+        response.headers['X-Chart-Stale'] = '1'
+    return response
+
+@app.route('/analytics', methods=['GET'])
+@conditional
+def analytics():
+    """Vectorized group-by over the columnar projection of processed documents
+
+    ?group_by=date | country | sentiment | ioc_type, or two of them
+    comma-separated (e.g. country,sentiment); ?metric=count (default) |
+    threat_score | polarity adds the group mean; ?top=N keeps the N
+    largest groups. ?top_threats=N lists the highest threat scores instead.
+    """
+    snap = store.snapshot
+    columns = snap.indexes['analytics']
+    top_threats = request.args.get('top_threats', type=int)
+    if top_threats is not None:
+        top_threats = max(1, min(top_threats, SEARCH_MAX_PAGE_SIZE))
+        return jsonify({"status": "success", "threats": columns.top_threats(top_threats)})
+
+    keys = [key.strip() for key in request.args.get('group_by', 'date').split(',') if key.strip()]
+    top = request.args.get('top', type=int)
+    if top is not None:
+        top = max(1, top)
+    try:
+        rows = columns.group(keys, request.args.get('metric', 'count'), top)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "success", "group_by": keys, "rows": rows})
 
 @app.route('/monitor', methods=['GET'])
+@conditional
 def monitor():
     try:
-        # Get document statistics
-        total_docs = len(collection)
-        processed_docs = len([doc for doc in collection if doc.get('nlp_processed') and isinstance(doc.get('nlp_processed'), dict)])
-        pending_docs = total_docs - processed_docs
-
-        # Get latest threats
-        latest_threats = []
-        for doc in collection:
-            if doc.get('nlp_processed') and isinstance(doc.get('nlp_processed'), dict):
-                # Create a copy of the document with only needed fields
-                threat = {
-                    'url': doc.get('url', ''),
-                    'timestamp': doc.get('processed_at', ''),
-                    'iocs': doc.get('nlp_processed', {}).get('iocs', {}),
-                    'sentiment': doc.get('nlp_processed', {}).get('sentiment', {}),
-                    'topics': doc.get('nlp_processed', {}).get('topics', [])
-                }
-                latest_threats.append(threat)
-
-        # Sort by timestamp
-        latest_threats.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-        latest_threats = latest_threats[:10]
+        # Running totals and the recency index keep this O(10)
+        snap = store.snapshot
+        recency = snap.indexes['recency']
+        total_docs = len(snap.collection)
+        processed_docs = recency.processed
 
         return jsonify({
             'total_docs': total_docs,
             'processed_docs': processed_docs,
-            'pending_docs': pending_docs,
-            'threats': latest_threats
+            'skipped_docs': recency.skipped,
+            'pending_docs': recency.pending(total_docs),
+            'threats': recency.latest(10, snap.documents_by_id)
         })
     except Exception as e:
         logger.error(f"Error in monitor endpoint: {str(e)}")
@@ -566,74 +511,193 @@ def monitor():
         }), 500
 
 @app.route('/topics', methods=['GET'])
+@conditional
 def get_topics():
-    latest = sorted(collection, key=lambda x: x.get('processed_at', ''), reverse=True)[:1]
-    if not latest or 'topics' not in latest[0].get('nlp_processed', {}):
-        return jsonify({'topics': {}})
-    return jsonify({'topics': latest[0]['nlp_processed']['topics']})
+    """Topics of the most recently processed document, plus per-topic document counts"""
+    snap = store.snapshot
+    counts = snap.indexes['topics'].counts()
+    latest = snap.indexes['recency'].entries[-1:]
+    doc = snap.documents_by_id.get(latest[0][1], {}) if latest else {}
+    if 'topics' not in doc.get('nlp_processed', {}):
+        return jsonify({'topics': {}, 'counts': counts})
+    return jsonify({'topics': doc['nlp_processed']['topics'], 'counts': counts})
+
+TOPIC_PREVIEW_CHARS = 250
 
 @app.route('/topics/<topic_id>', methods=['GET'])
 def get_topic_documents(topic_id):
-    documents = [
-        doc for doc in collection
-        if doc.get('nlp_processed') and topic_id in doc['nlp_processed'].get('topics', [])
-    ]
-    return jsonify({'documents': documents})
+    """Newest-first slim documents for a topic word (or model topic id)
+
+    Paginated with ?limit= and the returned next_cursor.
+    """
+    snap = store.snapshot
+    limit = max(1, min(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), SEARCH_MAX_PAGE_SIZE))
+    try:
+        after = decode_cursor(request.args['cursor'], 2) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    index = snap.indexes['topics']
+    doc_ids, last = index.page(topic_id, limit, after)
+    documents = []
+    for doc_id in doc_ids:
+        doc = snap.documents_by_id[doc_id]
+        processed = doc.get('nlp_processed', {})
+        documents.append({
+            'id': doc_id,
+            'url': doc.get('url', ''),
+            'title': doc.get('title', ''),
+            'processed_at': doc.get('processed_at', ''),
+            'preview': (doc.get('clean_text', '') or '')[:TOPIC_PREVIEW_CHARS],
+            'sentiment': processed.get('sentiment', {}),
+            'topics': processed.get('topics', []),
+            'iocs': processed.get('iocs', {})
+        })
+    return jsonify({
+        'documents': documents,
+        'total': len(index.postings(topic_id)),
+        'limit': limit,
+        'next_cursor': encode_cursor(*last) if last else None
+    })
+
+def processor_status():
+    """Counts and the latest threats shown on the dashboard"""
+    snap = store.snapshot
+    recency = snap.indexes['recency']
+    return {
+        'processed': recency.processed,
+        'skipped': recency.skipped,
+        'pending': recency.pending(len(snap.collection)),
+        'latest_threats': recency.latest(5, snap.documents_by_id)
+    }
+
+# One publisher for every /ws/processor client; recomputes only when the snapshot changes
+status_broadcaster = StatusBroadcaster(
+    processor_status,
+    lambda: store.snapshot.version,
+    interval=float(os.getenv("WS_STATUS_INTERVAL", "1")),
+    queue_size=int(os.getenv("WS_CLIENT_QUEUE_SIZE", "8"))
+)
+WS_HEARTBEAT_SECONDS = 30
 
 @sock.route('/ws/processor')
 def processor_ws(ws):
-    while True:
-        try:
-            total = len(collection)
-            processed = len([doc for doc in collection if doc.get('nlp_processed') and isinstance(doc.get('nlp_processed'), dict)])
-            
-            # Get latest threats
-            latest_threats = []
-            for doc in collection:
-                if doc.get('nlp_processed') and isinstance(doc.get('nlp_processed'), dict):
-                    # Create a copy of the document with only needed fields
-                    threat = {
-                        'url': doc.get('url', ''),
-                        'timestamp': doc.get('processed_at', ''),
-                        'iocs': doc.get('nlp_processed', {}).get('iocs', {}),
-                        'sentiment': doc.get('nlp_processed', {}).get('sentiment', {}),
-                        'topics': doc.get('nlp_processed', {}).get('topics', [])
-                    }
-                    latest_threats.append(threat)
-
-            # Sort by timestamp
-            latest_threats.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-            latest_threats = latest_threats[:5]
-
-            ws.send(json.dumps({
-                'type': 'status_update',
-                'data': {
-                    'processed': processed,
-                    'pending': total - processed,
-                    'latest_threats': latest_threats
-                }
-            }))
-            time.sleep(5)
-        except Exception as e:
-            logger.error(f"WebSocket error: {str(e)}")
-            break
+    subscription = status_broadcaster.subscribe()
+    try:
+        while True:
+            message = subscription.get(timeout=WS_HEARTBEAT_SECONDS)
+            # The heartbeat also detects clients that went away while idle
+            ws.send(message if message is not None else json.dumps({'type': 'heartbeat'}))
+    except Exception as e:
+        logger.error(f"WebSocket error: {str(e)}")
+    finally:
+        status_broadcaster.unsubscribe(subscription)
+
+@app.route('/iocs/related', methods=['GET'])
+def related_iocs():
+    """Pages and indicators that co-occur with one IOC, e.g. ?type=ips&value=1.2.3.4"""
+    try:
+        ioc_type = request.args.get('type', '')
+        value = request.args.get('value', '')
+        if not ioc_type or not value:
+            return jsonify({
+                "status": "error",
+                "message": "Both type and value are required"
+            }), 400
+        types = [t for t in request.args.get('types', '').split(',') if t] or None
+        limit = request.args.get('limit', 50, type=int)
+
+        graph = get_ioc_graph()
+        documents_by_id = store.snapshot.documents_by_id
+        documents = []
+        for doc_id in graph.documents(ioc_type, value)[:limit]:
+            doc = documents_by_id.get(doc_id, {})
+            documents.append({
+                'id': doc_id,
+                'url': doc.get('url', ''),
+                'title': doc.get('title', ''),
+                'timestamp': doc.get('processed_at', '')
+            })
+        related = [
+            {'type': key.split(':', 1)[0], 'value': key.split(':', 1)[1], 'shared_documents': count}
+            for key, count in graph.cooccurring(ioc_type, value, types=types, limit=limit)
+        ]
+        return jsonify({
+            "status": "success",
+            "data": {
+                "ioc": {"type": ioc_type, "value": value},
+                "documents": documents,
+                "related": related
+            }
+        })
+    except Exception as e:
+        logger.error(f"Error in related IOCs endpoint: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": f"Error querying IOC graph: {str(e)}"
+        }), 500
 
 @app.route('/export', methods=['GET'])
+@conditional
 def export_all_data():
-    # Only include processed docs
-    export_data = [
-        {
-            "url": doc.get("url", ""),
-            "timestamp": doc.get("processed_at", ""),
-            "sentiment": doc.get("nlp_processed", {}).get("sentiment", {}),
-            "topics": doc.get("nlp_processed", {}).get("topics", []),
-            "iocs": doc.get("nlp_processed", {}).get("iocs", {}),
-            "geolocation": doc.get("nlp_processed", {}).get("geolocation", []),
-        }
-        for doc in collection
-        if doc.get("nlp_processed") and isinstance(doc.get("nlp_processed"), dict)
-    ]
-    return jsonify(export_data)
+    """Stream processed documents without materializing the export
+
+    ?format=json (default, one JSON array) | ndjson | parquet | arrow
+    ?gzip=1 downloads json/ndjson as a .gz file, otherwise they are
+    compressed per Accept-Encoding; ?since=<ISO timestamp> and
+    ?ioc_type=<type> restrict the export to new or matching documents.
+    """
+    fmt = request.args.get('format', 'json')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({
+            "status": "error",
+            "message": f"Unsupported export format: {fmt}"
+        }), 400
+    ioc_type = request.args.get('ioc_type') or None
+    if ioc_type and ioc_type not in EXPORT_IOC_TYPES:
+        return jsonify({
+            "status": "error",
+            "message": f"Unknown IOC type: {ioc_type}"
+        }), 400
+    try:
+        since = parse_since(request.args.get('since'))
+    except ValueError:
+        return jsonify({
+            "status": "error",
+            "message": "since must be an ISO date or timestamp"
+        }), 400
+
+    # The snapshot is immutable, so the stream stays consistent while it is read
+    records = iter_export_records(store.snapshot.collection, since=since, ioc_type=ioc_type)
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    if fmt in ('parquet', 'arrow'):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return jsonify({
+                "status": "error",
+                "message": f"{fmt} export requires pyarrow (pip install pyarrow)"
+            }), 501
+        chunks = arrow_chunks(records, fmt)
+    elif fmt == 'ndjson':
+        chunks = ndjson_chunks(records)
+    else:
+        chunks = json_array_chunks(records)
+
+    headers = {}
+    if request.args.get('gzip') in ('1', 'true') and fmt in ('json', 'ndjson'):
+        chunks = gzip_chunks(chunks)
+        mimetype = 'application/gzip'
+        extension += '.gz'
+    elif fmt in ('json', 'ndjson'):
+        # Transfer compression, negotiated per request; the client sees plain JSON
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        if encoding:
+            chunks = compress_chunks(chunks, encoding)
+            headers['Content-Encoding'] = encoding
+    if fmt != 'json' or 'gzip' in extension:
+        headers['Content-Disposition'] = f'attachment; filename="threat_intel_export.{extension}"'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
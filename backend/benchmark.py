@@ -0,0 +1,877 @@
+"""Performance checks for the NLP processor.
+
+    python benchmark.py stages --sizes 1000,10000,100000 --output report.json
+    python benchmark.py compare baseline.json report.json --threshold 0.15
+    python benchmark.py ner --size-mb 5 --workers 4
+    python benchmark.py ner --size-mb 5 --workers 4 --unchunked
+    python benchmark.py sentiment --docs 2000
+    python benchmark.py graph --indicators 1000000
+    python benchmark.py search --sizes 10000,100000
+    python benchmark.py workers --docs 20000 --counts 1,2,4
+    python benchmark.py analytics --sizes 100000
+    python benchmark.py workers --pid <gunicorn master pid>
+
+The stages benchmark runs DarkWebNLP over a deterministic synthetic corpus
+with stubbed OTX/AbuseIPDB clients, so it needs no scraped data or API keys.
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import ipaddress
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from stage_profiler import percentile
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+FORUM_SENTENCES = [
+    "Selling fresh database dump from a European retailer, 2M rows with emails and hashes.",
+    "The Lazarus Group crew is rumored to be behind the latest breach.",
+    "Escrow only, contact the vendor over PGP before sending any BTC.",
+    "New loader bypasses most AV, DM for a test build of the RAT.",
+    "Admins of Dread confirmed the exploit for CVE-2023-4863 is real.",
+    "Payment accepted to bc1qxy2kgdygjrsqtzq2n0yrf2493p83kkfjhx0wlh only.",
+    "Mirror is up at 185.220.101.4, old domain market-mirror.onion is seized.",
+    "Reply from admin@securemail.cc: refunds are handled within 48 hours.",
+]
+
+
+def synthetic_page(size_chars, seed=0):
+    """Forum-thread-like text of roughly size_chars characters"""
+    rng = random.Random(seed)
+    paragraphs = []
+    total = 0
+    while total < size_chars:
+        paragraph = " ".join(rng.choice(FORUM_SENTENCES) for _ in range(rng.randint(2, 12)))
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:size_chars]
+
+
+FILLER_WORDS = [
+    'vendor', 'market', 'escrow', 'shipping', 'review', 'price', 'listing', 'forum', 'thread',
+    'reply', 'account', 'database', 'dump', 'fullz', 'cvv', 'wallet', 'mixer', 'tutorial',
+    'service', 'support', 'the', 'a', 'is', 'for', 'with', 'new', 'good', 'bad', 'fast',
+    'reliable', 'scam', 'trusted', 'exploit', 'leak', 'attack', 'malware', 'breach', 'hack',
+    'vulnerability', 'compromise', 'ransomware', 'botnet', 'crypter', 'loader', 'stealer',
+]
+BECH32_CHARS = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+
+
+def _synthetic_iocs(rng):
+    """One random indicator of each kind"""
+    octets = [rng.randint(1, 223), rng.randint(0, 255), rng.randint(0, 255), rng.randint(1, 254)]
+    user = ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+    onion = ''.join(rng.choices(string.ascii_lowercase + '234567', k=56))
+    return [
+        '.'.join(map(str, octets)),
+        f"192.168.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+        f"{user}@{rng.choice(['protonmail.com', 'cock.li', 'tutanota.com', 'securemail.cc'])}",
+        f"{onion}.onion",
+        f"{user}-{rng.choice(['shop', 'market', 'forum'])}.{rng.choice(['com', 'net', 'io', 'ru'])}",
+        'bc1q' + ''.join(rng.choices(BECH32_CHARS, k=38)),
+        '0x' + ''.join(rng.choices('0123456789abcdef', k=40)),
+        f"CVE-{rng.randint(2015, 2025)}-{rng.randint(1000, 99999)}",
+    ]
+
+
+def synthetic_document(index, size_chars=2000, seed=0):
+    """Deterministic fake scraped page seeded with IOCs and threat keywords"""
+    rng = random.Random(seed * 1_000_003 + index)
+    parts = []
+    total = 0
+    while total < size_chars:
+        sentence = ' '.join(rng.choices(FILLER_WORDS, k=rng.randint(6, 18)))
+        if rng.random() < 0.3:
+            sentence += ' ' + rng.choice(_synthetic_iocs(rng))
+        sentence = sentence.capitalize() + rng.choice(['.', '.', '!', '?'])
+        parts.append(sentence)
+        total += len(sentence) + 1
+        if rng.random() < 0.15:
+            parts.append('\n\n')
+    text = ' '.join(parts)[:size_chars]
+    return {
+        '_id': {'$oid': f"{index:024x}"},
+        'url': f"http://synthetic{index}.onion/thread/{rng.randint(1, 99999)}",
+        'title': f"Synthetic thread {index}",
+        'clean_text': text,
+        'timestamp': 1_700_000_000 + index,
+        'nlp_processed': False,
+    }
+
+
+def synthetic_corpus(n_docs, size_chars=2000, seed=0):
+    return [synthetic_document(i, size_chars, seed) for i in range(n_docs)]
+
+
+def synthetic_processed_document(index, size_chars=2000, seed=0):
+    """synthetic_document with an nlp_processed result shaped like the processor's
+
+    Same fields as DarkWebNLP.process_document plus attach_sentiment and
+    topic tagging, so API-side benchmarks read what real documents hold.
+    """
+    from sentiment import sentiment_label
+
+    doc = synthetic_document(index, size_chars, seed)
+    rng = random.Random(seed * 1_000_003 + index + 1)
+    ips, emails, domains, crypto, cve = [], [], [], [], []
+    for _ in range(rng.randint(0, 4)):
+        ip, private_ip, email, onion, domain, btc, eth, cve_id = _synthetic_iocs(rng)
+        ips.append(ip)
+        emails.append(email)
+        domains.extend([onion, domain])
+        crypto.append(rng.choice([btc, eth]))
+        cve.append(cve_id)
+    polarity = round(rng.uniform(-1, 1), 3)
+    threat_score = rng.randint(0, 5)
+    topic_ids = sorted(rng.sample(range(5), rng.randint(1, 2)))
+    day = datetime.fromtimestamp(doc['timestamp'] + index * 600)
+    doc['processed_at'] = day.isoformat()
+    doc['nlp_processed'] = {
+        'iocs': {'ips': ips, 'domains': domains, 'emails': emails, 'crypto': crypto, 'cve': cve,
+                 'malware': [], 'hacker': []},
+        # Lookups without AbuseIPDB/OTX credentials come back empty
+        'threat_intel': {
+            'abuseipdb': {ip: None for ip in ips},
+            'otx': {'ip': {ip: None for ip in ips}, 'domain': {domain: None for domain in domains}, 'hash': {}},
+        },
+        'geolocation': [
+            {'ip': ip, 'country': 'Germany', 'city': 'Berlin', 'latitude': 52.52, 'longitude': 13.405,
+             'asn': 24940, 'isp': 'Hetzner'}
+            for ip in ips[:1]
+        ],
+        'sentiment': {'label': sentiment_label(polarity, threat_score), 'score': polarity,
+                      'threat_score': threat_score},
+        'clean_text': doc['clean_text'],
+        'topic_ids': topic_ids,
+        'topics': [FILLER_WORDS[t] for t in topic_ids],
+    }
+    return doc
+
+
+def synthetic_processed_corpus(n_docs, size_chars=2000, seed=0):
+    return [synthetic_processed_document(i, size_chars, seed) for i in range(n_docs)]
+
+
+class StubOTX:
+    def get_indicator_details_full(self, indicator_type, indicator):
+        return {'general': {'pulse_info': {'count': 0}}, 'indicator': indicator, 'type': indicator_type}
+
+
+class StubGeoIP:
+    """Deterministic stand-in for GeoIPService when no GeoLite2 data is present"""
+
+    def geolocate_many(self, ips):
+        results = {}
+        for ip in set(ips):
+            try:
+                if not ipaddress.ip_address(ip).is_global:
+                    continue
+            except ValueError:
+                continue
+            seed = int(ipaddress.ip_address(ip)) % 10_000
+            results[ip] = {
+                'country': 'Synthetic', 'city': f"City {seed % 100}",
+                'latitude': (seed % 180) - 90.0, 'longitude': (seed % 360) - 180.0,
+                'asn': 64512 + seed % 1000, 'isp': 'Synthetic ISP'
+            }
+        return results
+
+    def cache_info(self):
+        return {'hits': 0, 'misses': 0, 'size': 0, 'max_size': 0}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _stage_report(seconds, docs):
+    return {
+        'seconds': round(seconds, 4),
+        'docs': docs,
+        'docs_per_second': round(docs / seconds, 1) if seconds > 0 else None,
+        'ms_per_doc': round(seconds * 1000 / docs, 4) if docs else None,
+    }
+
+
+def bench_stages(size, doc_chars=2000, seed=0, max_ner_docs=2000, stages=None):
+    """Time each DarkWebNLP stage over a synthetic corpus of `size` documents
+
+    NER is timed on at most max_ner_docs documents since it dominates the
+    run time; the per-document figures are comparable across sizes.
+    """
+    from processor import DarkWebNLP
+
+    from triage import triage
+
+    stages = stages or ('triage', 'ioc_regex', 'ner', 'enrichment', 'geolocation', 'sentiment', 'topics', 'save')
+    corpus = synthetic_corpus(size, doc_chars, seed)
+    texts = [doc['clean_text'] for doc in corpus]
+    report = {}
+
+    with tempfile.TemporaryDirectory() as data_dir, open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        processor = DarkWebNLP(data_dir=data_dir)
+        processor.collection = corpus
+        processor._otx, processor._otx_initialized = StubOTX(), True
+        processor.check_abuseipdb = lambda ip: {'ipAddress': ip, 'abuseConfidenceScore': 0}
+        if not processor.geoip.available:
+            processor._geoip = StubGeoIP()
+
+        def timed(name, fn, docs):
+            if name not in stages:
+                return None
+            start = time.perf_counter()
+            value = fn()
+            report[name] = _stage_report(time.perf_counter() - start, docs)
+            return value
+
+        decisions = timed('triage', lambda: [triage(text, processor.triage_config) for text in texts], size)
+        if decisions:
+            routes = {}
+            for decision in decisions:
+                routes[decision['route']] = routes.get(decision['route'], 0) + 1
+            report['triage']['routes'] = routes
+
+        def regex_stage():
+            return [processor.extract_regex_iocs(text) for text in texts]
+        regex_iocs = timed('ioc_regex', regex_stage, size) or regex_stage()
+
+        ner_texts = texts[:max_ner_docs]
+        timed('ner', lambda: [processor.extract_entity_iocs(text) for text in ner_texts], len(ner_texts))
+
+        results = [{
+            'iocs': {
+                'ips': list(set(iocs['IP'])), 'domains': list(set(iocs['DOMAIN'])),
+                'emails': list(set(iocs['EMAIL'])), 'crypto': list(set(iocs['CRYPTO'])),
+                'cve': list(set(iocs['CVE'])), 'malware': [], 'hacker': []
+            },
+            'clean_text': text
+        } for iocs, text in zip(regex_iocs, texts)]
+
+        timed('enrichment', lambda: [processor.enrich(result['iocs']) for result in results], size)
+        timed('geolocation', lambda: processor.attach_geolocation(results), size)
+
+        def sentiment_stage():
+            for i in range(0, size, processor.batch_size):
+                processor.attach_sentiment(results[i:i + processor.batch_size])
+        timed('sentiment', sentiment_stage, size)
+        timed('topics', lambda: processor.topic_modeling(texts), size)
+
+        def save_stage():
+            for doc, result in zip(corpus, results):
+                doc['nlp_processed'] = result
+                doc['processed_at'] = datetime.utcnow().isoformat()
+            for i in range(0, size, processor.batch_size):
+                processor.journal.append(corpus[i:i + processor.batch_size])
+            processor.journal.compact(corpus)
+        timed('save', save_stage, size)
+
+    return report
+
+
+def run_stage_benchmarks(sizes, doc_chars, seed, max_ner_docs, stages=None):
+    return {
+        'meta': {
+            'benchmark': 'stages',
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'created_at': datetime.utcnow().isoformat(),
+            'doc_chars': doc_chars,
+            'seed': seed,
+            'max_ner_docs': max_ner_docs,
+        },
+        'results': {
+            str(size): bench_stages(size, doc_chars, seed, max_ner_docs, stages)
+            for size in sizes
+        },
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def compare_reports(baseline, current, threshold):
+    """List stages whose throughput dropped by more than threshold (a fraction)"""
+    regressions = []
+    for size, stages in current['results'].items():
+        for stage, stats in stages.items():
+            before = baseline['results'].get(size, {}).get(stage)
+            if not before or not before.get('docs_per_second') or not stats.get('docs_per_second'):
+                continue
+            change = stats['docs_per_second'] / before['docs_per_second'] - 1
+            entry = {'size': size, 'stage': stage, 'before': before['docs_per_second'],
+                     'after': stats['docs_per_second'], 'change': round(change, 3)}
+            if change < -threshold:
+                regressions.append(entry)
+    return regressions
+
+
+def bench_graph(n_indicators, iocs_per_doc=20, seed=0, queries=1000):
+    """Build an IOC graph with n_indicators and report memory and query latency"""
+    from ioc_graph import IOCGraph
+
+    rng = random.Random(seed)
+    types = ['ips', 'domains', 'emails', 'crypto', 'cve']
+    n_docs = max(1, n_indicators * 2 // iocs_per_doc)
+    graph = IOCGraph(path=os.path.join(tempfile.gettempdir(), "bench_ioc_graph.pkl"))
+    rss_before = peak_rss_mb()
+
+    start = time.perf_counter()
+    fresh = 0
+    for d in range(n_docs):
+        # Every other slot introduces the next unseen indicator so all
+        # n_indicators exist; the rest have skewed popularity, so a few
+        # indicators show up on many pages
+        iocs = {}
+        for slot in range(iocs_per_doc):
+            if slot % 2 == 0 and fresh < n_indicators:
+                i, fresh = fresh, fresh + 1
+            else:
+                i = int(n_indicators * rng.random() ** 2)
+            iocs.setdefault(types[i % len(types)], []).append(f"ioc{i}")
+        graph.update(f"doc{d}", iocs, version=d)
+    build_seconds = time.perf_counter() - start
+
+    probes = [(types[i % len(types)], f"ioc{i}") for i in (int(n_indicators * rng.random() ** 2) for _ in range(queries))]
+    start = time.perf_counter()
+    for ioc_type, value in probes:
+        graph.documents(ioc_type, value)
+    neighbor_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for ioc_type, value in probes:
+        graph.cooccurring(ioc_type, value, limit=20)
+    two_hop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    graph.save()
+    save_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    IOCGraph.load(graph.path)
+    load_seconds = time.perf_counter() - start
+
+    report = {
+        **graph.stats(),
+        "build_seconds": round(build_seconds, 2),
+        "structure_mb": round(graph.memory_usage() / (1024 * 1024), 1),
+        "rss_growth_mb": round(peak_rss_mb() - rss_before, 1),
+        "file_mb": round(os.path.getsize(graph.path) / (1024 * 1024), 1),
+        "neighbor_query_us": round(neighbor_seconds / queries * 1e6, 1),
+        "two_hop_query_us": round(two_hop_seconds / queries * 1e6, 1),
+        "save_seconds": round(save_seconds, 2),
+        "load_seconds": round(load_seconds, 2),
+    }
+    os.remove(graph.path)
+    return report
+
+
+def _latency_ms(seconds):
+    values = sorted(s * 1000 for s in seconds)
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+def bench_search(size, doc_chars=2000, seed=0, queries=200, scan_queries=20):
+    """Latency of /search candidate selection + verification, index vs full scan"""
+    from documents import document_id
+    from ioc_index import IOCIndex
+    from documents import is_processed
+    from search_index import TrigramIndex, match_document, search_text
+
+    corpus = synthetic_processed_corpus(size, doc_chars, seed)
+    by_id = {document_id(doc): doc for doc in corpus}
+    rng = random.Random(seed)
+    # Mix of rare IOC lookups, common words, URL fragments and short queries
+    kinds = ('ioc', 'common_word', 'url', 'short')
+    probes = []
+    for i in range(queries):
+        doc = corpus[rng.randrange(size)]
+        iocs = [v for values in doc['nlp_processed']['iocs'].values() for v in values]
+        kind = kinds[i % len(kinds)]
+        if kind == 'ioc':
+            query = rng.choice(iocs).lower() if iocs else doc['url'].lower()
+        elif kind == 'common_word':
+            query = rng.choice(FILLER_WORDS[:20])
+        elif kind == 'url':
+            query = f"synthetic{rng.randrange(size)}.onion"
+        else:
+            query = rng.choice(['cv', 'bc', 'x'])
+        probes.append((kind, query))
+
+    def run_scan(query):
+        return [doc for doc in corpus if is_processed(doc) and match_document(doc, query) is not None]
+
+    def run_index(query):
+        ids = index.candidates(query)
+        docs = corpus if ids is None else [by_id[doc_id] for doc_id in ids]
+        return [doc for doc in docs if is_processed(doc) and match_document(doc, query) is not None]
+
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    index = TrigramIndex()
+    index.build((document_id(doc), search_text(doc)) for doc in corpus)
+    build_seconds = time.perf_counter() - start
+
+    index_times, scan_times = [], []
+    kind_times = {kind: [] for kind in kinds}
+    for i, (kind, query) in enumerate(probes):
+        start = time.perf_counter()
+        found = run_index(query)
+        index_times.append(time.perf_counter() - start)
+        kind_times[kind].append(index_times[-1])
+        if i < scan_queries:
+            start = time.perf_counter()
+            expected = run_scan(query)
+            scan_times.append(time.perf_counter() - start)
+            if {document_id(d) for d in expected} != {document_id(d) for d in found}:
+                raise AssertionError(f"Index results differ from scan for {query!r}")
+
+    start = time.perf_counter()
+    for doc in corpus[:1000]:
+        index.add(document_id(doc), search_text(doc))
+    update_seconds = time.perf_counter() - start
+
+    ioc_index = IOCIndex()
+    for doc in corpus:
+        ioc_index.add(document_id(doc), doc['nlp_processed']['iocs'])
+    sample = [doc['nlp_processed']['iocs'] for doc in corpus[:queries] if doc['nlp_processed']['iocs']['ips']]
+    typed_probes = {
+        'ip_exact': [('ips', iocs['ips'][0]) for iocs in sample],
+        'ip_cidr_24': [('ips', iocs['ips'][0].rsplit('.', 1)[0] + '.0/24') for iocs in sample],
+        'crypto_prefix': [('crypto', iocs['crypto'][0][:8].lower() + '*') for iocs in sample],
+        'domain_suffix': [('domains', '*' + iocs['domains'][1].split('-', 1)[-1].lower()) for iocs in sample],
+        'email_exact': [('emails', iocs['emails'][0].lower()) for iocs in sample],
+    }
+    typed_ms = {}
+    for name, probes_of_kind in typed_probes.items():
+        times = []
+        for ioc_type, pattern in probes_of_kind:
+            start = time.perf_counter()
+            ioc_index.query(ioc_type, pattern)
+            times.append(time.perf_counter() - start)
+        if times:
+            typed_ms[name] = _latency_ms(times)
+
+    return {
+        "docs": size,
+        "doc_chars": doc_chars,
+        "build_seconds": round(build_seconds, 2),
+        "index_mb": round(index.memory_usage() / (1024 * 1024), 1),
+        "rss_growth_mb": round(peak_rss_mb() - rss_before, 1),
+        "index_ms": _latency_ms(index_times),
+        "index_ms_by_query": {kind: _latency_ms(times) for kind, times in kind_times.items() if times},
+        "scan_ms": _latency_ms(scan_times),
+        "incremental_add_us": round(update_seconds / min(1000, size) * 1e6, 1),
+        "ioc_index": {**ioc_index.stats(), "query_ms": typed_ms},
+    }
+
+
+def _loop_queries(corpus):
+    """The dashboard aggregates as per-request loops over document dicts"""
+    from documents import is_processed
+    from export import IOC_TYPES
+
+    def first_country(processed):
+        for geo in processed.get('geolocation', []) or []:
+            if isinstance(geo, dict) and geo.get('country'):
+                return str(geo['country'])
+        return 'Unknown'
+
+    def by_date():
+        counts = {}
+        for doc in corpus:
+            if is_processed(doc):
+                date = (doc.get('processed_at', '') or '').split('T')[0]
+                counts[date] = counts.get(date, 0) + 1
+        return counts
+
+    def threat_by_date():
+        totals = {}
+        for doc in corpus:
+            if is_processed(doc):
+                date = (doc.get('processed_at', '') or '').split('T')[0]
+                score = doc['nlp_processed'].get('sentiment', {}).get('threat_score')
+                total, count = totals.get(date, (0.0, 0))
+                totals[date] = (total + score, count + 1) if score is not None else (total, count)
+        return {date: round(total / count, 4) for date, (total, count) in totals.items() if count}
+
+    def sentiment_by_country():
+        counts = {}
+        for doc in corpus:
+            if is_processed(doc):
+                processed = doc['nlp_processed']
+                key = (first_country(processed), processed.get('sentiment', {}).get('label'))
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def top_ioc_types():
+        totals = dict.fromkeys(IOC_TYPES, 0)
+        for doc in corpus:
+            if is_processed(doc):
+                for ioc_type, values in doc['nlp_processed'].get('iocs', {}).items():
+                    if ioc_type in totals:
+                        totals[ioc_type] += len(values)
+        return dict(sorted(totals.items(), key=lambda item: -item[1])[:3])
+
+    return {
+        'by_date': by_date,
+        'threat_by_date': threat_by_date,
+        'sentiment_by_country': sentiment_by_country,
+        'top_ioc_types': top_ioc_types,
+    }
+
+
+def bench_analytics(size, doc_chars=500, seed=0, repeats=5):
+    """Dashboard group-bys: loops over document dicts vs the columnar projection"""
+    from analytics import AnalyticsColumns
+    from documents import document_id
+
+    corpus = synthetic_processed_corpus(size, doc_chars, seed)
+    by_id = {document_id(doc): doc for doc in corpus}
+    start = time.perf_counter()
+    columns = AnalyticsColumns()
+    columns.rebuild(by_id)
+    build_seconds = time.perf_counter() - start
+
+    vectorized = {
+        'by_date': lambda: {row['date']: row['count'] for row in columns.group(['date'])},
+        'threat_by_date': lambda: {
+            row['date']: row['threat_score'] for row in columns.group(['date'], 'threat_score')
+        },
+        'sentiment_by_country': lambda: {
+            (row['country'], row['sentiment']): row['count'] for row in columns.group(['country', 'sentiment'])
+        },
+        'top_ioc_types': lambda: {row['ioc_type']: row['count'] for row in columns.group(['ioc_type'], top=3)},
+    }
+    queries = {}
+    for name, loop in _loop_queries(corpus).items():
+        loop_times, vector_times = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            expected = loop()
+            loop_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            found = vectorized[name]()
+            vector_times.append(time.perf_counter() - start)
+        if found != expected:
+            raise AssertionError(f"Columnar {name} differs from the loop result")
+        queries[name] = {
+            "loop_ms": _latency_ms(loop_times)["p50"],
+            "columnar_ms": _latency_ms(vector_times)["p50"],
+            "speedup": round(min(loop_times) / max(min(vector_times), 1e-9), 1),
+        }
+
+    start = time.perf_counter()
+    fork = columns.fork()
+    for doc_id in list(by_id)[:1000]:
+        fork.apply(doc_id, by_id[doc_id], by_id[doc_id])
+    update_seconds = time.perf_counter() - start
+
+    return {
+        "docs": size,
+        "build_seconds": round(build_seconds, 2),
+        "columns_mb": round(sum(a.nbytes for a in columns.columns.values()) / (1024 * 1024), 1),
+        "fork_and_1000_updates_ms": round(update_seconds * 1000, 1),
+        "queries": queries,
+    }
+
+
+def process_memory_mb(pid):
+    """RSS, PSS (shared pages split between the processes mapping them) and
+    private memory of a process in MB, from /proc/<pid>/smaps_rollup (Linux)"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        "rss_mb": round(fields.get('Rss', 0) / 1024, 1),
+        "pss_mb": round(fields.get('Pss', 0) / 1024, 1),
+        "shared_mb": round((fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)) / 1024, 1),
+        "private_mb": round((fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024, 1),
+    }
+
+
+def server_memory(master_pid):
+    """Memory of every child of a running gunicorn master (workers and the snapshot loader)"""
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+        children = [int(pid) for pid in f.read().split()]
+    processes = []
+    for pid in children:
+        with open(f"/proc/{pid}/cmdline", 'rb') as f:
+            cmdline = f.read().replace(b'\0', b' ').decode(errors='replace')
+        role = 'loader' if 'snapshot_file.py' in cmdline else 'worker'
+        processes.append({"pid": pid, "role": role, **process_memory_mb(pid)})
+    workers = [p for p in processes if p['role'] == 'worker']
+    return {
+        "master": {"pid": master_pid, **process_memory_mb(master_pid)},
+        "processes": processes,
+        "workers": len(workers),
+        "worker_total_pss_mb": round(sum(p['pss_mb'] for p in workers), 1),
+    }
+
+
+def _serving_worker(mode, source, snapshot_path, conn):
+    """One API worker's data: its own CollectionStore ("json") or the mapped snapshot"""
+    sys.stdout = open(os.devnull, 'w')
+    from documents import load_documents
+    from search_index import TrigramIndex
+    from snapshot_file import SHARED_INDEXES, MappedSnapshotStore
+    if mode == 'mapped':
+        store = MappedSnapshotStore(snapshot_path)
+    else:
+        from collection_store import CollectionStore
+        store = CollectionStore(source, lambda: load_documents(source), {'search': TrigramIndex, **SHARED_INDEXES})
+    snap = store.snapshot
+    # Touch what requests touch: every document (/export), the search index and the aggregates
+    for doc in snap.collection:
+        pass
+    for query in ('onion', 'exploit', 'bc1q'):
+        snap.indexes['search'].candidates(query)
+    snap.indexes['aggregates'].payload('timeline')
+    conn.send('ready')
+    conn.recv()
+
+
+def bench_workers(n_docs, counts, doc_chars=2000, seed=0):
+    """Memory per worker process: per-process JSON stores vs one mapped snapshot"""
+    context = multiprocessing.get_context('spawn')
+    report = {"docs": n_docs, "doc_chars": doc_chars}
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "threat_intel_content.json")
+        snapshot_path = os.path.join(tmp, "threat_intel_content.snapshot")
+        with open(source, 'w') as f:
+            json.dump(synthetic_processed_corpus(n_docs, doc_chars, seed), f)
+        report["json_mb"] = round(os.path.getsize(source) / (1024 * 1024), 1)
+        subprocess.run(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshot_file.py"),
+             "--source", source, "--output", snapshot_path, "--interval", "0"],
+            check=True, stdout=subprocess.DEVNULL
+        )
+        report["snapshot_mb"] = round(os.path.getsize(snapshot_path) / (1024 * 1024), 1)
+
+        for mode in ('json', 'mapped'):
+            report[mode] = {}
+            for count in counts:
+                pipes, processes = [], []
+                for _ in range(count):
+                    parent, child = context.Pipe()
+                    process = context.Process(target=_serving_worker, args=(mode, source, snapshot_path, child))
+                    process.start()
+                    pipes.append(parent)
+                    processes.append(process)
+                for parent in pipes:
+                    parent.recv()
+                memory = [process_memory_mb(process.pid) for process in processes]
+                for parent in pipes:
+                    parent.send('exit')
+                for process in processes:
+                    process.join()
+                report[mode][count] = {
+                    "rss_mb_per_worker": round(sum(m['rss_mb'] for m in memory) / count, 1),
+                    "pss_mb_per_worker": round(sum(m['pss_mb'] for m in memory) / count, 1),
+                    "private_mb_per_worker": round(sum(m['private_mb'] for m in memory) / count, 1),
+                    "total_pss_mb": round(sum(m['pss_mb'] for m in memory), 1),
+                }
+    return report
+
+
+def bench_ner(size_mb, workers, unchunked=False, budget_mb=None):
+    from processor import get_nlp
+    from chunked_ner import ChunkedNER
+
+    nlp = get_nlp()
+    ner = ChunkedNER(get_nlp, memory_budget_mb=budget_mb)
+    pages = [synthetic_page(int(size_mb * 1024 * 1024), seed=i) for i in range(workers)]
+    baseline_rss = peak_rss_mb()
+
+    def run(text):
+        if unchunked:
+            nlp.max_length = max(nlp.max_length, len(text) + 1)
+            return len(nlp(text).ents)
+        return len(ner.entities(text))
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        entity_counts = list(executor.map(run, pages))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mode": "unchunked" if unchunked else "chunked",
+        "page_mb": size_mb,
+        "workers": workers,
+        "chunk_chars": ner.max_chars,
+        "memory_budget_mb": ner.memory_budget_mb,
+        "entities": entity_counts,
+        "seconds": round(elapsed, 2),
+        "rss_before_mb": round(baseline_rss, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def sentiment_parity_failures(report, min_agreement):
+    """Reasons the batch scorer fails parity with TextBlob, empty when it passes
+
+    Threat scores must match exactly; labels must agree on at least
+    min_agreement of the sample.
+    """
+    parity = report["parity"]
+    failures = []
+    if parity["threat_score_exact"] < 1.0:
+        failures.append(f"threat_score matches on {parity['threat_score_exact']:.2%} of documents, expected 100%")
+    if parity["label_agreement"] < min_agreement:
+        failures.append(f"labels agree on {parity['label_agreement']:.2%} of documents, expected at least {min_agreement:.0%}")
+    return failures
+
+
+def bench_sentiment(n_docs, size_chars=2000):
+    """Parity and throughput of BatchSentimentScorer against per-document TextBlob
+
+    The sample is the seeded synthetic corpus, so it is the same on every run.
+    """
+    from sentiment import BatchSentimentScorer, textblob_sentiment
+
+    texts = [synthetic_page(size_chars, seed=i) for i in range(n_docs)]
+    scorer = BatchSentimentScorer()
+    scorer.lexicon  # load outside the timed region
+
+    start = time.perf_counter()
+    reference = [textblob_sentiment(text) for text in texts]
+    textblob_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = scorer.score(texts)
+    batch_seconds = time.perf_counter() - start
+
+    polarity_error = [abs(r['polarity'] - b['polarity']) for r, b in zip(reference, batch)]
+    return {
+        "docs": n_docs,
+        "doc_chars": size_chars,
+        "parity": {
+            "threat_score_exact": sum(r['threat_score'] == b['threat_score'] for r, b in zip(reference, batch)) / n_docs,
+            "label_agreement": sum(r['label'] == b['label'] for r, b in zip(reference, batch)) / n_docs,
+            "polarity_mean_abs_error": round(sum(polarity_error) / n_docs, 4),
+            "polarity_max_abs_error": round(max(polarity_error), 4),
+        },
+        "textblob_docs_per_second": round(n_docs / textblob_seconds, 1),
+        "batch_docs_per_second": round(n_docs / batch_seconds, 1),
+        "speedup": round(textblob_seconds / batch_seconds, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DarkWebNLP performance checks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ner_parser = sub.add_parser("ner", help="peak RSS of NER over very large pages")
+    ner_parser.add_argument("--size-mb", type=float, default=5)
+    ner_parser.add_argument("--workers", type=int, default=4)
+    ner_parser.add_argument("--budget-mb", type=int, default=None)
+    ner_parser.add_argument("--unchunked", action="store_true", help="parse each page as a single Doc")
+
+    stages_parser = sub.add_parser("stages", help="time every DarkWebNLP stage on a synthetic corpus")
+    stages_parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated corpus sizes")
+    stages_parser.add_argument("--doc-chars", type=int, default=2000)
+    stages_parser.add_argument("--seed", type=int, default=0)
+    stages_parser.add_argument("--max-ner-docs", type=int, default=2000)
+    stages_parser.add_argument("--stages", help="comma-separated subset of stages to time")
+    stages_parser.add_argument("--output", help="write the JSON report to this file")
+
+    compare_parser = sub.add_parser("compare", help="compare two stages reports for regressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.15, help="allowed throughput drop (fraction)")
+
+    sentiment_parser = sub.add_parser("sentiment", help="batch scorer parity and throughput vs TextBlob")
+    sentiment_parser.add_argument("--docs", type=int, default=2000)
+    sentiment_parser.add_argument("--doc-chars", type=int, default=2000)
+    sentiment_parser.add_argument("--min-agreement", type=float, default=0.95,
+                                  help="required label agreement with TextBlob (fraction)")
+
+    graph_parser = sub.add_parser("graph", help="IOC graph memory and query latency")
+    graph_parser.add_argument("--indicators", type=int, default=1_000_000)
+    graph_parser.add_argument("--iocs-per-doc", type=int, default=20)
+
+    search_parser = sub.add_parser("search", help="p50/p99 latency of indexed /search vs a full scan, and typed IOC queries")
+    search_parser.add_argument("--sizes", default="10000,100000", help="comma-separated corpus sizes")
+    search_parser.add_argument("--doc-chars", type=int, default=2000)
+    search_parser.add_argument("--queries", type=int, default=200)
+
+    workers_parser = sub.add_parser("workers", help="memory per API worker, JSON store vs mapped snapshot")
+    workers_parser.add_argument("--docs", type=int, default=20000)
+    workers_parser.add_argument("--doc-chars", type=int, default=2000)
+    workers_parser.add_argument("--counts", default="1,2,4", help="comma-separated worker counts")
+    workers_parser.add_argument("--pid", type=int, help="measure the workers of a running gunicorn master instead")
+
+    analytics_parser = sub.add_parser("analytics", help="dashboard group-bys, dict loops vs columnar arrays")
+    analytics_parser.add_argument("--sizes", default="100000", help="comma-separated corpus sizes")
+
+    args = parser.parse_args()
+    if args.command == "stages":
+        sizes = [int(size) for size in args.sizes.split(',')]
+        stages = args.stages.split(',') if args.stages else None
+        report = run_stage_benchmarks(sizes, args.doc_chars, args.seed, args.max_ner_docs, stages)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+    elif args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare_reports(baseline, current, args.threshold)
+        print(json.dumps({'threshold': args.threshold, 'regressions': regressions}, indent=2))
+        sys.exit(1 if regressions else 0)
+    elif args.command == "ner":
+        report = bench_ner(args.size_mb, args.workers, args.unchunked, args.budget_mb)
+    elif args.command == "graph":
+        report = bench_graph(args.indicators, args.iocs_per_doc)
+    elif args.command == "sentiment":
+        report = bench_sentiment(args.docs, args.doc_chars)
+        report["failures"] = sentiment_parity_failures(report, args.min_agreement)
+        print(json.dumps(report, indent=2))
+        sys.exit(1 if report["failures"] else 0)
+    elif args.command == "search":
+        report = {
+            size: bench_search(size, args.doc_chars, queries=args.queries)
+            for size in (int(size) for size in args.sizes.split(','))
+        }
+    elif args.command == "workers":
+        if args.pid:
+            report = server_memory(args.pid)
+        else:
+            report = bench_workers(args.docs, [int(count) for count in args.counts.split(',')], args.doc_chars)
+    elif args.command == "analytics":
+        report = {size: bench_analytics(size) for size in (int(size) for size in args.sizes.split(','))}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
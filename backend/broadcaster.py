@@ -0,0 +1,125 @@
+import json
+import queue
+import threading
+
+
+class Subscription:
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def get(self, timeout=None):
+        """Next serialized message, or None after timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class StatusBroadcaster:
+    """One publisher thread fanning a status dict out to WebSocket clients.
+
+    Every interval the publisher compares version() with the last one
+    seen and only then calls compute(), so the status is computed once
+    per change no matter how many clients are connected. Messages are
+    serialized once and shared:
+
+    - {"type": "status_update", "version", "data"}: the full status, sent
+      on subscribe and to clients that fell behind
+    - {"type": "status_delta", "version", "data"}: only the keys whose
+      value changed since the previous version
+
+    Each subscriber has a bounded queue. A client that lets it fill up
+    has its backlog discarded and is resynced with one full update, so a
+    slow consumer never holds memory or blocks the publisher.
+    """
+
+    def __init__(self, compute, version, interval=1.0, queue_size=8):
+        self.compute = compute
+        self.version = version
+        self.interval = interval
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._status = None
+        self._status_version = None
+        self._full_message = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def _refresh(self):
+        """Recompute the status if the version moved; returns the delta message or None"""
+        version = self.version()
+        if version == self._status_version:
+            return None
+        status = self.compute()
+        previous = self._status
+        with self._lock:
+            self._status = status
+            self._status_version = version
+            self._full_message = json.dumps({'type': 'status_update', 'version': version, 'data': status})
+        if previous is None:
+            return None
+        changed = {key: value for key, value in status.items() if previous.get(key) != value}
+        if not changed:
+            return None
+        return json.dumps({'type': 'status_delta', 'version': version, 'data': changed})
+
+    def _offer(self, subscription, message):
+        try:
+            subscription.queue.put_nowait(message)
+        except queue.Full:
+            # Fell behind: drop the backlog and resync with the full status
+            while True:
+                try:
+                    subscription.queue.get_nowait()
+                    subscription.dropped += 1
+                except queue.Empty:
+                    break
+            subscription.queue.put_nowait(self._full_message)
+
+    def publish(self):
+        delta = self._refresh()
+        if delta is None:
+            return 0
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            self._offer(subscription, delta)
+        return len(subscribers)
+
+    def subscribe(self):
+        self.start()
+        if self._full_message is None:
+            self._refresh()
+        subscription = Subscription(self.queue_size)
+        with self._lock:
+            subscription.queue.put_nowait(self._full_message)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def start(self):
+        with self._lock:
+            if self._thread:
+                return
+
+            def run():
+                while not self._stopped.wait(self.interval):
+                    try:
+                        self.publish()
+                    except Exception as e:
+                        print(f"⚠️ Status broadcast failed: {str(e)}")
+
+            self._thread = threading.Thread(target=run, name="status-broadcaster", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,179 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "data", "chart_cache")
+
+logger = logging.getLogger(__name__)
+
+
+def render_plot(data, plot_type="bar", title="Visualization"):
+    """Render rows of chart data to PNG bytes with Plotly + Kaleido (None on failure)"""
+    if not data:
+        logger.warning("No data provided for plot generation")
+        return None
+
+    try:
+        import pandas as pd
+        import plotly.express as px
+
+        df = pd.DataFrame(data)
+
+        # Further optimize plot generation
+        if len(df) > 100:
+            if plot_type == "bar":
+                df = df.groupby('label')['value'].sum().reset_index()
+            elif plot_type == "map":
+                # Fixed seed so the same data always renders the same image
+                df = df.sample(min(100, len(df)), random_state=0)
+
+        layout = dict(title=title, template='plotly_white', width=600, height=400)
+        if plot_type == "bar":
+            fig = px.bar(df, x='label', y='value', **layout)
+        elif plot_type == "pie":
+            fig = px.pie(df, names='label', values='value', **layout)
+        elif plot_type == "map":
+            if df.empty:
+                logger.warning("Empty DataFrame for map plot")
+                return None
+            fig = px.scatter_geo(df, lat='latitude', lon='longitude', hover_name='ip', **layout)
+        else:
+            fig = px.histogram(df, x='label', y='value', **layout)
+
+        img = io.BytesIO()
+        fig.write_image(img, format='png', scale=1, engine='kaleido')
+        return img.getvalue()
+    except Exception:
+        logger.exception("Error generating %s plot %r", plot_type, title)
+        return None
+
+
+class ChartService:
+    """Content-addressed PNG cache in front of render_plot.
+
+    Images are keyed by a hash of (data, plot_type, title); the key is
+    also the ETag. Renders run in the given executor, at most one per
+    key. While a chart's new data is rendering, request() serves the
+    last image rendered for that chart name and reports it as stale.
+    Images are kept in a bounded in-memory LRU backed by a bounded
+    directory of PNG files, so restarts do not re-render.
+    """
+
+    def __init__(self, executor, render=render_plot, cache_dir=DEFAULT_CACHE_DIR,
+                 memory_entries=64, disk_entries=256, wait_seconds=30):
+        self.executor = executor
+        self.render = render
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.wait_seconds = wait_seconds
+        self._memory = OrderedDict()
+        self._latest = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(data, plot_type, title):
+        raw = json.dumps([data, plot_type, title], sort_keys=True, default=str, separators=(',', ':'))
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def _load(self, key):
+        with self._lock:
+            png = self._memory.get(key)
+            if png is not None:
+                self._memory.move_to_end(key)
+                return png
+        if not self.cache_dir or not os.path.exists(self._path(key)):
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                png = f.read()
+        except OSError:
+            return None
+        self._remember(key, png)
+        return png
+
+    def _remember(self, key, png):
+        with self._lock:
+            self._memory[key] = png
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _store(self, key, png):
+        self._remember(key, png)
+        if not self.cache_dir:
+            return
+        tmp_path = f"{self._path(key)}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(png)
+        os.replace(tmp_path, self._path(key))
+        files = sorted(
+            (entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.png')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in files[:max(0, len(files) - self.disk_entries)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _render(self, name, key, data, plot_type, title):
+        try:
+            png = self.render(data, plot_type, title)
+            if png is not None:
+                self._store(key, png)
+                with self._lock:
+                    self._latest[name] = key
+            return png
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _submit(self, name, key, data, plot_type, title):
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = self.executor.submit(
+                    self._render, name, key, data, plot_type, title
+                )
+            return future
+
+    def prerender(self, name, data, plot_type, title):
+        """Render in the background unless the image is already cached"""
+        key = self.key(data, plot_type, title)
+        if self._load(key) is not None:
+            with self._lock:
+                self._latest[name] = key
+            return None
+        return self._submit(name, key, data, plot_type, title)
+
+    def request(self, name, data, plot_type, title):
+        """(png, etag, stale) for the chart; png is None if rendering failed
+
+        Waits for the render only when nothing was ever rendered for name,
+        and raises concurrent.futures.TimeoutError if that takes longer than
+        wait_seconds; the render keeps going and a later request gets it.
+        """
+        key = self.key(data, plot_type, title)
+        png = self._load(key)
+        if png is not None:
+            return png, key, False
+        future = self._submit(name, key, data, plot_type, title)
+        with self._lock:
+            previous = self._latest.get(name)
+        if previous is not None:
+            previous_png = self._load(previous)
+            if previous_png is not None:
+                return previous_png, previous, True
+        png = future.result(timeout=self.wait_seconds)
+        return png, key, False
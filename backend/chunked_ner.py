@@ -0,0 +1,198 @@
+import os
+import re
+from collections import deque
+
+from ner_cache import original_offsets
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+# Rough working-set cost of a parsed spaCy Doc per input character
+# (tokens, vectors and pipeline activations); used to turn a memory
+# budget into a number of characters in flight.
+BYTES_PER_CHAR = 200
+
+
+def _spans(text, start, end, pattern):
+    """Split text[start:end] on pattern, returning (start, end) spans"""
+    spans = []
+    pos = start
+    for match in pattern.finditer(text, start, end):
+        if match.start() > pos:
+            spans.append((pos, match.start()))
+        pos = match.end()
+    if end > pos:
+        spans.append((pos, end))
+    return spans
+
+
+def _hard_split(text, start, end, max_chars, overlap):
+    """Cut an oversized sentence at whitespace, overlapping consecutive windows"""
+    windows = []
+    pos = start
+    while pos < end:
+        stop = min(pos + max_chars, end)
+        if stop < end:
+            space = text.rfind(' ', pos + max_chars // 2, stop)
+            if space > pos:
+                stop = space
+        windows.append((pos, stop))
+        if stop >= end:
+            break
+        pos = max(stop - overlap, pos + 1)
+    return windows
+
+
+def iter_windows(text, max_chars, overlap=200):
+    """Yield (offset, window) pieces of at most max_chars characters
+
+    Paragraphs are packed together until a window is full; a paragraph
+    that is too large on its own is split on sentence ends, and a single
+    sentence that is still too large is cut at whitespace with `overlap`
+    characters repeated so entities on the cut are seen whole once.
+    """
+    if len(text) <= max_chars:
+        if text:
+            yield 0, text
+        return
+
+    pieces = []
+    for p_start, p_end in _spans(text, 0, len(text), PARAGRAPH_BREAK):
+        if p_end - p_start <= max_chars:
+            pieces.append((p_start, p_end))
+            continue
+        for s_start, s_end in _spans(text, p_start, p_end, SENTENCE_END):
+            if s_end - s_start <= max_chars:
+                pieces.append((s_start, s_end))
+            else:
+                pieces.extend(_hard_split(text, s_start, s_end, max_chars, overlap))
+
+    w_start = w_end = None
+    for start, end in pieces:
+        if w_start is not None and end - w_start <= max_chars and start >= w_end:
+            w_end = end
+            continue
+        if w_start is not None:
+            yield w_start, text[w_start:w_end]
+        w_start, w_end = start, end
+    if w_start is not None:
+        yield w_start, text[w_start:w_end]
+
+
+def merge_entities(entities):
+    """Drop duplicate/partial entities from overlapping windows
+
+    Takes (start, end, label, text) tuples in absolute offsets and keeps,
+    for every group of overlapping spans, the longest one.
+    """
+    merged = []
+    for ent in sorted(entities, key=lambda e: (e[0], -(e[1] - e[0]))):
+        if merged and ent[0] < merged[-1][1]:
+            if ent[1] - ent[0] > merged[-1][1] - merged[-1][0]:
+                merged[-1] = ent
+            continue
+        merged.append(ent)
+    return merged
+
+
+class ChunkedNER:
+    """Bounded-memory named entity recognition over arbitrarily large text.
+
+    Text is split into windows on paragraph/sentence boundaries and
+    streamed through nlp.pipe, so the whole page is never parsed as one
+    Doc. Each call keeps at most memory_budget_mb worth of windows in
+    flight, which bounds the memory of every worker thread independently.
+    With an NERCache, text is handled paragraph by paragraph and only
+    paragraphs not seen before reach the model.
+    """
+
+    def __init__(self, get_nlp, max_chars=None, memory_budget_mb=None, overlap=200, cache=None):
+        self.get_nlp = get_nlp
+        self.cache = cache
+        self.memory_budget_mb = memory_budget_mb or int(os.getenv("NER_MEMORY_BUDGET_MB", "256"))
+        budget_chars = max(1000, self.memory_budget_mb * 1024 * 1024 // BYTES_PER_CHAR)
+        self.max_chars = min(max_chars or int(os.getenv("NER_CHUNK_CHARS", "100000")), budget_chars)
+        self.batch_size = max(1, budget_chars // self.max_chars)
+        self.overlap = min(overlap, self.max_chars // 4)
+
+    def entities(self, text):
+        """Return [(start, end, label, text), ...] for the whole text"""
+        if not text:
+            return []
+        if self.cache is not None:
+            return self._cached_entities(text)
+        offsets = deque()
+
+        def windows():
+            for offset, window in iter_windows(text, self.max_chars, self.overlap):
+                offsets.append(offset)
+                yield window
+
+        found = []
+        chunked = len(text) > self.max_chars
+        for doc in self.get_nlp().pipe(windows(), batch_size=self.batch_size):
+            offset = offsets.popleft()
+            found.extend(
+                (offset + ent.start_char, offset + ent.end_char, ent.label_, ent.text)
+                for ent in doc.ents
+            )
+        return merge_entities(found) if chunked else found
+
+    def _cached_entities(self, text):
+        """Per-paragraph NER where only paragraphs missing from the cache are parsed
+
+        Paragraphs are parsed in their normalized form, once per distinct
+        normalized text per call, and the entities are mapped back onto
+        every occurrence.
+        """
+        occurrences = []
+        resolved = {}
+        misses = {}
+        for start, end in _spans(text, 0, len(text), PARAGRAPH_BREAK):
+            paragraph = text[start:end]
+            normalized = self.cache.normalize(paragraph)
+            key = self.cache.digest(normalized)
+            occurrences.append((start, paragraph, key))
+            if key in resolved or key in misses:
+                self.cache.count_hits()
+                continue
+            cached = self.cache.get(key)
+            if cached is None:
+                misses[key] = normalized
+            else:
+                resolved[key] = cached
+
+        if misses:
+            keys = list(misses)
+            parsed = {key: [] for key in keys}
+            owners = deque()
+
+            def windows():
+                for key in keys:
+                    for offset, window in iter_windows(misses[key], self.max_chars, self.overlap):
+                        owners.append((key, offset))
+                        yield window
+
+            for doc in self.get_nlp().pipe(windows(), batch_size=self.batch_size):
+                key, offset = owners.popleft()
+                parsed[key].extend(
+                    (offset + ent.start_char, offset + ent.end_char, ent.label_, ent.text)
+                    for ent in doc.ents
+                )
+            for key in keys:
+                entities = parsed[key]
+                if len(misses[key]) > self.max_chars:
+                    entities = merge_entities(entities)
+                self.cache.put(key, entities)
+                resolved[key] = entities
+
+        found = []
+        for start, paragraph, key in occurrences:
+            entities = resolved[key]
+            if not entities:
+                continue
+            to_original = original_offsets(paragraph)
+            for s, e, label, _ in entities:
+                s, e = to_original(s), to_original(e - 1) + 1
+                found.append((start + s, start + e, label, paragraph[s:e]))
+        return sorted(found)
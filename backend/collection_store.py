@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from documents import document_id
+from journal import JOURNAL_FIELDS, ResultJournal
+
+# Fields the API and its indexes read; a document is re-indexed only when one changes
+INDEXED_FIELDS = ('url', 'title', 'clean_text', 'processed_at', 'nlp_processed', 'triage')
+HEAD_BYTES = 65536
+
+
+class Snapshot:
+    """Immutable view of the collection and everything derived from it
+
+    Requests take one snapshot and use it throughout, so a refresh that
+    swaps in a new one never exposes partially applied state.
+    """
+
+    def __init__(self, version, collection, documents_by_id, positions, indexes, epoch=''):
+        self.version = version
+        self.epoch = epoch
+        self.collection = collection
+        self.documents_by_id = documents_by_id
+        self.positions = positions
+        self.indexes = indexes
+        self.created_at = time.time()
+
+    @property
+    def etag(self):
+        """Entity tag for responses derived from this snapshot
+
+        version restarts at 1 with the process, so it is qualified by the
+        epoch of the store that published it.
+        """
+        return f"{self.epoch}-{self.version}"
+
+
+def _same(old, new):
+    return all(old.get(field) == new.get(field) for field in INDEXED_FIELDS)
+
+
+class CollectionStore:
+    """Live, copy-on-write view of the JSON export plus the processor journal.
+
+    index_factories maps a name to a callable returning an empty derived
+    index with rebuild(documents_by_id), apply(doc_id, old_doc, new_doc)
+    and fork(). refresh() (run by a background thread after start()):
+
+    - journal grew: parse only the records after the last offset
+    - journal replaced or truncated (compaction): full reload, since its
+      old records may now be in the export
+    - JSONL export grew in place: parse only the appended lines
+    - export replaced (compaction, new export): reparse it, but keep the
+      existing document objects and index entries of unchanged documents
+
+    Changes are applied to forked indexes and shallow copies of the list
+    and id map, then published with a single reference assignment.
+    """
+
+    def __init__(self, snapshot_path, loader, index_factories=None, rebuild_ratio=0.5):
+        self.snapshot_path = snapshot_path
+        self.loader = loader
+        self.index_factories = index_factories or {}
+        self.rebuild_ratio = rebuild_ratio
+        self.journal = ResultJournal(snapshot_path, repair=False)
+        self.epoch = format(time.time_ns(), 'x')
+        self.snapshot = None
+        self._file_state = None
+        self._journal_offset = 0
+        self._journal_identity = None
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._listeners = []
+        with self._refresh_lock:
+            self._full_reload()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.snapshot_path)
+        except OSError:
+            return None
+        return {'inode': stat.st_ino, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+    def _head_digest(self, size):
+        with open(self.snapshot_path, 'rb') as f:
+            return hashlib.sha1(f.read(min(size, HEAD_BYTES))).hexdigest()
+
+    def _file_state_now(self):
+        stat = self._stat()
+        if stat is None:
+            return None
+        with open(self.snapshot_path, 'rb') as f:
+            first = f.read(64).lstrip()[:1]
+        stat['jsonl'] = first == b'{'
+        stat['head'] = self._head_digest(stat['size'])
+        return stat
+
+    def _publish(self, version, collection, documents_by_id, positions, changes=None, base=None):
+        """Swap in a new snapshot, applying changes to forked indexes of base when given"""
+        if base is None or changes is None:
+            indexes = {}
+            for name, factory in self.index_factories.items():
+                index = factory()
+                index.rebuild(documents_by_id)
+                indexes[name] = index
+        else:
+            indexes = {name: index.fork() for name, index in base.indexes.items()}
+            for doc_id, (old_doc, new_doc) in changes.items():
+                for index in indexes.values():
+                    index.apply(doc_id, old_doc, new_doc)
+        self.snapshot = Snapshot(version, collection, documents_by_id, positions, indexes, self.epoch)
+        for listener in self._listeners:
+            try:
+                listener(self.snapshot)
+            except Exception as e:
+                print(f"⚠️ Snapshot listener failed: {str(e)}")
+
+    def add_listener(self, listener):
+        """Call listener(snapshot) after every newly published snapshot"""
+        self._listeners.append(listener)
+
+    def _full_reload(self):
+        start = time.time()
+        state = self._file_state_now()
+        collection = self.loader() if state else []
+        by_id = {document_id(doc): doc for doc in collection}
+        offset = 0
+        journal_identity = self.journal.identity()
+        for record, offset in self.journal.read():
+            doc = by_id.get(record.get('id'))
+            if doc is not None:
+                doc.update((field, record[field]) for field in JOURNAL_FIELDS if field in record)
+
+        current = self.snapshot
+        changes = {}
+        merged = []
+        documents_by_id = {}
+        positions = {}
+        for doc in collection:
+            doc_id = document_id(doc)
+            old = current.documents_by_id.get(doc_id) if current else None
+            if old is not None and _same(old, doc):
+                doc = old
+            elif current is not None:
+                changes[doc_id] = (old, doc)
+            positions[doc_id] = len(merged)
+            documents_by_id[doc_id] = doc
+            merged.append(doc)
+        if current is not None:
+            for doc_id, old in current.documents_by_id.items():
+                if doc_id not in documents_by_id:
+                    changes[doc_id] = (old, None)
+
+        if current is None:
+            self._publish(1, merged, documents_by_id, positions)
+        elif changes or len(merged) != len(current.collection):
+            rebuild = len(changes) > self.rebuild_ratio * max(1, len(merged))
+            self._publish(current.version + 1, merged, documents_by_id, positions,
+                          None if rebuild else changes, current)
+        self._file_state = state
+        self._journal_offset = offset
+        self._journal_identity = journal_identity
+        changed = len(changes) if current is not None else len(merged)
+        print(f"✅ Loaded {len(merged)} documents ({changed} changed) in {time.time() - start:.2f}s")
+
+    def _apply_records(self, updates, new_docs=()):
+        """Copy-on-write application of appended documents and journal records"""
+        current = self.snapshot
+        collection = list(current.collection)
+        documents_by_id = dict(current.documents_by_id)
+        positions = current.positions
+        changes = {}
+
+        def replace(doc_id, doc):
+            nonlocal positions
+            position = positions.get(doc_id)
+            if position is None:
+                if positions is current.positions:
+                    positions = dict(positions)
+                position = positions[doc_id] = len(collection)
+                collection.append(doc)
+                old = None
+            else:
+                old = collection[position]
+                collection[position] = doc
+            documents_by_id[doc_id] = doc
+            changes[doc_id] = (changes[doc_id][0] if doc_id in changes else old, doc)
+
+        for doc in new_docs:
+            replace(document_id(doc), doc)
+        for doc_id, fields in updates.items():
+            old = documents_by_id.get(doc_id)
+            if old is not None:
+                replace(doc_id, {**old, **fields})
+        if changes:
+            self._publish(current.version + 1, collection, documents_by_id, positions, changes, current)
+        return len(changes)
+
+    def _read_appended(self, offset):
+        docs = []
+        with open(self.snapshot_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                line = line.strip()
+                if line.startswith(b'{') and line.endswith(b'}'):
+                    try:
+                        docs.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        return docs, offset
+
+    def refresh(self):
+        """Pick up changes on disk; returns the number of documents that changed"""
+        with self._refresh_lock:
+            journal_identity = self.journal.identity()
+            if (self._journal_identity is not None and journal_identity != self._journal_identity) \
+                    or self.journal.size() < self._journal_offset:
+                self._full_reload()
+                return -1
+            self._journal_identity = journal_identity
+
+            state = self._stat()
+            previous = self._file_state
+            new_docs = []
+            if state is None and previous is None:
+                pass
+            elif state is None or previous is None or state['inode'] != previous['inode'] \
+                    or state['size'] < previous['size']:
+                self._full_reload()
+                return -1
+            elif state['mtime'] != previous['mtime'] or state['size'] != previous['size']:
+                appended = previous['jsonl'] and state['size'] > previous['size'] \
+                    and self._head_digest(previous['size']) == previous['head']
+                if not appended:
+                    self._full_reload()
+                    return -1
+                new_docs, end = self._read_appended(previous['size'])
+                self._file_state = dict(state, jsonl=True, size=end, head=previous['head'])
+
+            updates = {}
+            for record, offset in self.journal.read(self._journal_offset):
+                self._journal_offset = offset
+                fields = {field: record[field] for field in JOURNAL_FIELDS if field in record}
+                updates.setdefault(record.get('id'), {}).update(fields)
+            if not updates and not new_docs:
+                return 0
+            return self._apply_records(updates, new_docs)
+
+    def start(self, interval=5.0):
+        """Refresh in a background daemon thread every interval seconds"""
+        if self._thread or interval <= 0:
+            return
+
+        def run():
+            while not self._stopped.wait(interval):
+                try:
+                    changed = self.refresh()
+                    if changed > 0:
+                        print(f"🔄 Applied {changed} document updates (version {self.snapshot.version})")
+                except Exception as e:
+                    print(f"⚠️ Collection refresh failed: {str(e)}")
+
+        self._thread = threading.Thread(target=run, name="collection-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def document_id(doc):
+    """Stable id for a scraped document
+
+    Uses the Mongo ObjectId from the export when present and otherwise a
+    hash of the URL, so the same page keeps its id across exports.
+    """
+    _id = doc.get('_id')
+    if isinstance(_id, dict) and _id.get('$oid'):
+        return _id['$oid']
+    if _id:
+        return str(_id)
+    return hashlib.sha1(str(doc.get('url', '')).encode('utf-8')).hexdigest()[:24]
+
+
+
+def is_processed(doc):
+    """True once the processor has stored a result dict (not the False placeholder)"""
+    return bool(doc.get('nlp_processed')) and isinstance(doc.get('nlp_processed'), dict)
+
+
+def is_skipped(doc):
+    """True for an unprocessed document that triage routed to skip (handled, never processed)"""
+    triage = doc.get('triage')
+    return not is_processed(doc) and isinstance(triage, dict) and triage.get('route') == 'skip'
+
+
+def _parse_json_lines(lines):
+    items = []
+    for line in lines:
+        line = line.strip()
+        if line and line.startswith('{') and line.endswith('}'):
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return items
+
+
+def load_documents(path):
+    """Load the scraped collection from a JSON array or JSONL export
+
+    Malformed exports are recovered line by line; a missing file is an
+    empty collection.
+    """
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+                # If the content is not a valid JSON array, parse each line as a separate JSON object
+                if not content.startswith('['):
+                    return _parse_json_lines(content.split('\n'))
+                return json.loads(content)
+        else:
+            logger.warning("JSON file not found, creating new file")
+            return []
+    except Exception as e:
+        logger.error(f"Error loading JSON file: {str(e)}")
+        # Try to recover by reading line by line
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                items = _parse_json_lines(f)
+            logger.info(f"Recovered {len(items)} items from malformed JSON")
+            return items
+        except Exception as e2:
+            logger.error(f"Failed to recover data: {str(e2)}")
+            return []
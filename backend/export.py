@@ -0,0 +1,207 @@
+import json
+import zlib
+from datetime import datetime, timezone
+
+from documents import is_processed
+
+IOC_TYPES = ('ips', 'domains', 'emails', 'crypto', 'cve', 'malware', 'hacker')
+FORMATS = {
+    'json': ('application/json', 'json'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+
+def parse_since(value):
+    """Normalize an ISO date/datetime so it compares with processed_at strings
+
+    processed_at is naive UTC, so an offset is converted to UTC first;
+    a value without one is taken as UTC.
+    """
+    if not value:
+        return None
+    since = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since.isoformat()
+
+
+def export_record(doc):
+    processed = doc.get("nlp_processed", {})
+    return {
+        "url": doc.get("url", ""),
+        "timestamp": doc.get("processed_at", ""),
+        "sentiment": processed.get("sentiment", {}),
+        "topics": processed.get("topics", []),
+        "iocs": processed.get("iocs", {}),
+        "geolocation": processed.get("geolocation", []),
+    }
+
+
+def iter_export_records(collection, since=None, ioc_type=None):
+    """Export records of processed documents, optionally only those
+    processed at or after since and/or having indicators of ioc_type"""
+    for doc in collection:
+        if not is_processed(doc):
+            continue
+        if since and str(doc.get("processed_at", "") or "") < since:
+            continue
+        if ioc_type and not doc["nlp_processed"].get("iocs", {}).get(ioc_type):
+            continue
+        yield export_record(doc)
+
+
+def json_array_chunks(records, batch_size=500):
+    """The records as one JSON array, in chunks of batch_size records"""
+    yield "["
+    first = True
+    batch = []
+    for record in records:
+        batch.append(json.dumps(record, default=str))
+        if len(batch) >= batch_size:
+            yield ("" if first else ",") + ",".join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield ("" if first else ",") + ",".join(batch)
+    yield "]"
+
+
+def ndjson_chunks(records, batch_size=500):
+    batch = []
+    for record in records:
+        batch.append(json.dumps(record, default=str))
+        if len(batch) >= batch_size:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a stream of str/bytes chunks into a gzip stream"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _arrow_schema(pa):
+    geo = pa.struct([
+        ("ip", pa.string()), ("country", pa.string()), ("city", pa.string()),
+        ("latitude", pa.float64()), ("longitude", pa.float64()),
+        ("asn", pa.int64()), ("isp", pa.string()),
+    ])
+    return pa.schema([
+        ("url", pa.string()),
+        ("timestamp", pa.string()),
+        ("sentiment", pa.struct([
+            ("polarity", pa.float64()), ("threat_score", pa.int64()), ("label", pa.string()),
+        ])),
+        ("topics", pa.list_(pa.string())),
+        ("iocs", pa.struct([(ioc_type, pa.list_(pa.string())) for ioc_type in IOC_TYPES])),
+        ("geolocation", pa.list_(geo)),
+    ])
+
+
+def _number(value, cast):
+    try:
+        return cast(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _arrow_row(record):
+    """Coerce one export record to the fixed Arrow schema"""
+    sentiment = record["sentiment"] if isinstance(record["sentiment"], dict) else {}
+    iocs = record["iocs"] if isinstance(record["iocs"], dict) else {}
+    return {
+        "url": str(record["url"] or ""),
+        "timestamp": str(record["timestamp"] or ""),
+        "sentiment": {
+            # The processor stores polarity as sentiment['score']
+            "polarity": _number(sentiment.get("score", sentiment.get("polarity")), float),
+            "threat_score": _number(sentiment.get("threat_score"), int),
+            "label": sentiment.get("label"),
+        },
+        "topics": [str(topic) for topic in record["topics"] or []],
+        "iocs": {
+            ioc_type: [str(v) for v in iocs.get(ioc_type) or [] if v] for ioc_type in IOC_TYPES
+        },
+        "geolocation": [
+            {
+                "ip": geo.get("ip"), "country": geo.get("country"), "city": geo.get("city"),
+                "latitude": _number(geo.get("latitude"), float),
+                "longitude": _number(geo.get("longitude"), float),
+                "asn": _number(geo.get("asn"), int), "isp": geo.get("isp"),
+            }
+            for geo in record["geolocation"] or [] if isinstance(geo, dict)
+        ],
+    }
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are drained as they are produced"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def arrow_chunks(records, fmt="parquet", batch_size=10000):
+    """Stream records as Parquet (one row group per batch) or an Arrow IPC stream
+
+    Requires the optional pyarrow dependency; raises ImportError without it.
+    """
+    import pyarrow as pa
+
+    schema = _arrow_schema(pa)
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+
+    def flush(rows):
+        batch = pa.RecordBatch.from_pylist(rows, schema=schema)
+        if fmt == "parquet":
+            writer.write_batch(batch, row_group_size=batch_size)
+        else:
+            writer.write_batch(batch)
+        return sink.drain()
+
+    rows = []
+    for record in records:
+        rows.append(_arrow_row(record))
+        if len(rows) >= batch_size:
+            yield flush(rows)
+            rows = []
+    if rows:
+        yield flush(rows)
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,107 @@
+import ipaddress
+import os
+import threading
+from collections import OrderedDict
+
+import geoip2.database
+from maxminddb import MODE_MMAP
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+class GeoIPService:
+    """Memoized GeoIP lookups backed by memory-mapped MaxMind readers.
+
+    Results (including misses) are kept in a bounded LRU so the same IP
+    seen across many pages only hits the mmdb files once. Private,
+    loopback, link-local and reserved addresses are never looked up.
+    """
+
+    def __init__(self, data_dir=None, cache_size=65536):
+        self.data_dir = data_dir or os.getenv("GEOIP_DATA_DIR", DEFAULT_DATA_DIR)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.readers = self._open_readers()
+
+    def _open_readers(self):
+        city_path = os.path.join(self.data_dir, "GeoLite2-City.mmdb")
+        asn_path = os.path.join(self.data_dir, "GeoLite2-ASN.mmdb")
+        if not (os.path.exists(city_path) and os.path.exists(asn_path)):
+            print(f"⚠️ GeoLite2 databases not found in {self.data_dir}, geolocation disabled")
+            return None
+        return {
+            'city': geoip2.database.Reader(city_path, mode=MODE_MMAP),
+            'asn': geoip2.database.Reader(asn_path, mode=MODE_MMAP)
+        }
+
+    @property
+    def available(self):
+        return self.readers is not None
+
+    @staticmethod
+    def is_routable(ip):
+        """Return True only for well-formed, globally routable addresses"""
+        try:
+            return ipaddress.ip_address(ip).is_global
+        except ValueError:
+            return False
+
+    def _lookup(self, ip):
+        try:
+            city = self.readers['city'].city(ip)
+            asn = self.readers['asn'].asn(ip)
+            return {
+                'country': city.country.name,
+                'city': city.city.name,
+                'latitude': city.location.latitude,
+                'longitude': city.location.longitude,
+                'asn': asn.autonomous_system_number,
+                'isp': asn.autonomous_system_organization
+            }
+        except Exception:
+            return None
+
+    def geolocate(self, ip):
+        if not self.available or not self.is_routable(ip):
+            return None
+        with self._lock:
+            if ip in self._cache:
+                self._cache.move_to_end(ip)
+                self.hits += 1
+                return self._cache[ip]
+        result = self._lookup(ip)
+        with self._lock:
+            self.misses += 1
+            self._cache[ip] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def geolocate_many(self, ips):
+        """Look up a batch of IPs, returning {ip: geo} for the ones that resolved"""
+        results = {}
+        if not self.available:
+            return results
+        for ip in set(ips):
+            geo = self.geolocate(ip)
+            if geo:
+                results[ip] = geo
+        return results
+
+    def cache_info(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._cache),
+                'max_size': self.cache_size
+            }
+
+    def close(self):
+        if self.readers:
+            for reader in self.readers.values():
+                reader.close()
+            self.readers = None
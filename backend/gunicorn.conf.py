@@ -0,0 +1,59 @@
+"""Production serving: several gunicorn workers sharing one mapped snapshot
+
+    cd backend
+    gunicorn -c gunicorn.conf.py app:app
+
+The master starts a single snapshot_file.py loader process that follows
+data/threat_intel_content.json and the processor journal and keeps
+SNAPSHOT_FILE up to date. Workers never parse the JSON; they map that
+file, so their memory stays flat as WEB_CONCURRENCY grows. Check it
+with `python benchmark.py workers --pid <gunicorn master pid>`.
+"""
+import os
+import subprocess
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+# Threads keep the /ws/processor sockets (flask_sock) from pinning whole workers
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+timeout = 120
+# Workers import app themselves and map the snapshot after the fork; a
+# preloaded app would hand each of them a copy-on-write heap to dirty
+preload_app = False
+
+snapshot_path = os.environ.setdefault(
+    "SNAPSHOT_FILE", os.path.join(backend_dir, "data", "threat_intel_content.snapshot")
+)
+source_path = os.getenv("SNAPSHOT_SOURCE", os.path.join(backend_dir, "data", "threat_intel_content.json"))
+# Charts render on first request (the PNG cache directory is shared) instead of N times per update
+os.environ.setdefault("CHART_PRERENDER", "0")
+
+loader = None
+
+
+def on_starting(server):
+    global loader
+    loader = subprocess.Popen(
+        [sys.executable, os.path.join(backend_dir, "snapshot_file.py"),
+         "--source", source_path, "--output", snapshot_path],
+        cwd=backend_dir
+    )
+    deadline = time.time() + float(os.getenv("SNAPSHOT_WAIT_SECONDS", "600"))
+    while not os.path.exists(snapshot_path):
+        if loader.poll() is not None:
+            raise RuntimeError(f"Snapshot loader exited with status {loader.returncode}")
+        if time.time() > deadline:
+            raise RuntimeError(f"Timed out waiting for {snapshot_path}")
+        time.sleep(0.5)
+    server.log.info(f"Serving snapshot {snapshot_path} (loader pid {loader.pid})")
+
+
+def on_exit(server):
+    if loader is not None and loader.poll() is None:
+        loader.terminate()
+        loader.wait(timeout=30)
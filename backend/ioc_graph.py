@@ -0,0 +1,185 @@
+import os
+import pickle
+import sys
+import threading
+from array import array
+from collections import Counter
+
+DEFAULT_GRAPH_PATH = os.path.join(os.path.dirname(__file__), "data", "ioc_graph.pkl")
+
+
+def ioc_key(ioc_type, value):
+    return f"{ioc_type}:{value}"
+
+
+class IOCGraph:
+    """Incremental IOC <-> document bipartite index.
+
+    IOCs ("type:value") and document ids are interned to integers and the
+    edges kept as compact uint32 arrays in both directions, so neighbour
+    lookups cost O(degree) and 2-hop co-occurrence queries cost the sum of
+    the degrees visited. update() replaces one document's edges in place;
+    nothing is rebuilt when a batch is added. On disk the graph is stored
+    as CSR (document -> IOC) and the reverse direction is rebuilt on load.
+    """
+
+    def __init__(self, path=DEFAULT_GRAPH_PATH):
+        self.path = path
+        self.ioc_ids = {}
+        self.ioc_keys = []
+        self.doc_ids = {}
+        self.doc_keys = []
+        self.doc_versions = []
+        self.ioc_docs = []
+        self.doc_iocs = []
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path=DEFAULT_GRAPH_PATH):
+        graph = cls(path)
+        if not os.path.exists(path):
+            return graph
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except Exception as e:
+            print(f"⚠️ Failed to load IOC graph, starting empty: {str(e)}")
+            return graph
+
+        graph.ioc_keys = state['ioc_keys']
+        graph.doc_keys = state['doc_keys']
+        graph.doc_versions = state['doc_versions']
+        graph.ioc_ids = {key: i for i, key in enumerate(graph.ioc_keys)}
+        graph.doc_ids = {key: i for i, key in enumerate(graph.doc_keys)}
+        indptr, indices = state['indptr'], state['indices']
+        graph.doc_iocs = [indices[indptr[d]:indptr[d + 1]] for d in range(len(graph.doc_keys))]
+        graph.ioc_docs = [array('I') for _ in graph.ioc_keys]
+        for d, iocs in enumerate(graph.doc_iocs):
+            for i in iocs:
+                graph.ioc_docs[i].append(d)
+        return graph
+
+    def save(self):
+        with self._lock:
+            indptr = array('Q', [0])
+            indices = array('I')
+            for iocs in self.doc_iocs:
+                indices.extend(iocs)
+                indptr.append(len(indices))
+            state = {
+                'ioc_keys': self.ioc_keys,
+                'doc_keys': self.doc_keys,
+                'doc_versions': self.doc_versions,
+                'indptr': indptr,
+                'indices': indices,
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def _intern_ioc(self, key):
+        i = self.ioc_ids.get(key)
+        if i is None:
+            i = self.ioc_ids[key] = len(self.ioc_keys)
+            self.ioc_keys.append(key)
+            self.ioc_docs.append(array('I'))
+        return i
+
+    def _intern_doc(self, doc_id):
+        d = self.doc_ids.get(doc_id)
+        if d is None:
+            d = self.doc_ids[doc_id] = len(self.doc_keys)
+            self.doc_keys.append(doc_id)
+            self.doc_versions.append(None)
+            self.doc_iocs.append(array('I'))
+        return d
+
+    def update(self, doc_id, iocs, version=None):
+        """Replace the edges of one document with its current {type: [values]}"""
+        with self._lock:
+            d = self._intern_doc(doc_id)
+            new = {
+                self._intern_ioc(ioc_key(ioc_type, value))
+                for ioc_type, values in (iocs or {}).items() if isinstance(values, list)
+                for value in values if value
+            }
+            old = set(self.doc_iocs[d])
+            for i in old - new:
+                self.ioc_docs[i].remove(d)
+            for i in new - old:
+                self.ioc_docs[i].append(d)
+            self.doc_iocs[d] = array('I', sorted(new))
+            self.doc_versions[d] = version
+
+    def sync(self, collection, get_id):
+        """Index processed documents that are missing or out of date
+
+        Used at startup so a graph saved before a crash catches up with the
+        journaled results. Returns the number of documents updated.
+        """
+        updated = 0
+        for doc in collection:
+            processed = doc.get('nlp_processed')
+            if not isinstance(processed, dict) or not processed:
+                continue
+            doc_id = get_id(doc)
+            d = self.doc_ids.get(doc_id)
+            if d is None or self.doc_versions[d] != doc.get('processed_at'):
+                self.update(doc_id, processed.get('iocs', {}), doc.get('processed_at'))
+                updated += 1
+        return updated
+
+    def documents(self, ioc_type, value):
+        """Ids of the documents an indicator appears in"""
+        with self._lock:
+            i = self.ioc_ids.get(ioc_key(ioc_type, value))
+            if i is None:
+                return []
+            return [self.doc_keys[d] for d in self.ioc_docs[i]]
+
+    def document_iocs(self, doc_id):
+        with self._lock:
+            d = self.doc_ids.get(doc_id)
+            if d is None:
+                return []
+            return [self.ioc_keys[i] for i in self.doc_iocs[d]]
+
+    def cooccurring(self, ioc_type, value, types=None, limit=None):
+        """Indicators sharing a document with the given one (2-hop)
+
+        Returns [(ioc_key, shared_documents), ...] sorted by count,
+        optionally limited to IOC types such as ('crypto', 'emails').
+        """
+        with self._lock:
+            start = self.ioc_ids.get(ioc_key(ioc_type, value))
+            if start is None:
+                return []
+            counts = Counter()
+            for d in self.ioc_docs[start]:
+                counts.update(self.doc_iocs[d])
+            del counts[start]
+            prefixes = tuple(f"{t}:" for t in types) if types else None
+            related = [
+                (self.ioc_keys[i], n) for i, n in counts.most_common()
+                if prefixes is None or self.ioc_keys[i].startswith(prefixes)
+            ]
+        return related[:limit] if limit else related
+
+    def stats(self):
+        with self._lock:
+            edges = sum(len(iocs) for iocs in self.doc_iocs)
+            return {'iocs': len(self.ioc_keys), 'documents': len(self.doc_keys), 'edges': edges}
+
+    def memory_usage(self):
+        """Approximate bytes held by the index structures"""
+        with self._lock:
+            total = sum(sys.getsizeof(c) for c in (
+                self.ioc_ids, self.ioc_keys, self.doc_ids, self.doc_keys,
+                self.doc_versions, self.ioc_docs, self.doc_iocs
+            ))
+            total += sum(sys.getsizeof(key) for key in self.ioc_keys)
+            total += sum(sys.getsizeof(key) for key in self.doc_keys)
+            total += sum(sys.getsizeof(a) for a in self.ioc_docs)
+            total += sum(sys.getsizeof(a) for a in self.doc_iocs)
+            return total
@@ -0,0 +1,232 @@
+import ipaddress
+import re
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+from documents import is_processed
+
+# Query prefixes accepted by /search, e.g. "ip:10.0.0.0/8" or "btc:bc1q*"
+QUERY_TYPES = {
+    'ip': 'ips', 'ips': 'ips',
+    'domain': 'domains', 'domains': 'domains',
+    'email': 'emails', 'emails': 'emails',
+    'btc': 'crypto', 'eth': 'crypto', 'xmr': 'crypto', 'crypto': 'crypto',
+    'cve': 'cve',
+    'malware': 'malware',
+    'hacker': 'hacker',
+}
+TYPED_QUERY = re.compile(r'^\s*([a-z]+):(\S+)\s*$', re.IGNORECASE)
+
+
+def parse_ioc_query(query):
+    """Split "type:pattern" into (ioc_type, pattern), or None for a plain text query"""
+    match = TYPED_QUERY.match(query)
+    if not match or match.group(1).lower() not in QUERY_TYPES:
+        return None
+    return QUERY_TYPES[match.group(1).lower()], match.group(2).lower()
+
+
+def ipv4_int(value):
+    try:
+        return int(ipaddress.IPv4Address(value))
+    except ValueError:
+        return None
+
+
+class _SortedKeys:
+    """Sorted unique keys mapped to frozensets of document ids
+
+    Sets are replaced rather than mutated, so a forked copy can share them.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.docs = {}
+
+    def add(self, key, doc_id):
+        docs = self.docs.get(key)
+        if docs is None:
+            insort(self.keys, key)
+            docs = frozenset()
+        self.docs[key] = docs | {doc_id}
+
+    def discard(self, key, doc_id):
+        docs = self.docs.get(key)
+        if docs is None:
+            return
+        docs = docs - {doc_id}
+        if docs:
+            self.docs[key] = docs
+        else:
+            del self.docs[key]
+            del self.keys[bisect_left(self.keys, key)]
+
+    def range(self, low, high):
+        """Keys k with low <= k <= high"""
+        return self.keys[bisect_left(self.keys, low):bisect_right(self.keys, high)]
+
+    def prefix(self, prefix):
+        start = bisect_left(self.keys, prefix)
+        end = start
+        while end < len(self.keys) and self.keys[end].startswith(prefix):
+            end += 1
+        return self.keys[start:end]
+
+    def copy(self):
+        clone = _SortedKeys()
+        clone.keys = list(self.keys)
+        clone.docs = dict(self.docs)
+        return clone
+
+
+class IOCIndex:
+    """Typed indicator indexes mapping IOC values to document ids.
+
+    - ips: sorted IPv4 integers, so exact and CIDR queries are two bisects
+    - domains, crypto: sorted strings for prefix queries ("bc1q*"); domains
+      also keep reversed strings for suffix queries ("*.onion")
+    - emails, cve, malware, hacker: hash maps for exact lookups
+
+    Values are lowercased, matching the case-insensitive /search.
+    """
+
+    SORTED_TYPES = ('domains', 'crypto')
+    EXACT_TYPES = ('emails', 'cve', 'malware', 'hacker')
+
+    def __init__(self):
+        self.ips = _SortedKeys()
+        self.sorted = {ioc_type: _SortedKeys() for ioc_type in self.SORTED_TYPES}
+        self.reversed_domains = _SortedKeys()
+        self.exact = {ioc_type: {} for ioc_type in self.EXACT_TYPES}
+        self.doc_entries = {}
+        self._lock = threading.Lock()
+
+    def _entries(self, iocs):
+        entries = set()
+        for ioc_type, values in (iocs or {}).items():
+            if not isinstance(values, list):
+                continue
+            for value in values:
+                if not value:
+                    continue
+                value = str(value).lower()
+                if ioc_type == 'ips':
+                    ip = ipv4_int(value)
+                    if ip is not None:
+                        entries.add(('ips', ip))
+                elif ioc_type in self.SORTED_TYPES or ioc_type in self.EXACT_TYPES:
+                    entries.add((ioc_type, value))
+        return entries
+
+    def rebuild(self, documents_by_id):
+        """Index every processed document of a collection snapshot"""
+        for doc_id, doc in documents_by_id.items():
+            if is_processed(doc):
+                self.add(doc_id, doc['nlp_processed'].get('iocs', {}))
+
+    def apply(self, doc_id, old_doc, new_doc):
+        """Follow one document change; new_doc is None when it was removed"""
+        if new_doc is not None and is_processed(new_doc):
+            self.add(doc_id, new_doc['nlp_processed'].get('iocs', {}))
+        else:
+            self.remove(doc_id)
+
+    def add(self, doc_id, iocs):
+        """Index (or re-index) the {type: [values]} of one document"""
+        with self._lock:
+            self._remove(doc_id)
+            entries = self._entries(iocs)
+            for ioc_type, key in entries:
+                if ioc_type == 'ips':
+                    self.ips.add(key, doc_id)
+                elif ioc_type in self.sorted:
+                    self.sorted[ioc_type].add(key, doc_id)
+                    if ioc_type == 'domains':
+                        self.reversed_domains.add(key[::-1], doc_id)
+                else:
+                    bucket = self.exact[ioc_type]
+                    bucket[key] = bucket.get(key, frozenset()) | {doc_id}
+            if entries:
+                self.doc_entries[doc_id] = entries
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        for ioc_type, key in self.doc_entries.pop(doc_id, ()):
+            if ioc_type == 'ips':
+                self.ips.discard(key, doc_id)
+            elif ioc_type in self.sorted:
+                self.sorted[ioc_type].discard(key, doc_id)
+                if ioc_type == 'domains':
+                    self.reversed_domains.discard(key[::-1], doc_id)
+            else:
+                bucket = self.exact[ioc_type]
+                docs = bucket.get(key, frozenset()) - {doc_id}
+                if docs:
+                    bucket[key] = docs
+                else:
+                    bucket.pop(key, None)
+
+    def _matches(self, ioc_type, pattern):
+        """(keys, _SortedKeys or dict) for one typed pattern"""
+        if ioc_type == 'ips':
+            if '/' in pattern:
+                network = ipaddress.IPv4Network(pattern, strict=False)
+                low, high = int(network.network_address), int(network.broadcast_address)
+                return self.ips.range(low, high), self.ips.docs
+            if pattern.endswith('*'):
+                # "10.1.*" is shorthand for the covering CIDR block
+                octets = [o for o in pattern.rstrip('*').split('.') if o]
+                network = ipaddress.IPv4Network('.'.join(octets + ['0'] * (4 - len(octets))) + f"/{8 * len(octets)}")
+                return self._matches('ips', str(network))
+            ip = ipv4_int(pattern)
+            return ([ip] if ip in self.ips.docs else []), self.ips.docs
+        if ioc_type in self.sorted:
+            index = self.sorted[ioc_type]
+            if ioc_type == 'domains' and pattern.startswith('*'):
+                suffix = pattern.lstrip('*')
+                return [key[::-1] for key in self.reversed_domains.prefix(suffix[::-1])], index.docs
+            if pattern.endswith('*'):
+                return index.prefix(pattern.rstrip('*')), index.docs
+            return ([pattern] if pattern in index.docs else []), index.docs
+        bucket = self.exact[ioc_type]
+        return ([pattern] if pattern in bucket else []), bucket
+
+    def query(self, ioc_type, pattern, limit=None):
+        """Documents matching a typed pattern as {doc_id: [matched values]}
+
+        Exact patterns are a hash or bisect lookup; CIDR ranges ("10.0.0.0/8")
+        and prefixes ("bc1q*", "*.onion") cost O(log n) plus the matches.
+        Raises ValueError for a malformed IP or network.
+        """
+        with self._lock:
+            keys, docs = self._matches(ioc_type, pattern)
+            results = {}
+            for key in keys:
+                value = str(ipaddress.IPv4Address(key)) if ioc_type == 'ips' else key
+                for doc_id in docs[key]:
+                    results.setdefault(doc_id, []).append(value)
+                if limit and len(results) >= limit:
+                    break
+            return results
+
+    def fork(self):
+        """Copy-on-write clone; the per-value document sets are shared"""
+        with self._lock:
+            clone = IOCIndex.__new__(IOCIndex)
+            clone.ips = self.ips.copy()
+            clone.sorted = {ioc_type: index.copy() for ioc_type, index in self.sorted.items()}
+            clone.reversed_domains = self.reversed_domains.copy()
+            clone.exact = {ioc_type: dict(bucket) for ioc_type, bucket in self.exact.items()}
+            clone.doc_entries = dict(self.doc_entries)
+            clone._lock = threading.Lock()
+            return clone
+
+    def stats(self):
+        with self._lock:
+            counts = {'ips': len(self.ips.keys)}
+            counts.update({ioc_type: len(index.keys) for ioc_type, index in self.sorted.items()})
+            counts.update({ioc_type: len(bucket) for ioc_type, bucket in self.exact.items()})
+            return {'documents': len(self.doc_entries), 'values': counts}
@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+
+from documents import document_id
+
+# Fields written to the journal for each processed document
+JOURNAL_FIELDS = ('nlp_processed', 'processed_at', 'processing_stats', 'triage')
+
+
+class ResultJournal:
+    """Append-only JSONL journal of processor results on top of a JSON snapshot.
+
+    Each batch appends one line per document, so a save costs time in
+    proportion to the batch rather than the corpus. compact() folds the
+    journal back into the snapshot with an atomic rename. A torn final
+    line left by a crash is ignored on replay and trimmed before the next
+    append.
+    """
+
+    def __init__(self, snapshot_path, journal_path=None, compact_bytes=64 * 1024 * 1024, repair=True):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or os.path.splitext(snapshot_path)[0] + ".journal.jsonl"
+        self.compact_bytes = compact_bytes
+        self._lock = threading.Lock()
+        # Readers (the API) must not truncate a line the processor is still writing
+        if repair:
+            self._repair()
+
+    def _repair(self):
+        """Truncate a partially written trailing line left by a crash"""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+                print("⚠️ Dropped incomplete trailing journal record")
+
+    def size(self):
+        try:
+            return os.path.getsize(self.journal_path)
+        except OSError:
+            return 0
+
+    def identity(self):
+        """(device, inode) of the journal file, or None when there is none
+
+        compact() swaps in a new file, so a changed identity means the
+        journal was replaced even if it has already grown past an old offset.
+        """
+        try:
+            stat = os.stat(self.journal_path)
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def read(self, offset=0):
+        """Yield (record, end_offset) for every complete record after offset"""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    yield json.loads(line), offset
+                except json.JSONDecodeError:
+                    continue
+
+    def replay(self, collection):
+        """Apply journaled results to a freshly loaded snapshot in place"""
+        by_id = {document_id(doc): doc for doc in collection}
+        applied = 0
+        for record, _ in self.read():
+            doc = by_id.get(record.get('id'))
+            if doc is None:
+                continue
+            for field in JOURNAL_FIELDS:
+                if field in record:
+                    doc[field] = record[field]
+            applied += 1
+        if applied:
+            print(f"✅ Replayed {applied} journal records")
+        return applied
+
+    def append(self, docs):
+        """Durably append the processor fields of the given documents"""
+        if not docs:
+            return
+        lines = []
+        for doc in docs:
+            record = {'id': document_id(doc)}
+            for field in JOURNAL_FIELDS:
+                if field in doc:
+                    record[field] = doc[field]
+            lines.append(json.dumps(record, default=str))
+        with self._lock:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def should_compact(self):
+        return self.size() >= self.compact_bytes
+
+    def compact(self, collection):
+        """Write a new snapshot and reset the journal
+
+        The snapshot is replaced atomically before the journal is cleared;
+        a crash in between only leaves records that replay idempotently.
+        """
+        with self._lock:
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(collection, f, default=str)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+            tmp_journal = f"{self.journal_path}.tmp"
+            open(tmp_journal, 'w').close()
+            os.replace(tmp_journal, self.journal_path)
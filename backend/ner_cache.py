@@ -0,0 +1,130 @@
+import hashlib
+import os
+import pickle
+import re
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+
+WHITESPACE = re.compile(r'\s+')
+# Bumped when the stored entity layout changes; older persisted caches are discarded
+CACHE_FORMAT = 2
+
+
+def original_offsets(paragraph):
+    """Map offsets in NERCache.normalize(paragraph) back to offsets in paragraph
+
+    Returns a function of a normalized offset. Normalization only
+    shortens whitespace runs, so the map is a handful of shifted segments.
+    """
+    stripped = paragraph.lstrip()
+    lead = len(paragraph) - len(stripped)
+    breaks = [0]
+    origins = [lead]
+    removed = 0
+    for match in WHITESPACE.finditer(stripped.rstrip()):
+        removed += match.end() - match.start() - 1
+        breaks.append(match.end() - removed)
+        origins.append(lead + match.end())
+
+    def to_original(offset):
+        i = bisect_right(breaks, offset) - 1
+        return origins[i] + offset - breaks[i]
+    return to_original
+
+
+class NERCache:
+    """Bounded LRU of NER results keyed by the hash of a normalized paragraph.
+
+    Forum and market pages repeat the same headers, footers, rules and
+    vendor signatures; caching per paragraph means only unseen paragraphs
+    are sent to the model. Entities are stored with offsets relative to
+    the normalized paragraph (see normalize and original_offsets), so
+    every whitespace variant of it can share them. The cache can be
+    persisted between runs; entries from
+    a different NER model (namespace) are discarded on load.
+    """
+
+    def __init__(self, max_entries=100000, path=None, namespace=''):
+        self.max_entries = max_entries
+        self.path = path
+        self.namespace = namespace
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._load()
+
+    @staticmethod
+    def normalize(paragraph):
+        """The paragraph with whitespace runs collapsed to one space and stripped"""
+        return WHITESPACE.sub(' ', paragraph).strip()
+
+    @staticmethod
+    def digest(normalized):
+        return hashlib.sha1(normalized.encode('utf-8', 'replace')).digest()
+
+    def key(self, paragraph):
+        return self.digest(self.normalize(paragraph))
+
+    def get(self, key):
+        with self._lock:
+            entities = self._entries.get(key)
+            if entities is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entities
+
+    def count_hits(self, n=1):
+        """Count lookups answered without get(), e.g. repeats of a paragraph parsed once"""
+        with self._lock:
+            self.hits += n
+
+    def put(self, key, entities):
+        with self._lock:
+            self._entries[key] = tuple(entities)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'entries': len(self._entries),
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                state = pickle.load(f)
+            if state.get('namespace') != self.namespace or state.get('format') != CACHE_FORMAT:
+                print("ℹ️ NER cache was built with a different model or format, ignoring it")
+                return
+            for key, entities in state['entries'][-self.max_entries:]:
+                self._entries[key] = entities
+            print(f"✅ Loaded {len(self._entries)} cached NER paragraphs")
+        except Exception as e:
+            print(f"⚠️ Failed to load NER cache: {str(e)}")
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            state = {'namespace': self.namespace, 'format': CACHE_FORMAT, 'entries': list(self._entries.items())}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
@@ -1,43 +1,138 @@
 import os
 import re
-import spacy
-from textblob import TextBlob
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.decomposition import LatentDirichletAllocation
-import pandas as pd
-import en_core_web_lg
-import networkx as nx
-import matplotlib.pyplot as plt
-from collections import Counter
-import geoip2.database
-import pycountry
 from dotenv import load_dotenv
 import requests
 import html2text
 from datetime import datetime
 import json
-from OTXv2 import OTXv2
 import concurrent.futures
+import threading
 import time
+from journal import ResultJournal
+from chunked_ner import ChunkedNER
+from ner_cache import NERCache
+from documents import document_id
+from work_queue import WorkQueue
+from stage_profiler import StageProfiler
+from triage import TriageConfig, triage, FULL, REGEX_ONLY, SKIP, ROUTES
 
 # Load environment
 load_dotenv("./config/.env")
-nlp = en_core_web_lg.load()
-nlp.add_pipe('sentencizer')
+
+# Heavy dependencies (spaCy, TextBlob, scikit-learn, OTX, GeoIP) are imported
+# on first use so that a run with nothing to process starts instantly.
+# Only the entity recognizer is used, so the rest of the pipeline is skipped.
+DEFAULT_NER_MODEL = "en_core_web_lg"
+UNUSED_PIPES = ['tagger', 'parser', 'attribute_ruler', 'lemmatizer']
+
+# Processing stages that can be rerun selectively (see force_reprocess)
+STAGES = ('iocs', 'enrichment', 'geolocation', 'sentiment', 'topics')
+_nlp = None
+_nlp_lock = threading.Lock()
+
+def get_nlp():
+    """Load the spaCy pipeline on first use
+
+    The model is chosen with NER_MODEL (default en_core_web_lg). A smaller
+    package such as en_core_web_sm starts faster and uses far less memory
+    at some cost in entity accuracy.
+    """
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                import spacy
+                model = os.getenv("NER_MODEL", DEFAULT_NER_MODEL)
+                print(f"🧠 Loading spaCy model {model}...")
+                pipeline = spacy.load(model, exclude=UNUSED_PIPES)
+                pipeline.add_pipe('sentencizer')
+                _nlp = pipeline
+    return _nlp
 
 class DarkWebNLP:
-    def __init__(self):
+    def __init__(self, data_dir=None):
         # Use JSON file instead of BSON
-        self.json_file_path = os.path.join(os.path.dirname(__file__), "data", "threat_intel_content.json")
+        self.data_dir = data_dir or os.path.join(os.path.dirname(__file__), "data")
+        self.json_file_path = os.path.join(self.data_dir, "threat_intel_content.json")
         print(f"Loading JSON file from: {self.json_file_path}")
+        self.journal = ResultJournal(self.json_file_path)
         self.collection = self._load_json_data()
-        self.geoip = self._init_geoip()
+        self.journal.replay(self.collection)
+        self.queue = WorkQueue(os.path.join(self.data_dir, "processing_queue.db"))
         self.h = html2text.HTML2Text()
         self.h.ignore_links = False
         self.h.ignore_images = True
-        self.otx = self._init_otx()
         self.max_workers = 4  # Number of parallel workers
         self.batch_size = 50  # Process documents in batches
+        self.ner_cache = None
+        if os.getenv("NER_CACHE", "1") != "0":
+            self.ner_cache = NERCache(
+                max_entries=int(os.getenv("NER_CACHE_SIZE", "100000")),
+                path=os.path.join(self.data_dir, "ner_cache.pkl") if os.getenv("NER_CACHE_PERSIST") == "1" else None,
+                namespace=os.getenv("NER_MODEL", DEFAULT_NER_MODEL)
+            )
+        self.ner = ChunkedNER(get_nlp, cache=self.ner_cache)
+        self._lazy_lock = threading.Lock()
+        self._geoip = None
+        self._otx = None
+        self._otx_initialized = False
+        self._topic_model = None
+        self._sentiment_scorer = None
+        self._ioc_graph = None
+        self.sentiment_engine = os.getenv("SENTIMENT_ENGINE", "textblob")
+        # The IOC graph is saved at least this often during a run so /iocs/related stays current
+        self.graph_save_seconds = float(os.getenv("IOC_GRAPH_SAVE_SECONDS", "60"))
+        self.triage_config = TriageConfig()
+        self.profiler = StageProfiler(
+            sampling=os.getenv("PROFILE_SAMPLING") == "1",
+            slowest_n=int(os.getenv("PROFILE_SLOWEST", "10"))
+        )
+
+    @property
+    def geoip(self):
+        if self._geoip is None:
+            with self._lazy_lock:
+                if self._geoip is None:
+                    from geoip_service import GeoIPService
+                    self._geoip = GeoIPService()
+        return self._geoip
+
+    @property
+    def otx(self):
+        """OTX client, created (and its connectivity checked) on first lookup"""
+        if not self._otx_initialized:
+            with self._lazy_lock:
+                if not self._otx_initialized:
+                    self._otx = self._init_otx()
+                    self._otx_initialized = True
+        return self._otx
+
+    @property
+    def sentiment_scorer(self):
+        if self._sentiment_scorer is None:
+            with self._lazy_lock:
+                if self._sentiment_scorer is None:
+                    from sentiment import BatchSentimentScorer
+                    self._sentiment_scorer = BatchSentimentScorer()
+        return self._sentiment_scorer
+
+    @property
+    def ioc_graph(self):
+        if self._ioc_graph is None:
+            with self._lazy_lock:
+                if self._ioc_graph is None:
+                    from ioc_graph import IOCGraph
+                    self._ioc_graph = IOCGraph.load(os.path.join(self.data_dir, "ioc_graph.pkl"))
+        return self._ioc_graph
+
+    @property
+    def topic_model(self):
+        if self._topic_model is None:
+            with self._lazy_lock:
+                if self._topic_model is None:
+                    from topic_model import OnlineTopicModel
+                    self._topic_model = OnlineTopicModel.load(os.path.join(self.data_dir, "topic_model.joblib"))
+        return self._topic_model
     
     def _load_json_data(self):
         """Load data from JSON file"""
@@ -80,23 +175,23 @@ class DarkWebNLP:
                 print(f"❌ Failed to recover data: {str(e2)}")
                 return []
     
-    def _save_json_data(self):
-        """Save data to JSON file"""
+    def _save_json_data(self, docs=None):
+        """Save results to the journal, or the whole collection when docs is None
+
+        Journal appends only cost the size of the batch; the full snapshot
+        is rewritten when the journal grows past its compaction threshold.
+        """
         try:
-            with open(self.json_file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.collection, f, indent=2, default=str)
+            if docs is not None:
+                self.journal.append(docs)
+                print(f"✅ Journaled {len(docs)} documents")
+                if not self.journal.should_compact():
+                    return
+            self.journal.compact(self.collection)
             print("✅ Data saved to JSON file")
         except Exception as e:
             print(f"❌ Error saving JSON file: {str(e)}")
     
-    def _init_geoip(self):
-        if os.path.exists("./data/GeoLite2-City.mmdb"):
-            return {
-                'city': geoip2.database.Reader('./data/GeoLite2-City.mmdb'),
-                'asn': geoip2.database.Reader('./data/GeoLite2-ASN.mmdb')
-            }
-        return None
-    
     def _init_otx(self):
         """Initialize OTX client if API key is available"""
         api_key = os.getenv("OTX_API_KEY")
@@ -106,6 +201,7 @@ class DarkWebNLP:
         try:
             print("🔑 Initializing OTX client...")
             print("📝 Creating OTXv2 instance...")
+            from OTXv2 import OTXv2
             otx_client = OTXv2(api_key)
             print("🔍 Testing OTX connection...")
             try:
@@ -132,23 +228,31 @@ class DarkWebNLP:
             print(f"⚠️ Failed to initialize OTX client: {str(e)}")
             return None
     
-    def extract_iocs(self, text):
-        doc = nlp(text)
-        iocs = {
+    def extract_regex_iocs(self, text):
+        """Pattern-based indicators (no NER): IP, EMAIL, DOMAIN, CRYPTO, CVE"""
+        return {
             'IP': re.findall(r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b', text),
             'EMAIL': re.findall(r'[\w\.-]+@[\w\.-]+', text),
             'DOMAIN': re.findall(r'(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z0-9][a-z0-9-]{0,61}[a-z0-9]', text, re.IGNORECASE),
-            'CRYPTO': re.findall(r'(bc1|[13])[a-zA-HJ-NP-Z0-9]{25,39}|0x[a-fA-F0-9]{40}', text),
-            'CVE': re.findall(r'CVE-\d{4}-\d{4,7}', text),
-            'MALWARE': [],
-            'HACKER': []
+            'CRYPTO': re.findall(r'(?:bc1|[13])[a-zA-HJ-NP-Z0-9]{25,39}|0x[a-fA-F0-9]{40}', text),
+            'CVE': re.findall(r'CVE-\d{4}-\d{4,7}', text)
         }
-        
-        for ent in doc.ents:
-            if ent.label_ in ('ORG', 'PERSON') and any(x in ent.text.lower() for x in ['group', 'crew', 'team', 'hacker']):
-                iocs['HACKER'].append(ent.text)
-            elif ent.label_ == 'PRODUCT' and any(x in ent.text.lower() for x in ['malware', 'rat', 'exploit', 'trojan', 'virus']):
-                iocs['MALWARE'].append(ent.text)
+
+    def extract_entity_iocs(self, text):
+        """NER-based indicators: MALWARE products and HACKER groups"""
+        iocs = {'MALWARE': [], 'HACKER': []}
+        for _, _, label, ent_text in self.ner.entities(text):
+            if label in ('ORG', 'PERSON') and any(x in ent_text.lower() for x in ['group', 'crew', 'team', 'hacker']):
+                iocs['HACKER'].append(ent_text)
+            elif label == 'PRODUCT' and any(x in ent_text.lower() for x in ['malware', 'rat', 'exploit', 'trojan', 'virus']):
+                iocs['MALWARE'].append(ent_text)
+        return iocs
+
+    def extract_iocs(self, text, stats=None):
+        with self.profiler.stage(stats, 'ioc_regex'):
+            iocs = self.extract_regex_iocs(text)
+        with self.profiler.stage(stats, 'ner'):
+            iocs.update(self.extract_entity_iocs(text))
         
         # Remove duplicates and empty lists
         return {k: list(set(v)) for k, v in iocs.items() if v}
@@ -188,99 +292,108 @@ class DarkWebNLP:
             print(f"⚠️ Unexpected error checking OTX for {indicator_type} {indicator}: {str(e)}")
             return None
     
-    def geolocate(self, ip):
-        if not self.geoip:
-            return None
-        try:
-            city = self.geoip['city'].city(ip)
-            asn = self.geoip['asn'].asn(ip)
-            return {
-                'country': city.country.name,
-                'city': city.city.name,
-                'latitude': city.location.latitude,
-                'longitude': city.location.longitude,
-                'asn': asn.autonomous_system_number,
-                'isp': asn.autonomous_system_organization
+    def enrich(self, iocs):
+        """Look up a document's IPs, domains and hashes in AbuseIPDB and OTX"""
+        return {
+            'abuseipdb': {ip: self.check_abuseipdb(ip) for ip in iocs.get('ips', [])},
+            'otx': {
+                'ip': {ip: self.check_otx(ip, 'IPv4') for ip in iocs.get('ips', [])},
+                'domain': {domain: self.check_otx(domain, 'domain') for domain in iocs.get('domains', [])},
+                'hash': {hash: self.check_otx(hash, 'file_hash') for hash in iocs.get('hashes', [])}
             }
-        except:
-            return None
+        }
+
+    def geolocate(self, ip):
+        return self.geoip.geolocate(ip)
+
+    def build_geo_data(self, ips, geo_lookup):
+        """Build the per-document geolocation list from a {ip: geo} lookup"""
+        geo_data = []
+        for ip in ips:
+            geo = geo_lookup.get(ip)
+            if geo:
+                geo_data.append({
+                    'ip': ip,
+                    'country': geo['country'],
+                    'city': geo['city'],
+                    'latitude': geo['latitude'],
+                    'longitude': geo['longitude'],
+                    'asn': geo['asn'],
+                    'isp': geo['isp']
+                })
+        return geo_data
     
     def analyze_sentiment(self, text):
-        analysis = TextBlob(text)
-        threat_terms = ['exploit', 'leak', 'attack', 'malware', 'breach', 'vulnerability', 'hack', 'compromise']
-        threat_score = sum(text.lower().count(term) for term in threat_terms)
-        
-        # Determine sentiment label based on polarity and threat score
-        if analysis.sentiment.polarity > 0.2 and threat_score < 2:
-            label = 'positive'
-        elif analysis.sentiment.polarity < -0.2 or threat_score > 3:
-            label = 'negative'
-        else:
-            label = 'neutral'
-        
-        return {
-            'polarity': analysis.sentiment.polarity,
-            'subjectivity': analysis.sentiment.subjectivity,
-            'threat_score': threat_score,
-            'label': label
-        }
+        return self.analyze_sentiment_batch([text])[0]
+
+    def analyze_sentiment_batch(self, texts):
+        """Score a batch of texts with the configured SENTIMENT_ENGINE
+
+        'textblob' (default) runs TextBlob per document; 'batch' scores the
+        whole batch with sparse matrix operations. Check that the batch
+        engine agrees with TextBlob (benchmark.py sentiment) before
+        switching, since it changes stored labels.
+        """
+        if self.sentiment_engine == 'textblob':
+            from sentiment import textblob_sentiment
+            return [textblob_sentiment(text) for text in texts]
+        return self.sentiment_scorer.score(texts)
     
-    def topic_modeling(self, texts, n_topics=5):
+    def topic_modeling(self, texts):
+        """Update the persistent topic model with new texts and assign topics
+
+        Returns (topics, assignments): the current {topic_id: [(word, weight)]}
+        summary and, per text, the ids of its dominant topics.
+        """
         if not texts:
-            return {}
-            
-        tfidf = TfidfVectorizer(max_df=0.95, min_df=2, stop_words='english')
-        lda = LatentDirichletAllocation(n_components=n_topics, random_state=42)
-        X = tfidf.fit_transform(texts)
-        lda.fit(X)
-        
-        topics = {}
-        for idx, topic in enumerate(lda.components_):
-            topics[f"topic_{idx}"] = [
-                (tfidf.get_feature_names_out()[i], round(topic[i], 3)) 
-                for i in topic.argsort()[-10:][::-1]
-            ]
-        return topics
+            return {}, []
+
+        for i in range(0, len(texts), self.batch_size):
+            self.topic_model.partial_fit(texts[i:i + self.batch_size])
+        self.topic_model.save()
+        return self.topic_model.topics(), self.topic_model.dominant_topics(texts)
     
-    def process_document(self, doc):
-        """Process a single document"""
+    def attach_topics(self, docs):
+        """Update the topic model with a batch and tag each document with its topics
+
+        Documents get the ids of their dominant topics and the lead word of each.
+        """
+        texts = [doc['nlp_processed'].get('clean_text', '') for doc in docs]
+        topics, assignments = self.topic_modeling(texts)
+        for doc, topic_ids in zip(docs, assignments):
+            doc['nlp_processed']['topic_ids'] = topic_ids
+            doc['nlp_processed']['topics'] = [topics[t][0][0] for t in topic_ids if topics.get(t)]
+
+    def process_document(self, doc, batched=False, stages=None, stats=None, route=FULL):
+        """Process a single document
+
+        With batched=True geolocation and sentiment are left for the caller
+        to compute for a whole batch at once (attach_geolocation and
+        attach_sentiment).
+        stages limits reprocessing of an already processed document to the
+        given subset of STAGES; the other fields are kept as they were.
+        stats, from StageProfiler.document, collects per-stage timings.
+        route=REGEX_ONLY (from triage) extracts pattern IOCs only and skips
+        NER and the threat-intel lookups.
+        """
         try:
-            content = doc.get('clean_text', '') or self.h.handle(doc.get('raw_html', ''))
+            with self.profiler.stage(stats, 'content'):
+                content = doc.get('clean_text', '') or self.h.handle(doc.get('raw_html', ''))
             if not content:
                 return None
+
+            previous = doc.get('nlp_processed')
+            if not isinstance(previous, dict) or not previous or not stages:
+                previous, stages = {}, STAGES
+            result = dict(previous)
                 
-            iocs = self.extract_iocs(content)
-            
-            # Threat intelligence lookups
-            threat_intel = {
-                'abuseipdb': {ip: self.check_abuseipdb(ip) for ip in iocs.get('IP', [])},
-                'otx': {
-                    'ip': {ip: self.check_otx(ip, 'IPv4') for ip in iocs.get('IP', [])},
-                    'domain': {domain: self.check_otx(domain, 'domain') for domain in iocs.get('DOMAIN', [])},
-                    'hash': {hash: self.check_otx(hash, 'file_hash') for hash in iocs.get('HASH', [])}
-                }
-            }
-            
-            # Geolocation
-            geo_data = []
-            for ip in iocs.get('IP', []):
-                geo = self.geolocate(ip)
-                if geo:
-                    geo_data.append({
-                        'ip': ip,
-                        'country': geo['country'],
-                        'city': geo['city'],
-                        'latitude': geo['latitude'],
-                        'longitude': geo['longitude'],
-                        'asn': geo['asn'],
-                        'isp': geo['isp']
-                    })
-            
-            # Sentiment analysis
-            sentiment = self.analyze_sentiment(content)
-            
-            return {
-                'iocs': {
+            if 'iocs' in stages:
+                if route == REGEX_ONLY:
+                    with self.profiler.stage(stats, 'ioc_regex'):
+                        iocs = {k: list(set(v)) for k, v in self.extract_regex_iocs(content).items() if v}
+                else:
+                    iocs = self.extract_iocs(content, stats)
+                result['iocs'] = {
                     'ips': iocs.get('IP', []),
                     'domains': iocs.get('DOMAIN', []),
                     'emails': iocs.get('EMAIL', []),
@@ -288,88 +401,276 @@ class DarkWebNLP:
                     'cve': iocs.get('CVE', []),
                     'malware': iocs.get('MALWARE', []),
                     'hacker': iocs.get('HACKER', [])
-                },
-                'threat_intel': threat_intel,
-                'geolocation': geo_data,
-                'sentiment': {
-                    'label': sentiment['label'],
-                    'score': sentiment['polarity'],
-                    'threat_score': sentiment['threat_score']
-                },
-                'clean_text': content
-            }
+                }
+            iocs = result.get('iocs', {})
+            if stats is not None:
+                stats['indicators'] = sum(len(values) for values in iocs.values())
+            
+            # Threat intelligence lookups
+            if 'enrichment' in stages and route != REGEX_ONLY:
+                with self.profiler.stage(stats, 'enrichment'):
+                    result['threat_intel'] = self.enrich(iocs)
+            
+            # Geolocation
+            if 'geolocation' in stages:
+                geo_data = []
+                if not batched:
+                    with self.profiler.stage(stats, 'geolocation'):
+                        ips = iocs.get('ips', [])
+                        geo_data = self.build_geo_data(ips, self.geoip.geolocate_many(ips))
+                result['geolocation'] = geo_data
+            
+            # Sentiment analysis
+            if 'sentiment' in stages and not batched:
+                with self.profiler.stage(stats, 'sentiment'):
+                    self.attach_sentiment([result], [content])
+
+            result['clean_text'] = content
+            return result
         except Exception as e:
             print(f"❌ Failed to process document: {str(e)}")
             return None
     
+    def attach_geolocation(self, results):
+        """Resolve every IP in a batch of results with one geolocate_many call"""
+        ips = set()
+        for result in results:
+            ips.update(result['iocs'].get('ips', []))
+        geo_lookup = self.geoip.geolocate_many(ips)
+        for result in results:
+            result['geolocation'] = self.build_geo_data(result['iocs'].get('ips', []), geo_lookup)
+
+    def attach_sentiment(self, results, texts=None):
+        """Score the sentiment of a batch of results in one call"""
+        if texts is None:
+            texts = [result['clean_text'] for result in results]
+        for result, sentiment in zip(results, self.analyze_sentiment_batch(texts)):
+            result['sentiment'] = {
+                'label': sentiment['label'],
+                'score': sentiment['polarity'],
+                'threat_score': sentiment['threat_score']
+            }
+
+    def _process_with_stats(self, doc, stages):
+        """Worker entry point: triage and process a document under the stage profiler
+
+        Returns (result, stats, triage decision); result is None for
+        skipped documents. Explicit stage reruns bypass triage.
+        """
+        chars = len(doc.get('clean_text') or doc.get('raw_html') or '')
+        with self.profiler.document(document_id(doc), chars) as stats:
+            decision = None
+            if not stages:
+                with self.profiler.stage(stats, 'triage'):
+                    decision = triage(doc.get('clean_text') or doc.get('raw_html') or '', self.triage_config)
+                if decision['route'] == SKIP:
+                    return None, stats, decision
+            route = decision['route'] if decision else FULL
+            result = self.process_document(doc, True, stages, stats, route)
+        return result, stats, decision
+
+    def _timed_batch_stage(self, name, fn, items):
+        """Run a batched stage and charge its time to the documents in it"""
+        start = time.perf_counter()
+        fn([result for _, result, _ in items])
+        self.profiler.add_batch_stage([stats for _, _, stats in items], name, time.perf_counter() - start)
+
     def process_all_content(self):
-        """Process all unanalyzed pages from threat_intel_content"""
-        # Find documents that either don't have nlp_processed or have it as a boolean False
-        unprocessed = [
-            doc for doc in self.collection 
-            if not doc.get('nlp_processed') or 
-               (isinstance(doc.get('nlp_processed'), bool) and not doc.get('nlp_processed'))
-        ]
+        """Process every queued document, resuming where a previous run stopped
+
+        New, unprocessed and changed documents are queued first. Each batch
+        is leased from the work queue, topic-modeled, journaled and marked
+        done, so a crash only loses the batch that was in flight.
+        """
+        by_id = {document_id(doc): doc for doc in self.collection}
+        queued = self.queue.sync(self.collection)
+        released = self.queue.release_leases()
+        retried = self.queue.retry_failed()
+        counts = self.queue.counts()
         
         print(f"📊 Total documents in collection: {len(self.collection)}")
-        print(f"📝 Documents needing processing: {len(unprocessed)}")
+        print(f"📝 Newly queued: {queued}, resumed: {released}, retried: {retried}")
+        print(f"📝 Documents needing processing: {counts['pending']}")
         
-        if not unprocessed:
+        if not counts['pending']:
             print("✅ No unprocessed documents found")
             return
         
-        print(f"📊 Processing {len(unprocessed)} documents...")
+        print(f"📊 Processing {counts['pending']} documents...")
+        caught_up = self.ioc_graph.sync(self.collection, document_id)
+        if caught_up:
+            print(f"🕸️ IOC graph caught up with {caught_up} documents")
         
         # Process documents in batches
-        for i in range(0, len(unprocessed), self.batch_size):
-            batch = unprocessed[i:i + self.batch_size]
-            print(f"Processing batch {i//self.batch_size + 1} of {(len(unprocessed) + self.batch_size - 1)//self.batch_size}")
+        route_counts = dict.fromkeys(ROUTES, 0)
+        batch_number = 0
+        graph_saved_at = time.monotonic()
+        while True:
+            leased = self.queue.lease(self.batch_size)
+            if not leased:
+                break
+            orphans = [doc_id for doc_id, _ in leased if doc_id not in by_id]
+            if orphans:
+                # Queued before the document left the collection; drop them and keep leasing
+                self.queue.forget(orphans)
+            jobs = [(by_id[doc_id], stages) for doc_id, stages in leased if doc_id in by_id]
+            # A stage subset only applies to documents that already have results
+            jobs = [(doc, stages if isinstance(doc.get('nlp_processed'), dict) and doc['nlp_processed'] else None)
+                    for doc, stages in jobs]
+            if not jobs:
+                continue
+            batch_number += 1
+            print(f"Processing batch {batch_number} ({len(jobs)} documents)")
             
             # Process documents in parallel
+            batch_results = []
+            skipped = []
+            profiled = []
             with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = {executor.submit(self.process_document, doc): doc for doc in batch}
+                futures = {executor.submit(self._process_with_stats, doc, stages): (doc, stages) for doc, stages in jobs}
                 for future in concurrent.futures.as_completed(futures):
-                    doc = futures[future]
+                    doc, stages = futures[future]
                     try:
-                        result = future.result()
-                        if result:
-                            doc['nlp_processed'] = result
-                            doc['processed_at'] = datetime.utcnow().isoformat()
-                            print(f"✅ Processed {doc.get('url', 'unknown')}")
+                        result, stats, decision = future.result()
+                        profiled.append((document_id(doc), stats))
+                        if decision:
+                            doc['triage'] = decision
+                            route_counts[decision['route']] += 1
+                        if decision and decision['route'] == SKIP:
+                            skipped.append(doc)
+                        elif result:
+                            batch_results.append((doc, stages, result, stats))
+                        else:
+                            self.queue.fail(document_id(doc), "no content or processing error")
                     except Exception as e:
                         print(f"❌ Failed to process {doc.get('url', 'unknown')}: {str(e)}")
+                        self.queue.fail(document_id(doc), e)
+
+            # Geolocate and score the whole batch at once
+            self._timed_batch_stage('geolocation', self.attach_geolocation, [
+                (doc, result, stats) for doc, stages, result, stats in batch_results
+                if not stages or 'geolocation' in stages
+            ])
+            self._timed_batch_stage('sentiment', self.attach_sentiment, [
+                (doc, result, stats) for doc, stages, result, stats in batch_results
+                if not stages or 'sentiment' in stages
+            ])
+            # Document totals are final once the batched stages are charged
+            for doc_id, stats in profiled:
+                self.profiler.finish(doc_id, stats)
+            for doc, stages, result, stats in batch_results:
+                doc['nlp_processed'] = result
+                doc['processed_at'] = datetime.utcnow().isoformat()
+                doc['processing_stats'] = stats
+                print(f"✅ Processed {doc.get('url', 'unknown')}")
+            geo_stats = self.geoip.cache_info()
+            print(f"🌍 GeoIP cache: {geo_stats['hits']} hits, {geo_stats['misses']} misses")
+
+            # Online topic modeling over this batch, before it is checkpointed
+            self.attach_topics([doc for doc, stages, _, _ in batch_results if not stages or 'topics' in stages])
             
-            # Save after each batch
-            self._save_json_data()
+            # Checkpoint: journal the results (topics included), then mark the documents done
+            batch_docs = [doc for doc, _, _, _ in batch_results]
+            for doc in batch_docs:
+                self.ioc_graph.update(document_id(doc), doc['nlp_processed'].get('iocs', {}), doc['processed_at'])
+            self._save_json_data(batch_docs + skipped)
+            self.queue.complete(batch_docs + skipped)
+            if time.monotonic() - graph_saved_at >= self.graph_save_seconds:
+                self.ioc_graph.save()
+                graph_saved_at = time.monotonic()
             time.sleep(1)  # Small delay between batches
         
-        # Batch process for topic modeling
-        texts = [doc.get('clean_text', '') or self.h.handle(doc.get('raw_html', '')) for doc in unprocessed]
-        topics = self.topic_modeling(texts)
-        
-        # Update documents with topics
-        for doc in unprocessed:
-            if doc.get('nlp_processed'):
-                main_topics = []
-                for topic_id, topic_words in topics.items():
-                    if topic_words:  # Check if topic has words
-                        main_topics.append(topic_words[0][0])  # Get the first (most important) word
-                doc['nlp_processed']['topics'] = main_topics
-        
-        # Final save
-        self._save_json_data()
-        print("✅ All documents processed successfully")
-
-    def force_reprocess(self):
-        """Force reprocessing of all documents by clearing nlp_processed field"""
-        print("🔄 Forcing reprocessing of all documents...")
-        for doc in self.collection:
-            doc['nlp_processed'] = False
-        self._save_json_data()
-        print(f"✅ Reset {len(self.collection)} documents for reprocessing")
+        self.ioc_graph.save()
+        graph_stats = self.ioc_graph.stats()
+        print(f"🕸️ IOC graph: {graph_stats['iocs']} indicators, {graph_stats['documents']} documents, {graph_stats['edges']} edges")
+        counts = self.queue.counts()
+        print(f"✅ Processing finished: {counts['done']} done, {counts['failed']} failed")
+        if self.ner_cache is not None:
+            cache_stats = self.ner_cache.stats()
+            print(f"🧠 NER paragraph cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                  f"(hit rate {cache_stats['hit_rate']}), {cache_stats['entries']} entries")
+            self.ner_cache.save()
+            self.ner_cache.reset_stats()
+        print(f"🚦 Triage routes: {route_counts[FULL]} full, {route_counts[REGEX_ONLY]} regex-only, {route_counts[SKIP]} skipped")
+        self.report_profile()
+
+    def report_profile(self):
+        """Print per-stage p50/p95/max and dump the slowest documents' stacks"""
+        summary = self.profiler.summary()
+        print(f"⏱️ Stage timings over {summary['documents']} documents (ms):")
+        for name, dist in sorted(summary['stages_ms'].items()):
+            print(f"   {name:<12} p50={dist['p50']:.1f} p95={dist['p95']:.1f} max={dist['max']:.1f}")
+        if self.profiler.sampling:
+            output_dir = os.path.join(self.data_dir, "profiles", datetime.utcnow().strftime("%Y%m%dT%H%M%S"))
+            dumped = self.profiler.dump(output_dir)
+            print(f"🔥 Wrote folded stacks for the {dumped} slowest documents to {output_dir}")
+
+    def force_reprocess(self, stages=None, since=None):
+        """Queue documents for reprocessing and run the processor
+
+        stages restricts the rerun to a subset of STAGES and since (epoch
+        seconds) to documents scraped at or after that time; by default
+        every document is rerun through every stage.
+        """
+        docs = self.collection
+        if since is not None:
+            docs = [doc for doc in docs if scraped_at(doc) >= since]
+        print(f"🔄 Queueing {len(docs)} documents for reprocessing ({', '.join(stages or STAGES)})...")
+        self.queue.enqueue([document_id(doc) for doc in docs], stages)
         self.process_all_content()
 
+
+def scraped_at(doc):
+    """Scrape time of a document as epoch seconds (0 when unknown)"""
+    value = doc.get('timestamp')
+    if isinstance(value, dict):
+        value = value.get('$numberDouble') or value.get('$date') or 0
+        if isinstance(value, dict):
+            value = value.get('$numberLong', 0)
+            return int(value) / 1000
+        if isinstance(value, str) and 'T' in value:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_since(value):
+    """Accept epoch seconds or an ISO date/datetime for --since"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run NLP processing over the scraped threat intel content")
+    parser.add_argument("--force", action="store_true", help="reprocess already processed documents")
+    parser.add_argument("--stages", help=f"comma-separated subset of: {', '.join(STAGES)}")
+    parser.add_argument("--since", type=parse_since, help="only reprocess documents scraped since this time (ISO date or epoch)")
+    parser.add_argument("--status", action="store_true", help="print work queue counts and exit")
+    parser.add_argument("--no-triage", action="store_true", help="send every document through the full pipeline")
+    parser.add_argument("--profile-slowest", type=int, metavar="N",
+                        help="sample stacks and dump flamegraph input for the N slowest documents")
+    args = parser.parse_args()
+
+    if args.profile_slowest:
+        os.environ["PROFILE_SAMPLING"] = "1"
+        os.environ["PROFILE_SLOWEST"] = str(args.profile_slowest)
+    if args.no_triage:
+        os.environ["TRIAGE_ENABLED"] = "0"
     processor = DarkWebNLP()
-    # Force reprocess all documents
-    processor.force_reprocess()
+    if args.status:
+        processor.queue.sync(processor.collection)
+        print(json.dumps(processor.queue.counts(), indent=2))
+    elif args.force or args.stages or args.since is not None:
+        stages = [stage.strip() for stage in args.stages.split(',')] if args.stages else None
+        unknown = set(stages or []) - set(STAGES)
+        if unknown:
+            parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+        processor.force_reprocess(stages=stages, since=args.since)
+    else:
+        processor.process_all_content()
@@ -0,0 +1,72 @@
+from bisect import bisect_left, insort
+
+from documents import is_processed, is_skipped
+
+
+def threat_summary(doc):
+    """The slim projection of a processed document shown in threat feeds"""
+    processed = doc.get('nlp_processed', {})
+    return {
+        'url': doc.get('url', ''),
+        'timestamp': doc.get('processed_at', ''),
+        'iocs': processed.get('iocs', {}),
+        'sentiment': processed.get('sentiment', {}),
+        'topics': processed.get('topics', [])
+    }
+
+
+class RecencyIndex:
+    """Processed documents kept sorted by processed_at.
+
+    latest(n) walks the newest n entries, so /monitor and the WebSocket
+    feed cost O(n) instead of a sort of the whole collection. The number
+    of processed documents is the length of the index, a running total
+    maintained by apply(), as is the number of documents triage skipped.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.skipped = 0
+
+    @property
+    def processed(self):
+        return len(self.entries)
+
+    def pending(self, total):
+        """Documents out of total that are neither processed nor skipped"""
+        return total - self.processed - self.skipped
+
+    @staticmethod
+    def _entry(doc_id, doc):
+        return (str(doc.get('processed_at', '') or ''), doc_id)
+
+    def rebuild(self, documents_by_id):
+        self.entries = sorted(
+            self._entry(doc_id, doc) for doc_id, doc in documents_by_id.items() if is_processed(doc)
+        )
+        self.skipped = sum(1 for doc in documents_by_id.values() if is_skipped(doc))
+
+    def apply(self, doc_id, old_doc, new_doc):
+        if old_doc is not None and is_processed(old_doc):
+            entry = self._entry(doc_id, old_doc)
+            i = bisect_left(self.entries, entry)
+            if i < len(self.entries) and self.entries[i] == entry:
+                del self.entries[i]
+        if new_doc is not None and is_processed(new_doc):
+            insort(self.entries, self._entry(doc_id, new_doc))
+        self.skipped += (new_doc is not None and is_skipped(new_doc)) - (old_doc is not None and is_skipped(old_doc))
+
+    def fork(self):
+        clone = RecencyIndex()
+        clone.entries = list(self.entries)
+        clone.skipped = self.skipped
+        return clone
+
+    def latest(self, n, documents_by_id):
+        """Threat summaries of the n most recently processed documents"""
+        threats = []
+        for _, doc_id in reversed(self.entries[-n:] if n > 0 else []):
+            doc = documents_by_id.get(doc_id)
+            if doc is not None:
+                threats.append(threat_summary(doc))
+        return threats
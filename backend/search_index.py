@@ -0,0 +1,270 @@
+import re
+import threading
+
+import numpy as np
+
+from documents import is_processed
+
+FIELD_SEPARATOR = '\x00'
+
+
+def search_text(doc):
+    """Every field /search matches against, joined so trigrams never span two fields"""
+    processed = doc.get('nlp_processed') or {}
+    parts = [
+        str(doc.get('clean_text', '') or ''),
+        str(doc.get('title', '') or ''),
+        str(doc.get('url', '') or ''),
+    ]
+    for ioc_list in (processed.get('iocs') or {}).values():
+        if isinstance(ioc_list, list):
+            parts.extend(str(ioc) for ioc in ioc_list if ioc)
+    parts.extend(str(topic) for topic in processed.get('topics', []) if topic)
+    return FIELD_SEPARATOR.join(parts)
+
+
+def match_document(doc, query):
+    """Substring-match one processed document against a lowercased query
+
+    Returns the 'matches' dict used by /search, or None when nothing
+    matched. This is the reference semantics the index must preserve.
+    """
+    processed = doc.get('nlp_processed', {})
+    content = str(doc.get('clean_text', '') or '').lower()
+    title = str(doc.get('title', '') or '').lower()
+    url = str(doc.get('url', '') or '').lower()
+
+    ioc_matches = []
+    for ioc_type, ioc_list in processed.get('iocs', {}).items():
+        if isinstance(ioc_list, list):
+            for ioc in ioc_list:
+                if ioc and query in str(ioc).lower():
+                    ioc_matches.append(f"{ioc_type}: {ioc}")
+    topic_matches = [topic for topic in processed.get('topics', []) if topic and query in str(topic).lower()]
+
+    matches = {
+        'content': query in content,
+        'title': query in title,
+        'url': query in url,
+        'iocs': ioc_matches,
+        'topics': topic_matches
+    }
+    if not (matches['content'] or matches['title'] or matches['url'] or ioc_matches or topic_matches):
+        return None
+    return matches
+
+
+def snippet(text, query, width=240):
+    """Window of text around the first match of query, with highlight offsets
+
+    Returns (snippet, [[start, end], ...]) where the offsets index into the
+    snippet. Without a match in the text the snippet is its beginning.
+    """
+    text = str(text or '')
+    pattern = re.compile(re.escape(query), re.IGNORECASE) if query else None
+    first = pattern.search(text) if pattern else None
+    start = max(0, first.start() - width // 3) if first else 0
+    if start:
+        # Begin on a word boundary rather than mid-word
+        space = text.find(' ', start, start + 20)
+        start = space + 1 if space != -1 else start
+    end = min(len(text), start + width)
+    prefix = '…' if start else ''
+    suffix = '…' if end < len(text) else ''
+    window = text[start:end]
+    highlights = []
+    if pattern:
+        for match in pattern.finditer(window):
+            highlights.append([match.start() + len(prefix), match.end() + len(prefix)])
+    return f"{prefix}{window}{suffix}", highlights
+
+
+def trigram_codes(text):
+    """Sorted unique trigram codes of text (three 21-bit code points packed in a uint64)"""
+    if len(text) < 3:
+        return np.empty(0, dtype=np.uint64)
+    points = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    codes = (points[:-2] << np.uint64(42)) | (points[1:-1] << np.uint64(21)) | points[2:]
+    return np.unique(codes)
+
+
+class TrigramIndex:
+    """Trigram index over lowercased document text for substring search.
+
+    candidates(query) returns the ids of documents that contain every
+    trigram of the query, a superset of the true substring matches that
+    the caller then verifies, so results are identical to a full scan.
+
+    Postings live in an immutable CSR "base" segment built with NumPy plus
+    a small "delta" segment for documents added since; the delta is merged
+    into a new base once it grows past merge_threshold documents. Removed
+    or replaced documents are tombstoned and dropped at the next merge.
+    Because the base arrays are never modified in place, fork() gives a
+    cheap copy-on-write clone.
+    """
+
+    def __init__(self, merge_threshold=5000):
+        self.merge_threshold = merge_threshold
+        self._base_codes = np.empty(0, dtype=np.uint64)
+        self._base_indptr = np.zeros(1, dtype=np.int64)
+        self._base_slots = np.empty(0, dtype=np.uint32)
+        self._delta = {}
+        self._delta_docs = 0
+        self._slot_keys = []
+        self._key_slots = {}
+        self._dead = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._key_slots)
+
+    @staticmethod
+    def _postings_from_pairs(codes, slots):
+        order = np.argsort(codes, kind='stable')
+        codes, slots = codes[order], slots[order]
+        del order
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.uint64), np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.uint32)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1))
+        indptr = np.append(starts, len(codes)).astype(np.int64)
+        return codes[starts], indptr, slots.astype(np.uint32)
+
+    def build(self, items):
+        """Bulk-index (key, text) pairs, replacing the current contents"""
+        code_arrays, slot_arrays = [], []
+        self._slot_keys, self._key_slots = [], {}
+        for key, text in items:
+            slot = len(self._slot_keys)
+            self._slot_keys.append(key)
+            self._key_slots[key] = slot
+            codes = trigram_codes(text.lower())
+            code_arrays.append(codes)
+            slot_arrays.append(np.full(len(codes), slot, dtype=np.uint32))
+        codes = np.concatenate(code_arrays) if code_arrays else np.empty(0, dtype=np.uint64)
+        slots = np.concatenate(slot_arrays) if slot_arrays else np.empty(0, dtype=np.uint32)
+        del code_arrays, slot_arrays
+        self._base_codes, self._base_indptr, self._base_slots = self._postings_from_pairs(codes, slots)
+        self._delta, self._delta_docs, self._dead = {}, 0, set()
+
+    @classmethod
+    def from_arrays(cls, codes, indptr, slots, slot_keys):
+        """Read-only index over prebuilt CSR arrays, e.g. views of a mapped file
+
+        slot_keys is any sequence mapping a slot to its document key.
+        """
+        index = cls()
+        index._base_codes, index._base_indptr, index._base_slots = codes, indptr, slots
+        index._slot_keys = slot_keys
+        return index
+
+    def arrays(self):
+        """(codes, indptr, slots) of the base segment, after folding in the delta"""
+        with self._lock:
+            if self._delta or self._dead:
+                self._merge()
+            return self._base_codes, self._base_indptr, self._base_slots
+
+    def rebuild(self, documents_by_id):
+        """Index every processed document of a collection snapshot"""
+        self.build((doc_id, search_text(doc)) for doc_id, doc in documents_by_id.items() if is_processed(doc))
+
+    def apply(self, doc_id, old_doc, new_doc):
+        """Follow one document change; new_doc is None when it was removed"""
+        if new_doc is not None and is_processed(new_doc):
+            self.add(doc_id, search_text(new_doc))
+        else:
+            self.remove(doc_id)
+
+    def add(self, key, text):
+        """Index (or re-index) one document in the delta segment"""
+        with self._lock:
+            self._remove(key)
+            slot = len(self._slot_keys)
+            self._slot_keys.append(key)
+            self._key_slots[key] = slot
+            for code in trigram_codes(text.lower()).tolist():
+                self._delta.setdefault(code, []).append(slot)
+            self._delta_docs += 1
+            if self._delta_docs >= self.merge_threshold:
+                self._merge()
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        slot = self._key_slots.pop(key, None)
+        if slot is not None:
+            self._dead.add(slot)
+
+    def _merge(self):
+        """Fold the delta into a new base segment, dropping tombstoned slots and compacting the rest"""
+        base_codes = np.repeat(self._base_codes, np.diff(self._base_indptr))
+        delta_codes = np.fromiter(
+            (code for code, slots in self._delta.items() for _ in slots), dtype=np.uint64
+        )
+        delta_slots = np.fromiter(
+            (slot for slots in self._delta.values() for slot in slots), dtype=np.uint32
+        )
+        codes = np.concatenate((base_codes, delta_codes))
+        slots = np.concatenate((self._base_slots, delta_slots))
+        if self._dead:
+            keep = ~np.isin(slots, np.fromiter(self._dead, dtype=np.uint32))
+            codes, slots = codes[keep], slots[keep]
+            # Renumber the live slots so re-indexed documents don't grow _slot_keys forever
+            live = np.ones(len(self._slot_keys), dtype=bool)
+            live[np.fromiter(self._dead, dtype=np.int64)] = False
+            slots = (np.cumsum(live) - 1)[slots]
+            self._slot_keys = [key for key, alive in zip(self._slot_keys, live.tolist()) if alive]
+            self._key_slots = {key: slot for slot, key in enumerate(self._slot_keys)}
+        self._base_codes, self._base_indptr, self._base_slots = self._postings_from_pairs(codes, slots)
+        self._delta, self._delta_docs, self._dead = {}, 0, set()
+
+    def _postings(self, code):
+        i = np.searchsorted(self._base_codes, code)
+        if i < len(self._base_codes) and self._base_codes[i] == code:
+            base = self._base_slots[self._base_indptr[i]:self._base_indptr[i + 1]]
+        else:
+            base = self._base_slots[:0]
+        delta = self._delta.get(int(code))
+        if delta:
+            return np.concatenate((base, np.asarray(delta, dtype=np.uint32)))
+        return base
+
+    def candidates(self, query):
+        """Keys of documents that may contain query, or None if it is too short to filter"""
+        codes = trigram_codes(query.lower())
+        if len(codes) == 0:
+            return None
+        with self._lock:
+            postings = sorted((self._postings(code) for code in codes), key=len)
+            result = postings[0]
+            for posting in postings[1:]:
+                if len(result) == 0:
+                    break
+                result = np.intersect1d(result, posting, assume_unique=True)
+            return [
+                self._slot_keys[slot] for slot in result.tolist()
+                if slot not in self._dead
+            ]
+
+    def fork(self):
+        """Copy-on-write clone: base arrays are shared, mutable parts are copied"""
+        with self._lock:
+            clone = TrigramIndex.__new__(TrigramIndex)
+            clone.merge_threshold = self.merge_threshold
+            clone._base_codes = self._base_codes
+            clone._base_indptr = self._base_indptr
+            clone._base_slots = self._base_slots
+            clone._delta = {code: list(slots) for code, slots in self._delta.items()}
+            clone._delta_docs = self._delta_docs
+            clone._slot_keys = list(self._slot_keys)
+            clone._key_slots = dict(self._key_slots)
+            clone._dead = set(self._dead)
+            clone._lock = threading.Lock()
+            return clone
+
+    def memory_usage(self):
+        """Approximate bytes held by the posting arrays"""
+        return int(self._base_codes.nbytes + self._base_indptr.nbytes + self._base_slots.nbytes
+                   + sum(len(slots) for slots in self._delta.values()) * 8)
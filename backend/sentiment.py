@@ -0,0 +1,116 @@
+import re
+
+import numpy as np
+
+THREAT_TERMS = ['exploit', 'leak', 'attack', 'malware', 'breach', 'vulnerability', 'hack', 'compromise']
+
+# Letters joined by apostrophes/hyphens. A run of letters never spans two
+# tokens, so summing term occurrences per token gives exactly
+# text.lower().count(term).
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:['\-][a-z]+)*")
+
+
+def sentiment_label(polarity, threat_score):
+    if polarity > 0.2 and threat_score < 2:
+        return 'positive'
+    elif polarity < -0.2 or threat_score > 3:
+        return 'negative'
+    return 'neutral'
+
+
+def textblob_sentiment(text):
+    """Per-document TextBlob scoring, kept as the reference implementation"""
+    from textblob import TextBlob
+    analysis = TextBlob(text)
+    threat_score = sum(text.lower().count(term) for term in THREAT_TERMS)
+    return {
+        'polarity': analysis.sentiment.polarity,
+        'subjectivity': analysis.sentiment.subjectivity,
+        'threat_score': threat_score,
+        'label': sentiment_label(analysis.sentiment.polarity, threat_score)
+    }
+
+
+class BatchSentimentScorer:
+    """Vectorized polarity/subjectivity and threat-term scoring for a batch.
+
+    Each batch is tokenized once into a sparse document-term matrix; the
+    threat score and the lexicon scores are then matrix-vector products.
+    Polarity and subjectivity are the mean lexicon values of the known
+    words in a text, which is TextBlob's PatternAnalyzer without its
+    intensifier/negation rules, using the same en-sentiment lexicon.
+    """
+
+    def __init__(self, threat_terms=THREAT_TERMS):
+        self.threat_terms = threat_terms
+        self._lexicon = None
+
+    @property
+    def lexicon(self):
+        """{word: (polarity, subjectivity)} taken from TextBlob's lexicon"""
+        if self._lexicon is None:
+            from textblob.en import sentiment as pattern_sentiment
+            pattern_sentiment.load()
+            lexicon = {}
+            for word, senses in dict.items(pattern_sentiment):
+                scores = senses.get(None)
+                if scores and TOKEN_PATTERN.fullmatch(word):
+                    lexicon[word] = (float(scores[0]), float(scores[1]))
+            self._lexicon = lexicon
+        return self._lexicon
+
+    def term_matrix(self, texts):
+        """Tokenize texts once into (documents x vocabulary matrix, vocabulary)"""
+        from scipy.sparse import csr_matrix
+
+        vocabulary = {}
+        indices = []
+        indptr = [0]
+        for text in texts:
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            indices.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+            indptr.append(len(indices))
+        matrix = csr_matrix(
+            (np.ones(len(indices), dtype=np.float64), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(texts), len(vocabulary))
+        )
+        matrix.sum_duplicates()
+        return matrix, list(vocabulary)
+
+    def score(self, texts):
+        """Score a batch of texts, returning one analyze_sentiment-style dict per text"""
+        if not texts:
+            return []
+        matrix, vocabulary = self.term_matrix(texts)
+        lexicon = self.lexicon
+
+        threat_weights = np.fromiter(
+            (sum(token.count(term) for term in self.threat_terms) for token in vocabulary),
+            dtype=np.float64, count=len(vocabulary)
+        )
+        known = np.zeros(len(vocabulary))
+        polarity_weights = np.zeros(len(vocabulary))
+        subjectivity_weights = np.zeros(len(vocabulary))
+        for col, token in enumerate(vocabulary):
+            scores = lexicon.get(token)
+            if scores:
+                known[col] = 1.0
+                polarity_weights[col], subjectivity_weights[col] = scores
+
+        threat_scores = matrix @ threat_weights
+        known_counts = matrix @ known
+        denominators = np.where(known_counts > 0, known_counts, 1.0)
+        polarities = (matrix @ polarity_weights) / denominators
+        subjectivities = (matrix @ subjectivity_weights) / denominators
+
+        results = []
+        for polarity, subjectivity, threat_score in zip(polarities, subjectivities, threat_scores):
+            polarity = float(polarity)
+            threat_score = int(threat_score)
+            results.append({
+                'polarity': polarity,
+                'subjectivity': float(subjectivity),
+                'threat_score': threat_score,
+                'label': sentiment_label(polarity, threat_score)
+            })
+        return results
@@ -0,0 +1,628 @@
+"""Read-only collection snapshots shared by multiple server processes.
+
+One loader process follows the export and the processor journal with a
+CollectionStore and writes the whole snapshot to a single file, at most
+every --write-interval seconds (SNAPSHOT_WRITE_SECONDS, default 30):
+
+    python snapshot_file.py --source data/threat_intel_content.json \\
+        --output data/threat_intel_content.snapshot
+
+Every API worker then memory-maps that file (SNAPSHOT_FILE=... in app.py)
+instead of parsing the JSON itself. Documents, the trigram index, the
+IOC, topic and recency posting lists and the /visualize payloads are all
+flat sections read straight from the mapping, so every worker shares the
+same page-cache pages and adding a worker adds almost no memory. A
+rewrite goes to a temporary file that is renamed over the old one;
+workers notice the new inode and remap it.
+"""
+import argparse
+import json
+import mmap
+import os
+import signal
+import struct
+import sys
+import threading
+import time
+from collections.abc import Sequence
+
+import numpy as np
+
+from aggregates import VIZ_TYPES, VisualizationAggregates
+from analytics import AnalyticsColumns
+from collection_store import CollectionStore, Snapshot
+from documents import document_id, is_processed, load_documents
+from ioc_index import IOCIndex
+from recency import RecencyIndex
+from search_index import TrigramIndex, search_text
+from topic_index import TopicIndex
+
+MAGIC = b'DWSNAP01'
+ALIGN = 64
+# Indexes the loader maintains and writes into the file; the trigram
+# index is rebuilt by the writer with file positions as slots
+SHARED_INDEXES = {
+    'iocs': IOCIndex,
+    'aggregates': VisualizationAggregates,
+    'recency': RecencyIndex,
+    'topics': TopicIndex,
+    'analytics': AnalyticsColumns,
+}
+
+
+def _packed(values):
+    """(offsets, blob) for a list of byte strings"""
+    offsets = np.zeros(len(values) + 1, dtype=np.uint64)
+    np.cumsum(np.fromiter(map(len, values), dtype=np.uint64, count=len(values)), out=offsets[1:])
+    return offsets, b''.join(values)
+
+
+def _posting_sections(name, table, positions, ordered=False, int_keys=False):
+    """Sections for {key: doc ids}: sorted keys plus CSR lists of file positions
+
+    Doc ids are sorted by position unless ordered, when their order is kept.
+    """
+    keys = sorted(table)
+    lists = []
+    for key in keys:
+        found = [positions[doc_id] for doc_id in table[key] if doc_id in positions]
+        lists.append(found if ordered else sorted(found))
+    indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, lists), dtype=np.int64, count=len(lists)), out=indptr[1:])
+    sections = {
+        f'{name}.indptr': indptr,
+        f'{name}.positions': np.fromiter((p for found in lists for p in found), dtype=np.uint32, count=int(indptr[-1])),
+    }
+    if int_keys:
+        sections[f'{name}.keys'] = np.array(keys, dtype=np.uint32)
+    else:
+        sections[f'{name}.key_offsets'], sections[f'{name}.keys'] = _packed([key.encode('utf-8') for key in keys])
+    return sections
+
+
+def write_snapshot_file(path, snapshot):
+    """Write a CollectionStore snapshot to path atomically
+
+    Layout: MAGIC, 64-byte aligned sections, a JSON header describing
+    them, and the header's offset as the final 8 bytes.
+    """
+    start = time.time()
+    doc_ids = [document_id(doc) for doc in snapshot.collection]
+    # A duplicated id resolves to its last copy, as in documents_by_id; the
+    # earlier copies are left out so every id has exactly one position
+    last = {doc_id: position for position, doc_id in enumerate(doc_ids)}
+    keep = [position for position, doc_id in enumerate(doc_ids) if last[doc_id] == position]
+    collection = [snapshot.collection[position] for position in keep]
+    doc_ids = [doc_ids[position] for position in keep]
+    ids = [doc_id.encode('utf-8') for doc_id in doc_ids]
+    positions = {doc_id: position for position, doc_id in enumerate(doc_ids)}
+    doc_offsets, docs = _packed([
+        json.dumps(doc, default=str, separators=(',', ':')).encode('utf-8') for doc in collection
+    ])
+    sections = {'doc_offsets': doc_offsets, 'docs': docs}
+    sections['id_offsets'], sections['ids'] = _packed(ids)
+    sections['id_order'] = np.array(sorted(range(len(ids)), key=ids.__getitem__), dtype=np.uint32)
+    sections['processed_offsets'], sections['processed_at'] = _packed([
+        str(doc.get('processed_at', '') or '').encode('utf-8') for doc in collection
+    ])
+
+    # Slot i of the search index is position i; unprocessed documents get no trigrams
+    search = TrigramIndex()
+    search.build((position, search_text(doc) if is_processed(doc) else '')
+                 for position, doc in enumerate(collection))
+    sections['trigram_codes'], sections['trigram_indptr'], sections['trigram_slots'] = search.arrays()
+
+    iocs = snapshot.indexes['iocs']
+    sections.update(_posting_sections('iocs.ips', iocs.ips.docs, positions, int_keys=True))
+    sections.update(_posting_sections('iocs.reversed_domains', iocs.reversed_domains.docs, positions))
+    for ioc_type, index in iocs.sorted.items():
+        sections.update(_posting_sections(f'iocs.{ioc_type}', index.docs, positions))
+    for ioc_type, bucket in iocs.exact.items():
+        sections.update(_posting_sections(f'iocs.{ioc_type}', bucket, positions))
+
+    topics = snapshot.indexes['topics']
+    for kind, table in (('by_word', topics.by_word), ('by_id', topics.by_id)):
+        entries = {key: [doc_id for _, doc_id in postings] for key, postings in table.items()}
+        sections.update(_posting_sections(f'topics.{kind}', entries, positions, ordered=True))
+    sections['recency'] = np.array(
+        [positions[doc_id] for _, doc_id in snapshot.indexes['recency'].entries], dtype=np.uint32
+    )
+
+    analytics = snapshot.indexes['analytics']
+    for name in analytics.columns:
+        sections[f'analytics.{name}'] = analytics.column(name)
+    sections['analytics.url_offsets'], sections['analytics.urls'] = _packed(
+        [url.encode('utf-8') for url in analytics.urls[:analytics.size]]
+    )
+    sections['analytics.country_offsets'], sections['analytics.countries'] = _packed(
+        [country.encode('utf-8') for country in analytics.countries]
+    )
+
+    aggregates = snapshot.indexes['aggregates']
+    for viz_type in VIZ_TYPES:
+        sections[f'aggregates.{viz_type}'] = json.dumps(aggregates.payload(viz_type), default=str).encode('utf-8')
+
+    table = {}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        for name, data in sections.items():
+            f.write(b'\0' * (-f.tell() % ALIGN))
+            if isinstance(data, np.ndarray):
+                data = np.ascontiguousarray(data)
+                table[name] = [f.tell(), data.nbytes, data.dtype.str, list(data.shape)]
+            else:
+                table[name] = [f.tell(), len(data), None, None]
+            f.write(data)
+        header_offset = f.tell()
+        f.write(json.dumps({
+            'version': snapshot.version,
+            'epoch': snapshot.epoch,
+            'created_at': time.time(),
+            'documents': len(collection),
+            'skipped': snapshot.indexes['recency'].skipped,
+            'sections': table,
+        }).encode('utf-8'))
+        f.write(struct.pack('<Q', header_offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    print(f"💾 Wrote snapshot v{snapshot.version} ({len(collection)} documents, "
+          f"{os.path.getsize(path) / (1024 * 1024):.1f} MB) in {time.time() - start:.2f}s")
+
+
+class SnapshotWriter:
+    """Rate-limited rewrites of the snapshot file for the loader
+
+    Every rewrite costs O(corpus), so published snapshots are not written
+    one by one: submit() only records the latest, and a background thread
+    writes it at most every min_interval seconds. The gap after a write
+    is also at least enough to keep writing to write_share of the time,
+    so a large corpus is rewritten less often rather than continuously.
+    """
+
+    def __init__(self, path, min_interval=30.0, write_share=0.25):
+        self.path = path
+        self.min_interval = min_interval
+        self.write_share = write_share
+        self._pending = None
+        self._next_write = 0.0
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def write(self, snapshot):
+        """Write snapshot now and schedule the earliest next write"""
+        start = time.monotonic()
+        write_snapshot_file(self.path, snapshot)
+        elapsed = time.monotonic() - start
+        self._next_write = time.monotonic() + max(self.min_interval, elapsed * (1 / self.write_share - 1))
+
+    def submit(self, snapshot):
+        with self._cond:
+            self._pending = snapshot
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._stopping)
+                if self._stopping:
+                    return
+                wait = self._next_write - time.monotonic()
+                if wait > 0:
+                    self._cond.wait_for(lambda: self._stopping, timeout=wait)
+                    continue
+                snapshot, self._pending = self._pending, None
+            try:
+                self.write(snapshot)
+            except Exception as e:
+                print(f"⚠️ Snapshot write failed: {str(e)}")
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the writer thread and write the last submitted snapshot, if any"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+        if self._pending is not None:
+            self.write(self._pending)
+            self._pending = None
+
+
+class SnapshotFile:
+    """A mapped snapshot file; sections are zero-copy views of the mapping"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        header_offset, = struct.unpack('<Q', self.map[-8:])
+        self.header = json.loads(self.map[header_offset:-8])
+
+    def array(self, name):
+        offset, length, dtype, shape = self.header['sections'][name]
+        dtype = np.dtype(dtype)
+        return np.frombuffer(self.map, dtype=dtype, count=length // dtype.itemsize, offset=offset).reshape(shape)
+
+    def view(self, name):
+        offset, length, _, _ = self.header['sections'][name]
+        return memoryview(self.map)[offset:offset + length]
+
+    def strings(self, name, offsets_name):
+        return _PackedStrings(self.array(offsets_name), self.view(name))
+
+
+def _lower_bound(count, key, key_at):
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if key_at(mid) < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class _LazySequence(Sequence):
+    """Sequence whose items are built by _item(i) on access"""
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._item(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._item(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._item(i)
+
+
+class _PackedStrings(_LazySequence):
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, i):
+        return bytes(self.blob[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+    def _item(self, i):
+        return str(self.raw(i), 'utf-8')
+
+
+class MappedCollection(_LazySequence):
+    """The snapshot's documents in export order, decoded on access"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _item(self, i):
+        return json.loads(self.docs.raw(i))
+
+
+class MappedPositions:
+    """doc_id -> position, by binary search over the sorted id permutation"""
+
+    def __init__(self, ids, id_order):
+        self.ids = ids
+        self.id_order = id_order
+
+    def get(self, doc_id, default=None):
+        if not isinstance(doc_id, str):
+            return default
+        key = doc_id.encode('utf-8')
+        i = _lower_bound(len(self.id_order), key, lambda k: self.ids.raw(int(self.id_order[k])))
+        if i < len(self.id_order) and self.ids.raw(int(self.id_order[i])) == key:
+            return int(self.id_order[i])
+        return default
+
+    def __getitem__(self, doc_id):
+        position = self.get(doc_id)
+        if position is None:
+            raise KeyError(doc_id)
+        return position
+
+    def __contains__(self, doc_id):
+        return self.get(doc_id) is not None
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class MappedDocuments:
+    """doc_id -> document view over a MappedCollection"""
+
+    def __init__(self, collection, positions):
+        self.collection = collection
+        self.positions = positions
+
+    def get(self, doc_id, default=None):
+        position = self.positions.get(doc_id)
+        return default if position is None else self.collection[position]
+
+    def __getitem__(self, doc_id):
+        return self.collection[self.positions[doc_id]]
+
+    def __contains__(self, doc_id):
+        return doc_id in self.positions
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __len__(self):
+        return len(self.collection)
+
+    def items(self):
+        return zip(self.positions.ids, self.collection)
+
+    def values(self):
+        return iter(self.collection)
+
+
+class _MappedEntries(_LazySequence):
+    """(processed_at, doc_id) entries of a list of positions, as in
+    RecencyIndex.entries and TopicIndex posting lists"""
+
+    def __init__(self, positions, processed_at, ids):
+        self.positions = positions
+        self.processed_at = processed_at
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _item(self, i):
+        position = int(self.positions[i])
+        return self.processed_at[position], self.ids[position]
+
+
+class _MappedPostings:
+    """Sorted keys -> value(positions), the read side of _posting_sections
+
+    Provides what IOCIndex and TopicIndex read from their tables: get,
+    [], in, items, keys, and the range/prefix lookups of _SortedKeys.
+    """
+
+    def __init__(self, mapped, name, value):
+        self.indptr = mapped.array(f'{name}.indptr')
+        self.positions = mapped.array(f'{name}.positions')
+        if mapped.header['sections'][f'{name}.keys'][2] is None:
+            self.keys = mapped.strings(f'{name}.keys', f'{name}.key_offsets')
+            self._raw_key = self.keys.raw
+        else:
+            self.keys = mapped.array(f'{name}.keys')
+            self._raw_key = None
+        self.value = value
+
+    def _encode(self, key):
+        if self._raw_key is None:
+            return key if isinstance(key, int) and 0 <= key < 2 ** 32 else None
+        return key.encode('utf-8') if isinstance(key, str) else None
+
+    def _bisect(self, key):
+        if self._raw_key is None:
+            return int(np.searchsorted(self.keys, key))
+        return _lower_bound(len(self.keys), key, self._raw_key)
+
+    def _find(self, key):
+        key = self._encode(key)
+        if key is None:
+            return None
+        i = self._bisect(key)
+        if i < len(self.keys) and (self._raw_key(i) if self._raw_key else int(self.keys[i])) == key:
+            return i
+        return None
+
+    def _value(self, i):
+        return self.value(self.positions[self.indptr[i]:self.indptr[i + 1]])
+
+    def get(self, key, default=None):
+        i = self._find(key)
+        return default if i is None else self._value(i)
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i is None:
+            raise KeyError(key)
+        return self._value(i)
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def items(self):
+        return ((key, self._value(i)) for i, key in enumerate(self.keys))
+
+    def range(self, low, high):
+        """Integer keys k with low <= k <= high"""
+        start = int(np.searchsorted(self.keys, low, side='left'))
+        end = int(np.searchsorted(self.keys, high, side='right'))
+        return self.keys[start:end].tolist()
+
+    def prefix(self, prefix):
+        prefix = prefix.encode('utf-8')
+        # No UTF-8 sequence contains 0xff, so this bounds every key with the prefix
+        return self.keys[self._bisect(prefix):self._bisect(prefix + b'\xff')]
+
+    @property
+    def docs(self):
+        return self
+
+
+class _MappedAggregates:
+    """VisualizationAggregates.payload() over the payloads the loader wrote
+
+    Payloads are decoded per call rather than kept, so they never become
+    per-worker private memory.
+    """
+
+    def __init__(self, mapped):
+        self.mapped = mapped
+
+    def payload(self, viz_type):
+        if viz_type not in VIZ_TYPES:
+            return None
+        return json.loads(bytes(self.mapped.view(f'aggregates.{viz_type}')))
+
+
+def load_snapshot_file(path):
+    """A collection_store.Snapshot backed by the mapped file at path"""
+    mapped = SnapshotFile(path)
+    ids = mapped.strings('ids', 'id_offsets')
+    processed_at = mapped.strings('processed_at', 'processed_offsets')
+    collection = MappedCollection(mapped.strings('docs', 'doc_offsets'))
+    positions = MappedPositions(ids, mapped.array('id_order'))
+
+    def doc_ids(found):
+        return [ids[position] for position in found.tolist()]
+
+    def entries(found):
+        return _MappedEntries(found, processed_at, ids)
+
+    iocs = IOCIndex()
+    iocs.ips = _MappedPostings(mapped, 'iocs.ips', doc_ids)
+    iocs.reversed_domains = _MappedPostings(mapped, 'iocs.reversed_domains', doc_ids)
+    iocs.sorted = {t: _MappedPostings(mapped, f'iocs.{t}', doc_ids) for t in IOCIndex.SORTED_TYPES}
+    iocs.exact = {t: _MappedPostings(mapped, f'iocs.{t}', doc_ids) for t in IOCIndex.EXACT_TYPES}
+    topics = TopicIndex()
+    topics.by_word = _MappedPostings(mapped, 'topics.by_word', entries)
+    topics.by_id = _MappedPostings(mapped, 'topics.by_id', entries)
+    recency = RecencyIndex()
+    recency.entries = entries(mapped.array('recency'))
+    recency.skipped = mapped.header.get('skipped', 0)
+
+    analytics = AnalyticsColumns.from_arrays(
+        {name: mapped.array(f'analytics.{name}') for name in AnalyticsColumns._allocate(0)},
+        mapped.strings('analytics.urls', 'analytics.url_offsets'),
+        mapped.strings('analytics.countries', 'analytics.country_offsets'),
+    )
+
+    indexes = {
+        'search': TrigramIndex.from_arrays(
+            mapped.array('trigram_codes'), mapped.array('trigram_indptr'), mapped.array('trigram_slots'), ids
+        ),
+        'iocs': iocs,
+        'aggregates': _MappedAggregates(mapped),
+        'recency': recency,
+        'topics': topics,
+        'analytics': analytics,
+    }
+    return Snapshot(mapped.header['version'], collection, MappedDocuments(collection, positions),
+                    positions, indexes, mapped.header['epoch'])
+
+
+class MappedSnapshotStore:
+    """Worker-side stand-in for CollectionStore that serves a snapshot file
+
+    refresh() remaps the file when the loader has replaced it. Snapshots
+    still held by in-flight requests keep their old mapping alive until
+    they are released.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.snapshot = None
+        self._file_state = None
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._listeners = []
+        self.refresh()
+
+    def refresh(self):
+        """Remap the file if it changed; returns -1 after a remap, else 0"""
+        with self._refresh_lock:
+            stat = os.stat(self.path)
+            state = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            if state == self._file_state:
+                return 0
+            start = time.time()
+            self.snapshot = load_snapshot_file(self.path)
+            self._file_state = state
+            print(f"✅ Mapped snapshot v{self.snapshot.version} "
+                  f"({len(self.snapshot.collection)} documents) in {time.time() - start:.2f}s")
+            for listener in self._listeners:
+                try:
+                    listener(self.snapshot)
+                except Exception as e:
+                    print(f"⚠️ Snapshot listener failed: {str(e)}")
+            return -1
+
+    def add_listener(self, listener):
+        """Call listener(snapshot) after every newly mapped snapshot"""
+        self._listeners.append(listener)
+
+    def start(self, interval=5.0):
+        """Check for a new snapshot file in a background daemon thread"""
+        if self._thread or interval <= 0:
+            return
+
+        def run():
+            while not self._stopped.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️ Snapshot refresh failed: {str(e)}")
+
+        self._thread = threading.Thread(target=run, name="snapshot-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and maintain the shared serving snapshot")
+    parser.add_argument("--source", default=os.path.join(os.path.dirname(__file__), "data", "threat_intel_content.json"))
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(__file__), "data", "threat_intel_content.snapshot"))
+    parser.add_argument("--interval", type=float, default=float(os.getenv("COLLECTION_REFRESH_SECONDS", "5")),
+                        help="seconds between checks for new documents (0 builds once and exits)")
+    parser.add_argument("--write-interval", type=float, default=float(os.getenv("SNAPSHOT_WRITE_SECONDS", "30")),
+                        help="minimum seconds between rewrites of the snapshot file")
+    args = parser.parse_args()
+
+    store = CollectionStore(args.source, lambda: load_documents(args.source), SHARED_INDEXES)
+    writer = SnapshotWriter(args.output, min_interval=args.write_interval)
+    writer.write(store.snapshot)
+    if args.interval <= 0:
+        return
+    writer.start()
+    store.add_listener(writer.submit)
+    store.start(args.interval)
+    # gunicorn's on_exit stops the loader with SIGTERM; exit through the finally
+    # below so the writer still flushes a snapshot it is holding back
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.stop()
+        writer.stop()
+
+
+if __name__ == "__main__":
+    main()
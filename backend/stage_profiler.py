@@ -0,0 +1,196 @@
+import heapq
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class StackSampler(threading.Thread):
+    """Background sampler collecting folded stacks of registered threads
+
+    Every interval the current frame of each registered thread is walked
+    and counted as a "file:function;file:function" line, the collapsed
+    format read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def watch(self, thread_id):
+        stacks = Counter()
+        with self._lock:
+            self._targets[thread_id] = stacks
+        return stacks
+
+    def unwatch(self, thread_id):
+        with self._lock:
+            return self._targets.pop(thread_id, Counter())
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                targets = list(self._targets.items())
+            for thread_id, stacks in targets:
+                frame = frames.get(thread_id)
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if names:
+                    stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self._stopped.set()
+
+
+class StageProfiler:
+    """Per-stage timings and counters for DarkWebNLP.process_document.
+
+    Each document gets a stats dict ({'stages_ms': {...}, 'chars', ...})
+    that is filled by stage() blocks and stored next to processed_at;
+    aggregate p50/p95/max per stage are available from summary(). With
+    sampling enabled, a stack sampler runs alongside the workers and the
+    folded stacks of the slowest documents can be written with dump().
+
+    A document is only counted once finish() is called for it, after any
+    batched stages (add_batch_stage) have been charged to its total.
+    """
+
+    def __init__(self, sampling=False, slowest_n=10, sample_interval=0.005):
+        self.sampling = sampling
+        self.slowest_n = slowest_n
+        self._lock = threading.Lock()
+        self._stage_times = defaultdict(list)
+        self._totals = []
+        self._chars = []
+        self._indicators = []
+        self._slowest = []
+        self._unfinished = {}
+        self._sampler = None
+        if sampling:
+            self._sampler = StackSampler(sample_interval)
+            self._sampler.start()
+
+    @contextmanager
+    def document(self, doc_id, chars):
+        """Track one document; yields the stats dict to pass to stage()
+
+        Call finish(doc_id, stats) once its batched stages are done too;
+        a document whose processing raised is recorded right away.
+        """
+        stats = {'stages_ms': {}, 'chars': chars, 'indicators': 0}
+        thread_id = threading.get_ident()
+        if self._sampler:
+            self._sampler.watch(thread_id)
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield stats
+            failed = False
+        finally:
+            stats['total_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            stacks = self._sampler.unwatch(thread_id) if self._sampler else None
+            if failed:
+                self._record(doc_id, stats, stacks)
+            else:
+                with self._lock:
+                    self._unfinished[doc_id] = stacks
+
+    def finish(self, doc_id, stats):
+        """Record a document's final totals, batched stages included"""
+        with self._lock:
+            stacks = self._unfinished.pop(doc_id, None)
+        self._record(doc_id, stats, stacks)
+
+    @contextmanager
+    def stage(self, stats, name):
+        if stats is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            stats['stages_ms'][name] = round(stats['stages_ms'].get(name, 0) + elapsed, 3)
+
+    def add_batch_stage(self, stats_list, name, elapsed_seconds):
+        """Spread the time of a batched stage evenly over its documents"""
+        if not stats_list:
+            return
+        share = elapsed_seconds * 1000 / len(stats_list)
+        for stats in stats_list:
+            stats['stages_ms'][name] = round(share, 3)
+            stats['total_ms'] = round(stats.get('total_ms', 0) + share, 3)
+        with self._lock:
+            self._stage_times[name].extend([share] * len(stats_list))
+
+    def _record(self, doc_id, stats, stacks):
+        with self._lock:
+            for name, ms in stats['stages_ms'].items():
+                self._stage_times[name].append(ms)
+            self._totals.append(stats['total_ms'])
+            self._chars.append(stats['chars'])
+            self._indicators.append(stats['indicators'])
+            if stacks is not None:
+                entry = (stats['total_ms'], doc_id, stacks)
+                if len(self._slowest) < self.slowest_n:
+                    heapq.heappush(self._slowest, entry)
+                elif entry[0] > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, entry)
+
+    @staticmethod
+    def _distribution(values):
+        values = sorted(values)
+        return {
+            'count': len(values),
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'max': values[-1] if values else None,
+        }
+
+    def summary(self):
+        with self._lock:
+            return {
+                'documents': len(self._totals),
+                'total_ms': self._distribution(self._totals),
+                'stages_ms': {name: self._distribution(times) for name, times in self._stage_times.items()},
+                'chars': self._distribution(self._chars),
+                'indicators': self._distribution(self._indicators),
+            }
+
+    def dump(self, output_dir):
+        """Write summary.json and one folded-stack file per slowest document"""
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, "summary.json"), 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+        with self._lock:
+            slowest = sorted(self._slowest, reverse=True)
+        for rank, (total_ms, doc_id, stacks) in enumerate(slowest, 1):
+            path = os.path.join(output_dir, f"{rank:02d}_{doc_id}_{int(total_ms)}ms.folded")
+            with open(path, 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        return len(slowest)
+
+    def close(self):
+        if self._sampler:
+            self._sampler.stop()
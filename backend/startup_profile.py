@@ -0,0 +1,75 @@
+"""Import-time profile for the backend modules.
+
+Runs the import in a fresh interpreter with ``python -X importtime`` and
+prints the slowest modules, so startup regressions (a heavy dependency
+creeping back into module scope) are easy to spot:
+
+    python startup_profile.py                  # profile processor.py
+    python startup_profile.py app --top 30
+    python startup_profile.py --json > startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def profile_import(module):
+    """Return (wall_seconds, [(module, self_us, cumulative_us), ...])"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else f"import {module} failed")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            entries.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return wall, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import-time cost of a backend module")
+    parser.add_argument("module", nargs="?", default="processor")
+    parser.add_argument("--top", type=int, default=20, help="number of modules to list")
+    parser.add_argument("--json", action="store_true", help="emit a machine-readable report")
+    args = parser.parse_args()
+
+    wall, entries = profile_import(args.module)
+    top_level = [e for e in entries if not e[0].startswith(" ")]
+    slowest = sorted(entries, key=lambda e: e[2], reverse=True)[:args.top]
+
+    if args.json:
+        print(json.dumps({
+            "module": args.module,
+            "wall_seconds": round(wall, 3),
+            "import_seconds": round(sum(e[2] for e in top_level) / 1e6, 3),
+            "modules_imported": len(entries),
+            "slowest": [
+                {"module": name.strip(), "self_ms": self_us / 1000, "cumulative_ms": cum_us / 1000}
+                for name, self_us, cum_us in slowest
+            ]
+        }, indent=2))
+        return
+
+    print(f"⏱️ import {args.module}: {wall:.2f}s wall, {len(entries)} modules")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for name, self_us, cum_us in slowest:
+        print(f"{cum_us / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {name.strip()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+from bisect import bisect_left, insort
+
+from documents import is_processed
+
+
+class TopicIndex:
+    """Topic -> document posting lists, each sorted by processed_at.
+
+    Documents are indexed under their topic words ('topics') and their
+    model topic ids ('topic_ids'). page() returns the newest documents
+    of a topic after a (processed_at, doc_id) cursor in O(log n + limit);
+    counts() is the length of each posting list. fork() shares the
+    posting lists and copies one only when the fork first changes it.
+    """
+
+    def __init__(self):
+        self.by_word = {}
+        self.by_id = {}
+        self._owned = set()
+
+    @staticmethod
+    def _keys(doc):
+        processed = doc['nlp_processed']
+        words = {str(t) for t in processed.get('topics', []) or [] if t}
+        ids = {str(t) for t in processed.get('topic_ids', []) or []}
+        return words, ids
+
+    def rebuild(self, documents_by_id):
+        for doc_id, doc in documents_by_id.items():
+            if is_processed(doc):
+                self.apply(doc_id, None, doc)
+
+    def _postings(self, kind, table, key):
+        postings = table.get(key)
+        if postings is None:
+            postings = table[key] = []
+        elif (kind, key) not in self._owned:
+            postings = table[key] = list(postings)
+        self._owned.add((kind, key))
+        return postings
+
+    def _update(self, doc_id, doc, add):
+        entry = (str(doc.get('processed_at', '') or ''), doc_id)
+        words, ids = self._keys(doc)
+        for kind, table, keys in (('word', self.by_word, words), ('id', self.by_id, ids)):
+            for key in keys:
+                postings = self._postings(kind, table, key)
+                if add:
+                    insort(postings, entry)
+                    continue
+                i = bisect_left(postings, entry)
+                if i < len(postings) and postings[i] == entry:
+                    del postings[i]
+                if not postings:
+                    del table[key]
+
+    def apply(self, doc_id, old_doc, new_doc):
+        if old_doc is not None and is_processed(old_doc):
+            self._update(doc_id, old_doc, add=False)
+        if new_doc is not None and is_processed(new_doc):
+            self._update(doc_id, new_doc, add=True)
+
+    def fork(self):
+        clone = TopicIndex()
+        clone.by_word = dict(self.by_word)
+        clone.by_id = dict(self.by_id)
+        return clone
+
+    def postings(self, topic):
+        """Posting list for a topic word, falling back to a numeric topic id"""
+        postings = self.by_word.get(topic)
+        if postings is None:
+            postings = self.by_id.get(topic, [])
+        return postings
+
+    def page(self, topic, limit, after=None):
+        """Newest-first doc ids of a topic older than the (processed_at, doc_id) cursor"""
+        postings = self.postings(topic)
+        end = bisect_left(postings, tuple(after)) if after else len(postings)
+        entries = postings[max(0, end - limit):end]
+        has_more = end - len(entries) > 0
+        return [doc_id for _, doc_id in reversed(entries)], (entries[0] if has_more and entries else None)
+
+    def counts(self):
+        return {
+            'topics': {word: len(postings) for word, postings in self.by_word.items()},
+            'topic_ids': {topic_id: len(postings) for topic_id, postings in self.by_id.items()},
+        }
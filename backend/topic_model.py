@@ -0,0 +1,125 @@
+import os
+import threading
+
+import joblib
+import numpy as np
+from sklearn.decomposition import LatentDirichletAllocation
+from sklearn.feature_extraction.text import HashingVectorizer
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), "data", "topic_model.joblib")
+
+
+class OnlineTopicModel:
+    """Persistent online LDA topic model over hashed term counts.
+
+    The hashing vectorizer has no fitted vocabulary, so the model can be
+    updated with partial_fit on each new batch without refitting on the
+    whole corpus. Topic ids (topic_0 .. topic_N) map to the same LDA
+    components across runs, and a feature->word table collected from the
+    texts seen so far is used to label them.
+    """
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, n_topics=5, n_features=2 ** 18, top_n=10):
+        self.model_path = model_path
+        self.n_topics = n_topics
+        self.top_n = top_n
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            stop_words='english',
+            alternate_sign=False,
+            norm=None
+        )
+        self.lda = LatentDirichletAllocation(
+            n_components=n_topics,
+            learning_method='online',
+            random_state=42
+        )
+        self.feature_words = {}
+        self.n_updates = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, model_path=DEFAULT_MODEL_PATH, n_topics=5):
+        """Load the persisted model, or start a fresh one if there is none"""
+        if os.path.exists(model_path):
+            try:
+                model = joblib.load(model_path)
+                model.model_path = model_path
+                model._lock = threading.Lock()
+                print(f"✅ Loaded topic model ({model.n_updates} updates) from {model_path}")
+                return model
+            except Exception as e:
+                print(f"⚠️ Failed to load topic model, starting fresh: {str(e)}")
+        return cls(model_path=model_path, n_topics=n_topics)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def save(self):
+        tmp_path = f"{self.model_path}.tmp"
+        with self._lock:
+            joblib.dump(self, tmp_path)
+        os.replace(tmp_path, self.model_path)
+
+    @property
+    def is_fitted(self):
+        return self.n_updates > 0
+
+    def _learn_words(self, texts):
+        """Record which word each hashed feature column stands for"""
+        analyzer = self.vectorizer.build_analyzer()
+        tokens = set()
+        for text in texts:
+            tokens.update(analyzer(text))
+        tokens = [t for t in tokens if t]
+        if not tokens:
+            return
+        # Each single-token "document" hashes to exactly one column
+        columns = self.vectorizer.transform(tokens).tocsr()
+        for row, token in enumerate(tokens):
+            start, end = columns.indptr[row], columns.indptr[row + 1]
+            if end > start:
+                self.feature_words.setdefault(int(columns.indices[start]), token)
+
+    def partial_fit(self, texts):
+        texts = [t for t in texts if t]
+        if not texts:
+            return
+        X = self.vectorizer.transform(texts)
+        with self._lock:
+            self._learn_words(texts)
+            self.lda.partial_fit(X)
+            self.n_updates += 1
+
+    def topics(self):
+        """Return {topic_id: [(word, weight), ...]} for the current model"""
+        if not self.is_fitted:
+            return {}
+        topics = {}
+        for idx, component in enumerate(self.lda.components_):
+            words = []
+            for i in np.argsort(component)[::-1]:
+                word = self.feature_words.get(int(i))
+                if word:
+                    words.append((word, round(float(component[i]), 3)))
+                if len(words) == self.top_n:
+                    break
+            topics[f"topic_{idx}"] = words
+        return topics
+
+    def dominant_topics(self, texts, min_weight=0.2):
+        """Return, per text, the topic ids whose weight is at least min_weight
+
+        Topic ids are ordered by weight so the first one is the dominant topic.
+        """
+        if not self.is_fitted or not texts:
+            return [[] for _ in texts]
+        weights = self.lda.transform(self.vectorizer.transform(texts))
+        assignments = []
+        for row in weights:
+            order = np.argsort(row)[::-1]
+            ids = [f"topic_{i}" for i in order if row[i] >= min_weight]
+            assignments.append(ids or [f"topic_{order[0]}"])
+        return assignments
@@ -0,0 +1,91 @@
+import os
+import re
+
+FULL = 'full'
+REGEX_ONLY = 'regex'
+SKIP = 'skip'
+ROUTES = (FULL, REGEX_ONLY, SKIP)
+
+# Cheap single-pass pre-scan for the indicators extract_regex_iocs looks for
+# (domains are left out: nearly every page contains one).
+IOC_PRESCAN = re.compile(
+    r'\b\d{1,3}(?:\.\d{1,3}){3}\b'
+    r'|[\w.-]+@[\w-]+\.[\w.-]+'
+    r'|\b(?:bc1|[13])[a-zA-HJ-NP-Z0-9]{25,39}\b'
+    r'|\b0x[a-fA-F0-9]{40}\b'
+    r'|CVE-\d{4}-\d{4,7}'
+    r'|\b[a-z2-7]{16,56}\.onion\b'
+)
+WORD = re.compile(r'[^\W\d_]+')
+WALL_MARKERS = re.compile(r'captcha|are you (?:a )?human|ddos protection|sign in|log ?in|register|forgot password', re.IGNORECASE)
+
+ENGLISH_STOPWORDS = frozenset("""
+    the of and to a in is it you that he was for on are with as i his they be at one have this
+    from or had by not but what some we can out other were all there when up use your how said
+    an each she which do their if will way about many then them would so these her him has more
+    its who been now my no than any only our new just get here also very may
+""".split())
+
+THREAT_KEYWORDS = frozenset("""
+    exploit leak attack malware breach vulnerability hack hacker compromise ransomware botnet
+    ddos phishing phish carding cvv fullz dump dumps database credentials password stealer
+    loader crypter rat trojan backdoor rootkit keylogger cve vendor escrow market
+    bitcoin btc monero xmr wallet mixer tumbler bank paypal counterfeit passport drugs weapon
+""".split())
+
+
+class TriageConfig:
+    """Thresholds for routing documents, overridable through TRIAGE_* env vars"""
+
+    def __init__(self, **overrides):
+        self.enabled = os.getenv("TRIAGE_ENABLED", "1") != "0"
+        self.min_chars = int(os.getenv("TRIAGE_MIN_CHARS", "200"))
+        self.wall_max_chars = int(os.getenv("TRIAGE_WALL_MAX_CHARS", "1500"))
+        self.min_english_ratio = float(os.getenv("TRIAGE_MIN_ENGLISH_RATIO", "0.08"))
+        self.min_keyword_density = float(os.getenv("TRIAGE_MIN_KEYWORD_DENSITY", "0.002"))
+        self.min_iocs_for_full = int(os.getenv("TRIAGE_MIN_IOCS_FOR_FULL", "1"))
+        self.sample_chars = int(os.getenv("TRIAGE_SAMPLE_CHARS", "20000"))
+        for key, value in overrides.items():
+            if not hasattr(self, key):
+                raise ValueError(f"Unknown triage setting: {key}")
+            setattr(self, key, value)
+
+
+def triage(text, config):
+    """Route a document to the full pipeline, regex-only IOCs, or skip it
+
+    Returns {'route', 'reason', 'chars', 'iocs', 'english_ratio',
+    'keyword_density'}. Only the first sample_chars characters are used
+    for the language and keyword estimates.
+    """
+    stripped = text.strip() if text else ''
+    chars = len(stripped)
+    ioc_hits = len(IOC_PRESCAN.findall(stripped))
+    sample = stripped[:config.sample_chars]
+    words = [w.lower() for w in WORD.findall(sample)]
+    n_words = len(words) or 1
+    english_ratio = sum(w in ENGLISH_STOPWORDS for w in words) / n_words
+    keyword_density = sum(w in THREAT_KEYWORDS for w in words) / n_words
+
+    def decision(route, reason):
+        return {
+            'route': route,
+            'reason': reason,
+            'chars': chars,
+            'iocs': ioc_hits,
+            'english_ratio': round(english_ratio, 3),
+            'keyword_density': round(keyword_density, 4),
+        }
+
+    if not config.enabled:
+        return decision(FULL, 'triage_disabled')
+    if chars < config.min_chars:
+        return decision(REGEX_ONLY, 'short_with_iocs') if ioc_hits else decision(SKIP, 'too_short')
+    if chars < config.wall_max_chars and WALL_MARKERS.search(sample) and not ioc_hits:
+        return decision(SKIP, 'login_or_captcha')
+    if english_ratio < config.min_english_ratio:
+        # NER and the sentiment lexicon are English-only; indicators are not
+        return decision(REGEX_ONLY, 'non_english') if ioc_hits else decision(SKIP, 'non_english_no_iocs')
+    if keyword_density >= config.min_keyword_density or ioc_hits >= config.min_iocs_for_full:
+        return decision(FULL, 'threat_signal')
+    return decision(REGEX_ONLY, 'low_signal')
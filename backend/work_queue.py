@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from documents import document_id
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.dirname(__file__), "data", "processing_queue.db")
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def content_hash(doc):
+    text = doc.get('clean_text') or doc.get('raw_html') or ''
+    return hashlib.sha1(str(text).encode('utf-8', 'replace')).hexdigest()
+
+
+def fingerprint(doc):
+    """Cheap change marker: content length plus the scrape and processing times
+
+    sync() only hashes a document's content when this differs from the
+    fingerprint recorded with its last hash.
+    """
+    text = doc.get('clean_text') or doc.get('raw_html') or ''
+    return f"{len(str(text))}:{doc.get('timestamp', '')}:{doc.get('processed_at', '')}"
+
+
+class WorkQueue:
+    """Durable per-document processing queue backed by SQLite.
+
+    Every document has a state (pending, leased, done, failed), an attempt
+    counter and the content hash (plus a cheap fingerprint of it) it was
+    last processed with. A crashed
+    run leaves its leases to expire and the next run picks them up; failed
+    documents are retried until max_attempts. Jobs may carry a list of
+    stages so a document can be partially reprocessed.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, lease_seconds=600, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                stages TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_until REAL,
+                content_hash TEXT,
+                error TEXT,
+                updated_at REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)")
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        if 'fingerprint' not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN fingerprint TEXT")
+
+    def _transaction(self, statements):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    if isinstance(params, list):
+                        if params:
+                            self.conn.executemany(sql, params)
+                    else:
+                        self.conn.execute(sql, params or ())
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def sync(self, collection):
+        """Queue documents that are new, unprocessed or whose content changed
+
+        Jobs for documents no longer in the collection are dropped. Returns
+        the number of documents newly queued.
+        """
+        with self._lock:
+            known = {row[0]: row[1:] for row in self.conn.execute(
+                "SELECT id, state, content_hash, fingerprint FROM jobs"
+            )}
+        now = time.time()
+        to_queue, to_mark_done, to_refresh = [], [], []
+        seen = set()
+        for doc in collection:
+            doc_id = document_id(doc)
+            seen.add(doc_id)
+            processed = (isinstance(doc.get('nlp_processed'), dict) and bool(doc['nlp_processed'])) \
+                or (doc.get('triage') or {}).get('route') == 'skip'
+            entry = known.get(doc_id)
+            if entry is None:
+                if processed:
+                    to_mark_done.append((doc_id, DONE, content_hash(doc), fingerprint(doc), now))
+                else:
+                    to_queue.append((doc_id, PENDING, None, None, now))
+                continue
+            state, last_hash, last_fingerprint = entry
+            if state != DONE:
+                continue
+            if not processed:
+                to_queue.append((doc_id, PENDING, last_hash, None, now))
+                continue
+            current = fingerprint(doc)
+            if current == last_fingerprint:
+                continue
+            if last_hash != content_hash(doc):
+                to_queue.append((doc_id, PENDING, last_hash, None, now))
+            else:
+                to_refresh.append((current, doc_id))
+        orphans = [(doc_id,) for doc_id in known if doc_id not in seen]
+
+        upsert = """
+            INSERT INTO jobs (id, state, content_hash, fingerprint, updated_at, attempts, stages)
+            VALUES (?, ?, ?, ?, ?, 0, NULL)
+            ON CONFLICT(id) DO UPDATE SET state = excluded.state, attempts = 0, fingerprint = excluded.fingerprint,
+                stages = NULL, error = NULL, updated_at = excluded.updated_at
+        """
+        self._transaction([
+            (upsert, to_mark_done),
+            (upsert, to_queue),
+            ("UPDATE jobs SET fingerprint = ? WHERE id = ?", to_refresh),
+            ("DELETE FROM jobs WHERE id = ?", orphans),
+        ])
+        if orphans:
+            print(f"🧹 Dropped {len(orphans)} queued documents no longer in the collection")
+        return len(to_queue)
+
+    def enqueue(self, doc_ids, stages=None):
+        """(Re)queue documents, optionally for a subset of stages only"""
+        now = time.time()
+        stages_json = json.dumps(sorted(stages)) if stages else None
+        rows = [(doc_id, stages_json, now) for doc_id in doc_ids]
+        self._transaction([("""
+            INSERT INTO jobs (id, state, stages, attempts, updated_at) VALUES (?, 'pending', ?, 0, ?)
+            ON CONFLICT(id) DO UPDATE SET state = 'pending', stages = excluded.stages,
+                attempts = 0, error = NULL, lease_until = NULL, updated_at = excluded.updated_at
+        """, rows)])
+        return len(rows)
+
+    def retry_failed(self):
+        """Move failed jobs that still have attempts left back to pending"""
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET state = 'pending', lease_until = NULL WHERE state = 'failed' AND attempts < ?",
+                (self.max_attempts,)
+            )
+            return cursor.rowcount
+
+    def release_leases(self):
+        """Return all leased jobs to pending
+
+        Called at the start of a run: only one processor runs at a time, so
+        any lease still held belongs to a run that crashed.
+        """
+        with self._lock:
+            cursor = self.conn.execute("UPDATE jobs SET state = 'pending', lease_until = NULL WHERE state = 'leased'")
+            return cursor.rowcount
+
+    def lease(self, limit):
+        """Claim up to limit pending (or lease-expired) jobs: [(id, stages)]"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.conn.execute("""
+                    SELECT id, stages FROM jobs
+                    WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?)
+                    ORDER BY updated_at LIMIT ?
+                """, (now, limit)).fetchall()
+                self.conn.executemany(
+                    "UPDATE jobs SET state = 'leased', attempts = attempts + 1, lease_until = ?, updated_at = ? WHERE id = ?",
+                    [(now + self.lease_seconds, now, row[0]) for row in rows]
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return [(doc_id, json.loads(stages) if stages else None) for doc_id, stages in rows]
+
+    def complete(self, docs):
+        """Mark documents done, recording the content they were processed from"""
+        now = time.time()
+        rows = [(content_hash(doc), fingerprint(doc), now, document_id(doc)) for doc in docs]
+        self._transaction([(
+            "UPDATE jobs SET state = 'done', lease_until = NULL, error = NULL, content_hash = ?, fingerprint = ?,"
+            " updated_at = ? WHERE id = ?",
+            rows
+        )])
+
+    def forget(self, doc_ids):
+        """Drop the jobs of documents that are no longer in the collection"""
+        self._transaction([("DELETE FROM jobs WHERE id = ?", [(doc_id,) for doc_id in doc_ids])])
+
+    def fail(self, doc_id, error):
+        self._transaction([(
+            "UPDATE jobs SET state = 'failed', lease_until = NULL, error = ?, updated_at = ? WHERE id = ?",
+            (str(error)[:500], time.time(), doc_id)
+        )])
+
+    def counts(self):
+        with self._lock:
+            counts = dict(self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+        return {state: counts.get(state, 0) for state in (PENDING, LEASED, DONE, FAILED)}
+
+    def close(self):
+        self.conn.close()
@@ -3,7 +3,20 @@ import { useState } from 'react';
 import { ExternalLink, ChevronDown, ChevronUp, AlertCircle } from 'lucide-react';
 import OTXDetails from '../threats/OTXDetails';
 
-const SearchResults = ({ results = { data: [], status: '' } }) => {
+// Wrap the [start, end] highlight ranges returned by /search in <mark>
+const renderSnippet = (snippet, highlights = []) => {
+  const parts = [];
+  let last = 0;
+  highlights.forEach(([start, end], i) => {
+    parts.push(snippet.substring(last, start));
+    parts.push(<mark key={i} className="bg-yellow-500/40 text-white rounded-sm">{snippet.substring(start, end)}</mark>);
+    last = end;
+  });
+  parts.push(snippet.substring(last));
+  return parts;
+};
+
+const SearchResults = ({ results = { data: [], status: '' }, hasMore = false, loadingMore = false, onLoadMore }) => {
   const [expandedItem, setExpandedItem] = useState(null);
   console.log("Rendering SearchResults", results);
 
@@ -66,7 +79,15 @@ const SearchResults = ({ results = { data: [], status: '' } }) => {
           {expandedItem === index && (
             <div className="p-4 border-t border-gray-700">
               {/* Content Preview */}
-              {item.clean_text && (
+              {item.snippet && (
+                <div className="mb-4">
+                  <h4 className="text-sm font-medium text-gray-400 mb-2">Content Preview:</h4>
+                  <p className="text-gray-300 text-sm bg-gray-900 p-3 rounded-md max-h-36 overflow-y-auto">
+                    {renderSnippet(item.snippet, item.highlights)}
+                  </p>
+                </div>
+              )}
+              {!item.snippet && item.clean_text && (
                 <div className="mb-4">
                   <h4 className="text-sm font-medium text-gray-400 mb-2">Content Preview:</h4>
                   <p className="text-gray-300 text-sm bg-gray-900 p-3 rounded-md max-h-36 overflow-y-auto">
@@ -184,6 +205,19 @@ const SearchResults = ({ results = { data: [], status: '' } }) => {
           )}
         </div>
       ))}
+
+      {/* /search returns a page at a time; fetch the next one with its cursor */}
+      {hasMore && onLoadMore && (
+        <div className="flex justify-center">
+          <button
+            onClick={onLoadMore}
+            disabled={loadingMore}
+            className="inline-flex items-center px-4 py-2 border border-gray-600 text-sm font-medium rounded-md text-gray-300 bg-gray-700 hover:bg-gray-600 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-blue-500 disabled:opacity-50"
+          >
+            {loadingMore ? 'Loading...' : 'Load more results'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
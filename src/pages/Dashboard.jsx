@@ -104,15 +104,17 @@ const Dashboard = () => {
   
   // Update data from WebSocket
   useEffect(() => {
-    if (wsData && wsData.type === 'status_update') {
+    // status_update carries the full status, status_delta only the changed keys
+    if (wsData && (wsData.type === 'status_update' || wsData.type === 'status_delta')) {
+      const { processed, pending, latest_threats } = wsData.data;
       setMonitorData(prevData => ({
         ...prevData,
-        processed_docs: wsData.data.processed,
-        pending_docs: wsData.data.pending
+        ...(processed !== undefined && { processed_docs: processed }),
+        ...(pending !== undefined && { pending_docs: pending })
       }));
       
-      if (wsData.data.latest_threats) {
-        setLatestThreats(wsData.data.latest_threats);
+      if (latest_threats) {
+        setLatestThreats(latest_threats);
       }
     }
   }, [wsData]);
@@ -13,7 +13,11 @@ const Search = () => {
   
   const [searchQuery, setSearchQuery] = useState(initialQuery);
   const [searchResults, setSearchResults] = useState([]);
+  const [activeQuery, setActiveQuery] = useState('');
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
   const [searched, setSearched] = useState(false);
 
@@ -30,18 +34,41 @@ const Search = () => {
     try {
       setLoading(true);
       setError(null);
-      const results = await searchThreatData(query);
-      setSearchResults(results);
+      const response = await searchThreatData(query);
+      setSearchResults(response.data?.results || []);
+      setTotal(response.data?.total || 0);
+      setNextCursor(response.data?.next_cursor || null);
+      setActiveQuery(query);
       setSearched(true);
     } catch (err) {
       console.error('Search error:', err);
       setError('Failed to perform search. Please try again later.');
       setSearchResults([]);
+      setTotal(0);
+      setNextCursor(null);
     } finally {
       setLoading(false);
     }
   };
 
+  // Fetch the next page of the current search and append it
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+
+    try {
+      setLoadingMore(true);
+      setError(null);
+      const response = await searchThreatData(activeQuery, { cursor: nextCursor });
+      setSearchResults(prev => [...prev, ...(response.data?.results || [])]);
+      setNextCursor(response.data?.next_cursor || null);
+    } catch (err) {
+      console.error('Search error:', err);
+      setError('Failed to load more results. Please try again later.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleSubmit = (e) => {
     e.preventDefault();
     console.log("Search query:", searchQuery);
@@ -109,13 +136,18 @@ const Search = () => {
               <h2 className="text-xl font-semibold">
                 Search Results 
                 <span className="text-gray-400 ml-2">
-                  ({searchResults.length} {searchResults.length === 1 ? 'item' : 'items'})
+                  ({searchResults.length < total ? `${searchResults.length} of ` : ''}{total} {total === 1 ? 'item' : 'items'})
                 </span>
               </h2>
             </div>
           )}
           
-          <SearchResults results={searchResults} />
+          <SearchResults
+            results={{ status: 'success', data: searchResults }}
+            hasMore={Boolean(nextCursor)}
+            loadingMore={loadingMore}
+            onLoadMore={handleLoadMore}
+          />
           
           {searched && searchResults.length === 0 && !error && (
             <div className="text-center py-12">
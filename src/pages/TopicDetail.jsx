@@ -5,10 +5,16 @@ import { ArrowLeft, FileText, ExternalLink, Calendar, AlertCircle, Shield, Tag }
 import Loader from '../components/common/Loader';
 import ErrorDisplay from '../components/common/ErrorDisplay';
 
+// Documents fetched per request (the API caps this at SEARCH_MAX_PAGE_SIZE)
+const PAGE_SIZE = 50;
+
 const TopicDetail = () => {
   const { topicId } = useParams();
   const [documents, setDocuments] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
   const [activeTab, setActiveTab] = useState('all');
   const [searchTerm, setSearchTerm] = useState('');
@@ -17,8 +23,10 @@ const TopicDetail = () => {
     const fetchTopicDocuments = async () => {
       try {
         setLoading(true);
-        const response = await getTopicDocuments(topicId);
+        const response = await getTopicDocuments(topicId, { limit: PAGE_SIZE });
         setDocuments(response.documents);
+        setTotal(response.total ?? response.documents.length);
+        setNextCursor(response.next_cursor || null);
         setLoading(false);
       } catch (err) {
         console.error(`Error fetching documents for topic ${topicId}:`, err);
@@ -30,6 +38,22 @@ const TopicDetail = () => {
     fetchTopicDocuments();
   }, [topicId]);
 
+  // Append the next page; filters and counts below cover the loaded documents
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const response = await getTopicDocuments(topicId, { cursor: nextCursor, limit: PAGE_SIZE });
+      setDocuments(prev => [...prev, ...response.documents]);
+      setNextCursor(response.next_cursor || null);
+    } catch (err) {
+      console.error(`Error fetching more documents for topic ${topicId}:`, err);
+      setError(`Failed to load documents for Topic ${topicId}. Please try again later.`);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // Format date for display
   const formatDate = (dateString) => {
     if (!dateString) return 'Unknown date';
@@ -46,7 +70,7 @@ const TopicDetail = () => {
     const matchesSearch = 
       doc.title?.toLowerCase().includes(searchTerm.toLowerCase()) ||
       doc.url?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      doc.clean_text?.toLowerCase().includes(searchTerm.toLowerCase());
+      doc.preview?.toLowerCase().includes(searchTerm.toLowerCase());
     
     if (activeTab === 'all') return matchesSearch;
     if (activeTab === 'high_threat' && doc.threat_score >= 0.7) return matchesSearch;
@@ -155,6 +179,7 @@ const TopicDetail = () => {
       {/* Document Count */}
       <div className="mb-4 text-gray-400">
         Found {filteredDocuments.length} documents
+        {nextCursor && ` in the ${documents.length} of ${total} loaded so far`}
       </div>
 
       {/* Documents List */}
@@ -209,8 +234,8 @@ const TopicDetail = () => {
               {/* Content Preview */}
               <div className="mb-4">
                 <p className="text-gray-300 text-sm line-clamp-3">
-                  {doc.clean_text?.substring(0, 250)}
-                  {doc.clean_text?.length > 250 ? '...' : ''}
+                  {doc.preview}
+                  {doc.preview?.length >= 250 ? '...' : ''}
                 </p>
               </div>
 
@@ -283,6 +308,18 @@ const TopicDetail = () => {
           ))}
         </div>
       )}
+
+      {nextCursor && (
+        <div className="mt-6 flex justify-center">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="px-4 py-2 rounded-md text-sm font-medium bg-gray-700 text-gray-300 hover:bg-gray-600 disabled:opacity-50"
+          >
+            {loadingMore ? 'Loading...' : `Load more documents (${total - documents.length} remaining)`}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
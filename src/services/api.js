@@ -26,9 +26,10 @@ apiClient.interceptors.response.use(
   }
 );
 
-export const searchThreatData = async (query) => {
+// /search is paginated: pass the previous page's data.next_cursor to get the next one
+export const searchThreatData = async (query, { cursor, limit } = {}) => {
   try {
-    const response = await apiClient.get(`/search?query=${encodeURIComponent(query)}`);
+    const response = await apiClient.get('/search', { params: { query, cursor, limit } });
     return response.data;
   } catch (error) {
     console.error('Error searching threat data:', error);
@@ -66,9 +67,10 @@ export const getTopics = async () => {
   }
 };
 
-export const getTopicDocuments = async (topicId) => {
+// /topics/<id> is paginated: pass the previous page's next_cursor to get the next one
+export const getTopicDocuments = async (topicId, { cursor, limit } = {}) => {
   try {
-    const response = await apiClient.get(`/topics/${topicId}`);
+    const response = await apiClient.get(`/topics/${encodeURIComponent(topicId)}`, { params: { cursor, limit } });
     return response.data;
   } catch (error) {
     console.error(`Error getting documents for topic ${topicId}:`, error);